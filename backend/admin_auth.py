@@ -0,0 +1,19 @@
+# backend/admin_auth.py
+"""
+管理员请求校验
+设置 ADMIN_TOKEN 环境变量后，请求头 X-Admin-Token 与之相同的请求视为管理员请求；
+未设置时所有管理功能关闭。
+"""
+import hmac
+
+from flask import current_app, request
+
+HEADER = 'X-Admin-Token'
+
+
+def is_admin_request():
+    token = current_app.config.get('ADMIN_TOKEN')
+    provided = request.headers.get(HEADER)
+    if not token or not provided:
+        return False
+    return hmac.compare_digest(token.encode(), provided.encode())
@@ -0,0 +1,272 @@
+# backend/asgi.py
+"""
+ASGI 入口
+与 run:app（WSGI，gunicorn 同步 worker）并行的部署方式，同一个 Flask 应用通过这里的适配层运行在事件循环上：
+- 请求体先在事件循环中异步读完（超过 ASGI_SPOOL_SIZE 的部分写入临时文件），慢速上传不占用线程；
+  读完后 Flask 在 ASGI_THREADS 个线程的线程池中处理请求（数据库读写仍是同步的 SQLAlchemy）
+- 响应体由线程逐块交给事件循环发送，队列满时线程等待（流式响应有背压）
+- 原图和缩略图（/api/travel/photos/file|thumbnail/...）直接在事件循环中分块读取并发送，
+  慢速下载不占用 Flask 线程；这两个路径不经过 Flask 的钩子（指标、压缩、CORS）
+
+启动:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+    gunicorn -k uvicorn.workers.UvicornWorker -w 4 --preload -b 0.0.0.0:5000 asgi:app
+
+benchmarks/bench_asgi.py 在慢速上传和下载的同时压测读接口，对比 run:app 与本入口的并发和尾延迟。
+"""
+import asyncio
+import email.utils
+import mimetypes
+import os
+import stat as stat_module
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import safe_join
+
+from run import create_app
+from travel_app.routes import get_thumbnail_path, get_upload_path
+
+# 处理 Flask 请求的线程数
+THREADS = int(os.environ.get('ASGI_THREADS', 16))
+# 请求体超过该大小时写入临时文件
+SPOOL_SIZE = int(os.environ.get('ASGI_SPOOL_SIZE', 1024 * 1024))
+# 未设置 MAX_CONTENT_LENGTH 时的请求体上限
+MAX_BODY = int(os.environ.get('ASGI_MAX_BODY', 100 * 1024 * 1024))
+# 文件分块大小、响应队列长度（块数）
+FILE_CHUNK = 256 * 1024
+QUEUE_SIZE = 8
+
+# 直接在事件循环中发送的文件: 路径前缀 -> 目录
+FILE_ROUTES = {
+    '/api/travel/photos/file/': get_upload_path,
+    '/api/travel/photos/thumbnail/': get_thumbnail_path,
+}
+
+
+class _Stopped(Exception):
+    """客户端已断开，停止迭代响应体"""
+
+
+class _Disconnected(Exception):
+    """读取请求体时客户端断开"""
+
+
+def _header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin1')
+    return None
+
+
+def _environ(scope, body, content_length):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(content_length),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name, value = name.decode('latin1'), value.decode('latin1')
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'content-length':
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def _send_simple(send, status, body=b'', content_type=b'application/json', headers=()):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type), (b'content-length', str(len(body)).encode()), *headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class AsgiAdapter:
+    """把 WSGI 应用包装为 ASGI 应用"""
+
+    def __init__(self, wsgi_app, threads=THREADS):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi-wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            for prefix, directory in FILE_ROUTES.items():
+                if scope['path'].startswith(prefix) and scope['method'] in ('GET', 'HEAD'):
+                    await self._send_file(scope, send, directory(), scope['path'][len(prefix):])
+                    return
+            await self._handle(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _body_limit(self):
+        return self.wsgi_app.config.get('MAX_CONTENT_LENGTH') or MAX_BODY
+
+    async def _read_body(self, receive, limit):
+        """异步读完请求体，返回 (文件对象, 长度)；超过 limit 时返回 (None, 长度)"""
+        body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                raise _Disconnected()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > limit:
+                body.close()
+                return None, size
+            body.write(chunk)
+            if not message.get('more_body'):
+                body.seek(0)
+                return body, size
+
+    async def _handle(self, scope, receive, send):
+        limit = self._body_limit()
+        declared = _header(scope, b'content-length')
+        if declared and declared.isdigit() and int(declared) > limit:
+            await _send_simple(send, 413, '{"error": "请求体过大"}'.encode())
+            return
+        try:
+            body, size = await self._read_body(receive, limit)
+        except _Disconnected:
+            return
+        if body is None:
+            await _send_simple(send, 413, '{"error": "请求体过大"}'.encode())
+            return
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        stop = threading.Event()
+        worker = loop.run_in_executor(self.executor, self._run_wsgi, _environ(scope, body, size), loop, queue, stop)
+        started = False
+        try:
+            while True:
+                kind, *payload = await queue.get()
+                if kind == 'start':
+                    status, headers = payload
+                    # 等到第一块响应体再发送响应头，迭代出错时还可以改为 500
+                    pending_start = {'type': 'http.response.start', 'status': status, 'headers': headers}
+                elif kind == 'body':
+                    if not started:
+                        await send(pending_start)
+                        started = True
+                    await send({'type': 'http.response.body', 'body': payload[0], 'more_body': True})
+                elif kind == 'end':
+                    if not started:
+                        await send(pending_start)
+                    await send({'type': 'http.response.body', 'body': b''})
+                    return
+                else:
+                    self.wsgi_app.logger.error(f"ASGI 处理请求出错: {payload[0]!r}")
+                    if not started:
+                        await _send_simple(send, 500, '{"error": "服务器内部错误"}'.encode())
+                    else:
+                        await send({'type': 'http.response.body', 'body': b''})
+                    return
+        finally:
+            # 客户端断开或发送出错时让线程停止迭代，并清空队列避免线程阻塞在 put 上
+            stop.set()
+            while not worker.done():
+                while not queue.empty():
+                    queue.get_nowait()
+                await asyncio.wait([worker], timeout=0.05)
+            body.close()
+
+    def _run_wsgi(self, environ, loop, queue, stop):
+        """在线程池中执行 WSGI 应用，把响应头和响应体逐块放入队列"""
+        def put(item):
+            if stop.is_set():
+                raise _Stopped()
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        def start_response(status, headers, exc_info=None):
+            code = int(status.split(' ', 1)[0])
+            put(('start', code, [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers]))
+
+        try:
+            result = self.wsgi_app(environ, start_response)
+            try:
+                for chunk in result:
+                    if chunk:
+                        put(('body', chunk))
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+            put(('end',))
+        except _Stopped:
+            pass
+        except Exception as e:
+            if not stop.is_set():
+                asyncio.run_coroutine_threadsafe(queue.put(('error', e)), loop).result()
+
+    async def _send_file(self, scope, send, directory, filename):
+        """分块发送上传目录中的文件，支持 ETag / If-None-Match"""
+        loop = asyncio.get_running_loop()
+        path = safe_join(directory, filename)
+        try:
+            stat = await loop.run_in_executor(None, os.stat, path) if path else None
+        except OSError:
+            stat = None
+        if stat is None or not stat_module.S_ISREG(stat.st_mode):
+            await _send_simple(send, 404, '{"error": "文件不存在"}'.encode())
+            return
+
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        headers = [
+            (b'etag', etag.encode()),
+            (b'last-modified', email.utils.formatdate(stat.st_mtime, usegmt=True).encode()),
+            (b'cache-control', b'no-cache'),
+        ]
+        if _header(scope, b'if-none-match') == etag:
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        headers += [(b'content-type', content_type.encode()), (b'content-length', str(stat.st_size).encode())]
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        if scope['method'] == 'HEAD':
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        f = await loop.run_in_executor(None, open, path, 'rb')
+        try:
+            while True:
+                chunk = await loop.run_in_executor(None, f.read, FILE_CHUNK)
+                if not chunk:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            f.close()
+
+
+app = AsgiAdapter(create_app())
@@ -0,0 +1,344 @@
+# backend/backup.py
+"""
+在线备份与恢复
+`flask backup` 在应用运行时生成快照，不需要停服：
+- 每个 SQLite 绑定（blog / drive_stats / travel，以及单独的默认库）用 SQLite 在线备份 API 复制，
+  每步复制 BACKUP_STEP_PAGES 页，步与步之间释放锁，写入不会被整库复制阻塞；复制完成后执行 quick_check
+- uploads/travel 目录下的文件原样打包（图片已压缩，不再压缩；数据库文件 deflate 压缩）
+- 快照为 BACKUP_DIR 下的 snapshot-时间.zip（时间精确到微秒，同名快照已存在时报错而不覆盖），
+  内含 manifest.json（每个文件的 sha256），旁边的 .sha256 文件记录整个快照的校验和（与 sha256sum -c 兼容）；只保留最近 BACKUP_KEEP 个快照
+
+`flask restore 快照` 先校验快照和其中每个文件的 sha256、对数据库执行 integrity_check，
+全部通过后再通过备份 API 写回各数据库文件（其他连接看到的是完整的新内容）并还原上传文件，最后清空接口缓存。
+--verify-only 只校验不恢复。
+
+管理员（见 admin_auth.py）也可以通过 POST /api/admin/backups 生成快照，GET /api/admin/backups 列出快照。
+PostgreSQL 绑定不在快照范围内，请使用 pg_dump。
+"""
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime
+
+import click
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy.engine import make_url
+
+import db_config
+from admin_auth import is_admin_request
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+UPLOAD_DIR = os.path.join(BACKEND_DIR, 'uploads', 'travel')
+UPLOAD_ARCNAME = 'uploads/travel'
+
+# 已压缩的文件格式，打包时不再压缩
+STORED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.avif', '.heic', '.zip', '.gz', '.zst'}
+READ_BLOCK = 1024 * 1024
+
+backup_bp = Blueprint('backup', __name__, url_prefix='/api/admin')
+
+
+class BackupError(Exception):
+    pass
+
+
+def sqlite_files(app):
+    """需要备份的 SQLite 文件: {绑定名: 路径}，指向 PostgreSQL 的绑定不在其中"""
+    urls = app.config.get('DB_FILE_URLS') or {
+        bind_key: options['url'] for bind_key, options in app.config['SQLALCHEMY_BINDS'].items()
+    }
+    files = {
+        bind_key: make_url(url).database
+        for bind_key, url in urls.items() if bind_key and db_config.is_sqlite(url)
+    }
+    # 默认绑定通常与 blog_db 是同一个文件
+    default_url = app.config['SQLALCHEMY_DATABASE_URI']
+    if db_config.is_sqlite(default_url) and make_url(default_url).database not in files.values():
+        files['default'] = make_url(default_url).database
+    return files
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _add_file(archive, path, arcname, compress_type):
+    """边写入边计算 sha256，返回校验和"""
+    digest = hashlib.sha256()
+    info = zipfile.ZipInfo.from_file(path, arcname)
+    info.compress_type = compress_type
+    with open(path, 'rb') as src, archive.open(info, 'w', force_zip64=True) as dst:
+        for block in iter(lambda: src.read(READ_BLOCK), b''):
+            digest.update(block)
+            dst.write(block)
+    return digest.hexdigest()
+
+
+def copy_database(path, target, pages, sleep, log=print):
+    """用在线备份 API 分步复制数据库，返回页数"""
+    src = sqlite3.connect(path, timeout=30)
+    dst = sqlite3.connect(target)
+    try:
+        def progress(status, remaining, total):
+            if remaining:
+                log(f"  {os.path.basename(path)}: {total - remaining}/{total} 页")
+
+        src.backup(dst, pages=pages, progress=progress, sleep=sleep)
+        result = dst.execute('PRAGMA quick_check').fetchone()[0]
+        if result != 'ok':
+            raise BackupError(f"{os.path.basename(path)} 备份副本校验失败: {result}")
+        return dst.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        dst.close()
+        src.close()
+
+
+@contextmanager
+def _backup_lock(backup_dir):
+    """同一时间只运行一个备份或恢复（命令行与接口之间也互斥）"""
+    os.makedirs(backup_dir, exist_ok=True)
+    with open(os.path.join(backup_dir, '.lock'), 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise BackupError("已有备份或恢复正在进行")
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def list_snapshots(backup_dir):
+    """按时间从新到旧返回快照文件名"""
+    if not os.path.isdir(backup_dir):
+        return []
+    return sorted((name for name in os.listdir(backup_dir)
+                   if name.startswith('snapshot-') and name.endswith('.zip')), reverse=True)
+
+
+def prune(backup_dir, keep):
+    """删除超出保留数量的旧快照，返回删除的文件名"""
+    removed = list_snapshots(backup_dir)[keep:]
+    for name in removed:
+        for path in (os.path.join(backup_dir, name), os.path.join(backup_dir, name + '.sha256')):
+            if os.path.exists(path):
+                os.remove(path)
+    return removed
+
+
+def create_snapshot(app, include_uploads=True, log=print):
+    """生成快照并按保留数量清理旧快照，返回快照信息"""
+    backup_dir = app.config['BACKUP_DIR']
+    started = time.perf_counter()
+    with _backup_lock(backup_dir), tempfile.TemporaryDirectory(dir=backup_dir) as work_dir:
+        name = f"snapshot-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.zip"
+        partial = os.path.join(work_dir, name)
+        manifest = {'created_at': datetime.now().isoformat(timespec='seconds'), 'databases': {}, 'files': {}}
+
+        with zipfile.ZipFile(partial, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for bind_key, path in sqlite_files(app).items():
+                if not os.path.exists(path):
+                    log(f"⚠️  跳过不存在的数据库: {path}")
+                    continue
+                copy = os.path.join(work_dir, os.path.basename(path))
+                pages = copy_database(path, copy, app.config['BACKUP_STEP_PAGES'],
+                                      app.config['BACKUP_STEP_SLEEP'], log)
+                arcname = f'databases/{os.path.basename(path)}'
+                manifest['databases'][bind_key] = {
+                    'file': arcname, 'pages': pages, 'sha256': _add_file(archive, copy, arcname, zipfile.ZIP_DEFLATED),
+                }
+                os.remove(copy)
+                log(f"✅ {bind_key}: {os.path.basename(path)}，{pages} 页")
+
+            if include_uploads and os.path.isdir(UPLOAD_DIR):
+                for root, _, filenames in os.walk(UPLOAD_DIR):
+                    for filename in sorted(filenames):
+                        path = os.path.join(root, filename)
+                        arcname = UPLOAD_ARCNAME + '/' + os.path.relpath(path, UPLOAD_DIR).replace(os.sep, '/')
+                        stored = os.path.splitext(filename)[1].lower() in STORED_EXTENSIONS
+                        manifest['files'][arcname] = _add_file(
+                            archive, path, arcname, zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED)
+                log(f"✅ 上传文件: {len(manifest['files'])} 个")
+
+            archive.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2))
+
+        # 写完整个文件后再移动到备份目录，列表中不会出现不完整的快照；
+        # 用硬链接代替 move，目标已存在时失败而不是覆盖（工作目录在备份目录下，同一文件系统）
+        checksum = _sha256(partial)
+        target = os.path.join(backup_dir, name)
+        try:
+            os.link(partial, target)
+        except FileExistsError:
+            raise BackupError(f"快照 {name} 已存在")
+        with open(target + '.sha256', 'w') as f:
+            f.write(f'{checksum}  {name}\n')
+
+    removed = prune(backup_dir, app.config['BACKUP_KEEP'])
+    return {
+        'name': name,
+        'size': os.path.getsize(target),
+        'sha256': checksum,
+        'databases': sorted(manifest['databases']),
+        'files': len(manifest['files']),
+        'seconds': round(time.perf_counter() - started, 2),
+        'removed': removed,
+    }
+
+
+def upload_target(arcname):
+    """快照中上传文件的还原路径，不在上传目录内（如含 ..、绝对路径）时抛出 BackupError"""
+    prefix = UPLOAD_ARCNAME + '/'
+    if not arcname.startswith(prefix):
+        raise BackupError(f"快照中的文件不在 {UPLOAD_ARCNAME} 下: {arcname}")
+    root = os.path.realpath(UPLOAD_DIR)
+    target = os.path.realpath(os.path.join(root, arcname[len(prefix):]))
+    if os.path.commonpath([root, target]) != root or target == root:
+        raise BackupError(f"快照中的文件路径越出上传目录: {arcname}")
+    return target
+
+
+def verify_snapshot(path, work_dir, log=print):
+    """校验快照并把数据库解压到 work_dir，返回 manifest；校验失败时抛出 BackupError"""
+    checksum_file = path + '.sha256'
+    if os.path.exists(checksum_file):
+        with open(checksum_file) as f:
+            expected = f.read().split()[0]
+        if _sha256(path) != expected:
+            raise BackupError("快照文件的 sha256 与 .sha256 记录不一致")
+        log("✅ 快照校验和一致")
+    else:
+        log("⚠️  没有找到 .sha256 文件，只校验快照内的文件")
+
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read('manifest.json'))
+        for arcname in manifest['files']:
+            upload_target(arcname)
+        expected_files = {info['file']: info['sha256'] for info in manifest['databases'].values()}
+        expected_files.update(manifest['files'])
+        for arcname, expected in expected_files.items():
+            digest = hashlib.sha256()
+            with archive.open(arcname) as f:
+                for block in iter(lambda: f.read(READ_BLOCK), b''):
+                    digest.update(block)
+            if digest.hexdigest() != expected:
+                raise BackupError(f"{arcname} 的 sha256 不一致")
+        log(f"✅ {len(expected_files)} 个文件的 sha256 一致")
+
+        for bind_key, info in manifest['databases'].items():
+            extracted = archive.extract(info['file'], work_dir)
+            conn = sqlite3.connect(extracted)
+            try:
+                result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+            finally:
+                conn.close()
+            if result != 'ok':
+                raise BackupError(f"{bind_key} 完整性检查失败: {result}")
+            info['extracted'] = extracted
+        log(f"✅ {len(manifest['databases'])} 个数据库通过完整性检查")
+    return manifest
+
+
+def restore_snapshot(app, path, include_uploads=True, log=print):
+    """校验后恢复快照中的数据库和上传文件"""
+    files = sqlite_files(app)
+    with _backup_lock(app.config['BACKUP_DIR']), tempfile.TemporaryDirectory() as work_dir:
+        manifest = verify_snapshot(path, work_dir, log)
+        missing = set(manifest['databases']) - set(files)
+        if missing:
+            raise BackupError(f"当前配置中没有这些 SQLite 绑定: {', '.join(sorted(missing))}")
+
+        for bind_key, info in manifest['databases'].items():
+            # 通过备份 API 写回：目标库加锁整体替换，正在运行的连接不会读到一半的文件
+            src = sqlite3.connect(info['extracted'])
+            dst = sqlite3.connect(files[bind_key], timeout=30)
+            try:
+                src.backup(dst)
+            finally:
+                dst.close()
+                src.close()
+            log(f"✅ 已恢复 {bind_key}: {files[bind_key]}")
+
+        if include_uploads and manifest['files']:
+            with zipfile.ZipFile(path) as archive:
+                for arcname in manifest['files']:
+                    target = upload_target(arcname)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    with archive.open(arcname) as src, open(target, 'wb') as dst:
+                        shutil.copyfileobj(src, dst, READ_BLOCK)
+            log(f"✅ 已恢复 {len(manifest['files'])} 个上传文件")
+
+    # 数据整体替换，所有表的缓存和 ETag 都要失效
+    cache = app.extensions.get('response_cache')
+    if cache is not None:
+        from database import db
+        cache.invalidate({name for metadata in db.metadatas.values() for name in metadata.tables})
+    return manifest
+
+
+@backup_bp.route('/backups', methods=['GET'])
+def list_backups():
+    if not is_admin_request():
+        return jsonify({'error': '需要管理员权限'}), 403
+    backup_dir = current_app.config['BACKUP_DIR']
+    return jsonify([
+        {'name': name, 'size': os.path.getsize(os.path.join(backup_dir, name))}
+        for name in list_snapshots(backup_dir)
+    ])
+
+
+@backup_bp.route('/backups', methods=['POST'])
+def create_backup():
+    if not is_admin_request():
+        return jsonify({'error': '需要管理员权限'}), 403
+    try:
+        return jsonify(create_snapshot(current_app._get_current_object(), log=current_app.logger.info)), 201
+    except BackupError as e:
+        return jsonify({'error': str(e)}), 409
+
+
+@click.command('backup')
+@click.option('--no-uploads', is_flag=True, help='不包含 uploads/travel 中的文件')
+def backup_command(no_uploads):
+    """在线生成数据库和上传文件的快照（不需要停服）。"""
+    try:
+        info = create_snapshot(current_app._get_current_object(), include_uploads=not no_uploads)
+    except BackupError as e:
+        print(f"❌ 备份失败: {e}")
+        raise SystemExit(1)
+    print(f"📦 {info['name']}: {info['size'] / 1024 / 1024:.1f}MB，用时 {info['seconds']}s，sha256 {info['sha256']}")
+    for name in info['removed']:
+        print(f"🗑️  已删除旧快照 {name}")
+
+
+@click.command('restore')
+@click.argument('snapshot')
+@click.option('--verify-only', is_flag=True, help='只校验快照，不恢复')
+@click.option('--no-uploads', is_flag=True, help='不恢复上传文件')
+def restore_command(snapshot, verify_only, no_uploads):
+    """校验并恢复快照（SNAPSHOT 为文件路径或备份目录中的文件名）。"""
+    app = current_app._get_current_object()
+    path = snapshot if os.path.exists(snapshot) else os.path.join(app.config['BACKUP_DIR'], snapshot)
+    if not os.path.exists(path):
+        print(f"❌ 找不到快照: {snapshot}")
+        raise SystemExit(1)
+    try:
+        if verify_only:
+            with tempfile.TemporaryDirectory() as work_dir:
+                verify_snapshot(path, work_dir)
+            return
+        restore_snapshot(app, path, include_uploads=not no_uploads)
+    except (BackupError, zipfile.BadZipFile, KeyError) as e:
+        print(f"❌ 快照无效，未做任何修改: {e}")
+        raise SystemExit(1)
+    print("🎉 恢复完成，如果快照的结构版本较旧，请执行 `flask upgrade-db`。")
@@ -0,0 +1,5 @@
+# backend/benchmarks/__init__.py
+"""
+性能基准脚本
+在 backend 目录下以模块方式运行，例如: python -m benchmarks.bench_sqlite_profile
+"""
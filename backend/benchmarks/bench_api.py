@@ -0,0 +1,339 @@
+# backend/benchmarks/bench_api.py
+"""
+API 基准测试
+1. 用 synthetic 在数据目录中生成合成数据（目录中已有数据时直接复用）
+2. 进程内: 测试客户端依次请求所有接口（读接口 + 驱动盘/文章的增改删流程），
+   记录每个接口的延迟分位数和每次请求执行的 SQL 条数
+3. 进程外: 用 gunicorn 启动服务，http_load 多进程并发请求读接口，记录延迟分位数和吞吐量
+
+结果写入 JSON（默认 benchmarks/results/<提交>-<时间>.json），附带提交号、数据规模和相关环境变量，
+--compare 对比两次结果。默认关闭响应缓存（--cache 指定后端）和写接口限流，测的是接口本身。
+
+用法: python -m benchmarks.bench_api [--drives 10000] [--posts 2000] [--photos 2000] [--instance-dir DIR]
+                                   [--iterations 30] [--cache none] [--workers 4] [--duration 10] [--no-http]
+      python -m benchmarks.bench_api --compare old.json new.json
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+from benchmarks.http_load import percentiles, print_summary, run_load
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 记录到结果中的环境变量
+ENV_KEYS = ('DB_PROFILE', 'DB_LAYOUT', 'DATABASE_URL', 'RESPONSE_CACHE_BACKEND', 'RATE_LIMIT_BACKEND',
+            'JSON_PROVIDER', 'COMPRESS_MIN_SIZE', 'SLOW_QUERY_MS')
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def read_requests():
+    """读接口: (方法, 地址, JSON 请求体)，详情接口取库中位于中间的记录"""
+    from database import db
+    from models.blog import Post
+    from models.drive_piece import DrivePiece
+    from models.travel_photo import TravelPhoto
+
+    def middle(column):
+        count = db.session.execute(db.select(db.func.count(column))).scalar()
+        return db.session.execute(db.select(column).order_by(column).offset(count // 2).limit(1)).scalar()
+
+    requests = [
+        ('GET', '/api/posts', None),
+        ('GET', '/api/profile/stats', None),
+        ('GET', '/api/drive/pieces', None),
+        ('GET', '/api/drive/stats', None),
+        ('GET', '/api/drive/set-types', None),
+        ('GET', '/api/drive/stat-types', None),
+        ('POST', '/api/drive/stats/pairing', {'selected_stats': ['暴击率', '暴击伤害']}),
+        ('GET', '/api/travel/photos', None),
+        ('GET', '/api/travel/photos?category=风景', None),
+        ('GET', '/api/travel/categories', None),
+        ('GET', '/api/travel/stats', None),
+        ('GET', '/api/metrics/visitor_count', None),
+        ('GET', '/api/metrics/uptime', None),
+    ]
+    for path, column in (('/api/posts/{}', Post.id), ('/api/drive/pieces/{}', DrivePiece.drive_id),
+                         ('/api/travel/photos/{}', TravelPhoto.id)):
+        ident = middle(column)
+        if ident is not None:
+            requests.append(('GET', path.format(ident), None))
+    return requests
+
+
+def _created(response, name):
+    """创建接口应返回 201，否则后续请求拿不到 id，直接中止"""
+    if response.status_code != 201:
+        raise RuntimeError(f"{name} 返回 {response.status_code}，期望 201: {response.get_data(as_text=True)[:200]}")
+    return response.get_json()
+
+
+def _write_flows(client, timed, upload):
+    """一轮增改删流程，接口名使用路由规则，便于跨轮次汇总"""
+    response = timed('POST /api/drive/add', lambda: client.post('/api/drive/add', json={
+        'set_name': '啄木鸟电音', 'position': 4, 'main_stat_name': '暴击伤害',
+        'substats': ['攻击力百分比', '暴击率', '穿透率'],
+    }))
+    drive_id = _created(response, 'POST /api/drive/add')['drive']['drive_id']
+    rule = '/api/drive/pieces/<drive_id>'
+    detail = timed(f'GET {rule}', lambda: client.get(f'/api/drive/pieces/{drive_id}')).get_json()
+    substat_id = detail['substats_with_levels'][0]['substat_id']
+    timed(f'POST {rule}/upgrade', lambda: client.post(f'/api/drive/pieces/{drive_id}/upgrade',
+                                                    json={'upgrade_type': 'new'}))
+    timed(f'POST {rule}/upgrade', lambda: client.post(f'/api/drive/pieces/{drive_id}/upgrade',
+                                                    json={'upgrade_type': 'existing', 'substat_id': substat_id}))
+    timed(f'POST {rule}/downgrade', lambda: client.post(f'/api/drive/pieces/{drive_id}/downgrade',
+                                                      json={'substat_id': substat_id}))
+    timed(f'DELETE {rule}', lambda: client.delete(f'/api/drive/pieces/{drive_id}'))
+
+    response = timed('POST /api/posts', lambda: client.post('/api/posts', json={
+        'title': '基准测试文章', 'excerpt': '摘要', 'content': '正文内容。' * 500,
+    }))
+    post_id = _created(response, 'POST /api/posts')['id']
+    timed('PUT /api/posts/<post_id>', lambda: client.put(f'/api/posts/{post_id}', json={'title': '基准测试文章（改）'}))
+    timed('DELETE /api/posts/<post_id>', lambda: client.delete(f'/api/posts/{post_id}'))
+
+    if upload:
+        response = timed('POST /api/travel/upload', lambda: client.post('/api/travel/upload', data={
+            'file': (io.BytesIO(upload), 'bench.jpg'), 'title': '基准测试照片', 'category': '风景',
+        }, content_type='multipart/form-data'))
+        photo_id = _created(response, 'POST /api/travel/upload')['photo']['id']
+        timed('DELETE /api/travel/photos/<photo_id>', lambda: client.delete(f'/api/travel/photos/{photo_id}'))
+
+
+def _sample_jpeg():
+    """生成一张 1600x1200 的 JPEG 用于上传接口，没有安装 Pillow 时跳过上传"""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    buffer = io.BytesIO()
+    Image.effect_mandelbrot((1600, 1200), (-2, -1.2, 1, 1.2), 64).convert('RGB').save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def bench_in_process(app, iterations, upload):
+    """测试客户端请求所有接口，返回 {接口: {p50, p95, p99, mean, count, queries_per_request, errors}}"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    queries = [0]
+
+    def count_query(*args):
+        queries[0] += 1
+
+    samples = {}
+
+    def timed(name, send):
+        queries[0] = 0
+        started = time.perf_counter()
+        response = send()
+        elapsed = (time.perf_counter() - started) * 1000
+        entry = samples.setdefault(name, {'latency': [], 'queries': [], 'errors': 0})
+        entry['latency'].append(elapsed)
+        entry['queries'].append(queries[0])
+        if response.status_code >= 400:
+            entry['errors'] += 1
+            print(f"⚠️  {name} 返回 {response.status_code}: {response.get_data(as_text=True)[:200]}")
+        return response
+
+    client = app.test_client()
+    with app.app_context():
+        requests = read_requests()
+
+    event.listen(Engine, 'before_cursor_execute', count_query)
+    try:
+        # 预热一轮（建立连接、填充 SQLite 页缓存），不计入结果
+        for method, path, body in requests:
+            client.open(path, method=method, json=body)
+        for _ in range(iterations):
+            for method, path, body in requests:
+                timed(f'{method} {path}', lambda: client.open(path, method=method, json=body))
+            _write_flows(client, timed, upload)
+    finally:
+        event.remove(Engine, 'before_cursor_execute', count_query)
+
+    return {name: dict(percentiles(entry['latency']), count=len(entry['latency']), errors=entry['errors'],
+                       queries_per_request=round(sum(entry['queries']) / len(entry['queries']), 2))
+            for name, entry in samples.items()}
+
+
+def _scale_models():
+    """记录数据规模时统计的表"""
+    from models.blog import Post
+    from models.drive_piece import DrivePiece
+    from models.travel_photo import TravelPhoto
+    return {'drives': DrivePiece, 'posts': Post, 'photos': TravelPhoto}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def bench_http(instance_dir, requests, workers, duration, processes, threads):
+    """启动 gunicorn 后压测读接口，返回 http_load 的汇总；没有安装 gunicorn 时返回 None"""
+    gunicorn = shutil.which('gunicorn')
+    if not gunicorn:
+        print("未找到 gunicorn，跳过进程外压测。")
+        return None
+
+    port = _free_port()
+    env = dict(os.environ, INSTANCE_DIR=instance_dir)
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    server = subprocess.Popen(
+        [gunicorn, '-w', str(workers), '--preload', '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'run:app'],
+        cwd=BACKEND_DIR, env=env,
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.time() + 60
+        while True:
+            try:
+                urllib.request.urlopen(f'{base_url}/api/metrics/uptime', timeout=2).read()
+                break
+            except OSError:
+                if server.poll() is not None or time.time() > deadline:
+                    raise RuntimeError("gunicorn 启动失败")
+                time.sleep(0.2)
+        run_load(base_url, requests, duration=min(duration, 2), processes=processes, threads=threads)
+        return run_load(base_url, requests, duration=duration, processes=processes, threads=threads)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def compare(old_path, new_path):
+    """按接口列出两次结果的 p50/p95/每请求 SQL 数变化"""
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+    print(f"旧: {old['meta']['commit']} {old['meta']['timestamp']}  新: {new['meta']['commit']} {new['meta']['timestamp']}")
+    if old['meta']['scale'] != new['meta']['scale']:
+        print(f"⚠️  数据规模不同: {old['meta']['scale']} / {new['meta']['scale']}")
+
+    def change(a, b):
+        if a is None or b is None:
+            return '-'
+        return f"{a:.1f}→{b:.1f} ({(b - a) / a * 100:+.0f}%)" if a else f"{a:.1f}→{b:.1f}"
+
+    for section in ('in_process', 'http'):
+        if not old.get(section) or not new.get(section):
+            continue
+        print(f"\n--- {section} ---")
+        print(f"{'接口':<44}{'p50 (ms)':>24}{'p95 (ms)':>24}{'SQL/请求 或 请求/s':>22}")
+        for name in sorted(set(old[section]) & set(new[section])):
+            a, b = old[section][name], new[section][name]
+            extra_key = 'queries_per_request' if section == 'in_process' else 'rps'
+            print(f"{name:<44}{change(a['p50'], b['p50']):>24}{change(a['p95'], b['p95']):>24}"
+                  f"{change(a.get(extra_key), b.get(extra_key)):>22}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='API 基准测试')
+    parser.add_argument('--instance-dir', help='数据目录，默认使用临时目录（不要指向正式的 instance 目录）')
+    parser.add_argument('--drives', type=int, default=10000)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--photos', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=30, help='进程内每个接口的请求轮数')
+    parser.add_argument('--cache', default='none', help='响应缓存后端: none/lru/disk')
+    parser.add_argument('--no-upload', action='store_true', help='跳过上传接口（会在 uploads/travel 中写入临时文件）')
+    parser.add_argument('--no-http', action='store_true', help='跳过 gunicorn 压测')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker 数')
+    parser.add_argument('--processes', type=int, default=2, help='压测进程数')
+    parser.add_argument('--threads', type=int, default=8, help='每个压测进程的线程数')
+    parser.add_argument('--duration', type=float, default=10, help='压测时长（秒）')
+    parser.add_argument('--output', help='结果文件路径')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='对比两次结果后退出')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    temp_dir = None
+    instance_dir = args.instance_dir
+    if not instance_dir:
+        temp_dir = tempfile.TemporaryDirectory()
+        instance_dir = temp_dir.name
+    os.makedirs(instance_dir, exist_ok=True)
+    # 每轮都会连续调用写接口，超出限流预算后会返回 429，基准测试中关闭限流
+    os.environ.update(INSTANCE_DIR=instance_dir, RESPONSE_CACHE_BACKEND=args.cache, RATE_LIMIT_BACKEND='none',
+                      SLOW_QUERY_MS='0')
+
+    try:
+        import run
+        from benchmarks import synthetic
+        from models.set_type import SetType
+
+        app = run.create_app(boot_mode='upgrade')
+        with app.app_context():
+            if SetType.query.first() is None:
+                synthetic.generate(args.drives, args.posts, args.photos, args.seed)
+            else:
+                print(f"复用 {instance_dir} 中已有的数据")
+            requests = read_requests()
+            scale = {name: model.query.count() for name, model in _scale_models().items()}
+
+        print(f"\n=== 进程内（测试客户端，{args.iterations} 轮）===")
+        upload = None if args.no_upload else _sample_jpeg()
+        in_process = bench_in_process(app, args.iterations, upload)
+        print(f"{'接口':<48}{'p50':>9}{'p95':>9}{'p99':>9}{'SQL/请求':>10}")
+        for name, row in in_process.items():
+            print(f"{name:<48}{row['p50']:>9.2f}{row['p95']:>9.2f}{row['p99']:>9.2f}{row['queries_per_request']:>10.1f}")
+
+        http = None
+        if not args.no_http:
+            print(f"\n=== 进程外（gunicorn -w {args.workers}，{args.processes}x{args.threads} 并发，{args.duration:g}s）===")
+            http = bench_http(instance_dir, requests, args.workers, args.duration, args.processes, args.threads)
+            if http:
+                print_summary(http)
+    finally:
+        if temp_dir:
+            temp_dir.cleanup()
+
+    commit = _git_commit()
+    result = {
+        'meta': {
+            'commit': commit,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'scale': scale,
+            'iterations': args.iterations,
+            'http': None if args.no_http else {'workers': args.workers, 'processes': args.processes,
+                                               'threads': args.threads, 'duration': args.duration},
+            'env': {key: os.environ.get(key) for key in ENV_KEYS if os.environ.get(key) is not None},
+        },
+        'in_process': in_process,
+        'http': http,
+    }
+    output = args.output or os.path.join(
+        BACKEND_DIR, 'benchmarks', 'results', f'{commit}-{datetime.now():%Y%m%d-%H%M%S}.json'
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {output}")
+
+
+if __name__ == '__main__':
+    main()
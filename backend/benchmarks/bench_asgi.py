@@ -0,0 +1,187 @@
+# backend/benchmarks/bench_asgi.py
+"""
+WSGI 与 ASGI 部署对比
+分别启动 gunicorn 同步 worker（run:app）和 uvicorn（asgi:app），相同 worker 数，
+在若干慢速下载（限速读取一张大图）和慢速上传（限速发送请求体）持续进行的同时，
+用 http_load 压测读接口，比较读接口的吞吐量和延迟分位数，以及慢速请求完成的次数。
+
+用法: python -m benchmarks.bench_asgi [--workers 4] [--slow-downloads 8] [--slow-uploads 8] [--duration 10]
+                                    [--drives 5000] [--instance-dir DIR] [--output result.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from benchmarks.bench_api import BACKEND_DIR, _free_port
+from benchmarks.http_load import print_summary, run_load
+
+READ_PATHS = ['/api/posts', '/api/drive/pieces', '/api/drive/stats', '/api/travel/photos', '/api/profile/stats']
+
+LARGE_FILE = 'bench_asgi_large.jpg'
+LARGE_FILE_SIZE = 4 * 1024 * 1024
+# 慢速客户端每次读写的字节数和间隔
+SLOW_CHUNK = 32 * 1024
+SLOW_INTERVAL = 0.05
+UPLOAD_SIZE = 1024 * 1024
+
+
+def _slow_download(port, stop, done):
+    while not stop.is_set():
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=60) as sock:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SLOW_CHUNK)
+                sock.sendall(f'GET /api/travel/photos/file/{LARGE_FILE} HTTP/1.1\r\n'
+                             f'Host: 127.0.0.1\r\nConnection: close\r\n\r\n'.encode())
+                received = 0
+                while not stop.is_set():
+                    chunk = sock.recv(SLOW_CHUNK)
+                    if not chunk:
+                        break
+                    received += len(chunk)
+                    time.sleep(SLOW_INTERVAL)
+                if received >= LARGE_FILE_SIZE:
+                    done.append('download')
+        except OSError:
+            time.sleep(SLOW_INTERVAL)
+
+
+def _slow_upload(port, stop, done):
+    boundary = 'benchasgi'
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="slow.txt"\r\n'
+            f'Content-Type: text/plain\r\n\r\n').encode()
+    tail = f'\r\n--{boundary}--\r\n'.encode()
+    body = head + b'x' * (UPLOAD_SIZE - len(head) - len(tail)) + tail
+    while not stop.is_set():
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=60) as sock:
+                sock.sendall(f'POST /api/travel/upload HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n'
+                             f'Content-Type: multipart/form-data; boundary={boundary}\r\n'
+                             f'Content-Length: {len(body)}\r\n\r\n'.encode())
+                for offset in range(0, len(body), SLOW_CHUNK):
+                    if stop.is_set():
+                        return
+                    sock.sendall(body[offset:offset + SLOW_CHUNK])
+                    time.sleep(SLOW_INTERVAL)
+                if sock.recv(64).startswith(b'HTTP/1.1 4'):
+                    # 文件类型不允许，返回 400：请求体已被完整读取
+                    done.append('upload')
+        except OSError:
+            time.sleep(SLOW_INTERVAL)
+
+
+def server_command(mode, workers, port):
+    if mode == 'wsgi':
+        return [shutil.which('gunicorn'), '-w', str(workers), '--preload', '-b', f'127.0.0.1:{port}',
+                '--log-level', 'warning', 'run:app']
+    return [sys.executable, '-m', 'uvicorn', 'asgi:app', '--workers', str(workers), '--host', '127.0.0.1',
+            '--port', str(port), '--log-level', 'warning', '--no-access-log']
+
+
+def start_server(command, port, env):
+    """启动服务并等待接口可用"""
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    deadline = time.time() + 60
+    while True:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/metrics/uptime', timeout=2).read()
+            return server
+        except OSError:
+            if server.poll() is not None or time.time() > deadline:
+                server.terminate()
+                raise RuntimeError(f"服务启动失败: {' '.join(command)}")
+            time.sleep(0.2)
+
+
+def bench(make_command, instance_dir, args, env=None):
+    """make_command(端口) 返回启动命令；在慢速请求进行的同时压测读接口"""
+    port = _free_port()
+    env = dict(os.environ, INSTANCE_DIR=instance_dir, RESPONSE_CACHE_BACKEND='none', **(env or {}))
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    server = start_server(make_command(port), port, env)
+    stop, done = threading.Event(), []
+    clients = [threading.Thread(target=_slow_download, args=(port, stop, done), daemon=True)
+               for _ in range(args.slow_downloads)]
+    clients += [threading.Thread(target=_slow_upload, args=(port, stop, done), daemon=True)
+                for _ in range(args.slow_uploads)]
+    try:
+        requests = [('GET', path, None) for path in READ_PATHS]
+        run_load(f'http://127.0.0.1:{port}', requests, duration=2, processes=1, threads=args.threads)
+        for client in clients:
+            client.start()
+        time.sleep(1)
+        summary = run_load(f'http://127.0.0.1:{port}', requests, duration=args.duration,
+                           processes=args.processes, threads=args.threads)
+        summary['_slow'] = {'downloads': done.count('download'), 'uploads': done.count('upload')}
+        return summary
+    finally:
+        stop.set()
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def add_arguments(parser, slow=8):
+    parser.add_argument('--slow-downloads', type=int, default=slow)
+    parser.add_argument('--slow-uploads', type=int, default=slow)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--drives', type=int, default=5000)
+    parser.add_argument('--instance-dir', help='数据目录，默认使用临时目录并生成合成数据')
+    parser.add_argument('--output', help='结果写入 JSON 文件')
+
+
+def prepare(args):
+    """准备数据目录（没有数据时生成合成数据）和慢速下载用的大图，返回 (数据目录, 大图路径)"""
+    instance_dir = args.instance_dir or tempfile.mkdtemp(prefix='bench_server_')
+    if not os.path.exists(os.path.join(instance_dir, 'drive_stats.db')):
+        os.environ['INSTANCE_DIR'] = instance_dir
+        from run import create_app
+        from benchmarks import synthetic
+        with create_app(boot_mode='upgrade').app_context():
+            synthetic.generate(args.drives, posts=500, photos=500, log=print)
+
+    large_file = os.path.join(BACKEND_DIR, 'uploads', 'travel', LARGE_FILE)
+    os.makedirs(os.path.dirname(large_file), exist_ok=True)
+    with open(large_file, 'wb') as f:
+        f.write(os.urandom(LARGE_FILE_SIZE))
+    return instance_dir, large_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WSGI 与 ASGI 部署对比')
+    parser.add_argument('--workers', type=int, default=4)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    instance_dir, large_file = prepare(args)
+
+    results = {}
+    try:
+        for mode in ('wsgi', 'asgi'):
+            print(f"\n=== {mode}（{args.workers} 个 worker，{args.slow_downloads} 个慢速下载，"
+                  f"{args.slow_uploads} 个慢速上传）===")
+            results[mode] = bench(lambda port: server_command(mode, args.workers, port), instance_dir, args)
+            slow = results[mode].pop('_slow')
+            print_summary(results[mode])
+            print(f"慢速请求完成: 下载 {slow['downloads']} 次，上传 {slow['uploads']} 次")
+            results[mode]['_slow'] = slow
+    finally:
+        os.remove(large_file)
+        if not args.instance_dir:
+            shutil.rmtree(instance_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
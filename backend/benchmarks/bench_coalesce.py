@@ -0,0 +1,125 @@
+# backend/benchmarks/bench_coalesce.py
+"""
+统计接口的请求合并（single-flight）对比
+用 gunicorn 启动服务（磁盘缓存），每一轮先让统计接口的缓存失效，再同时发出一批相同的请求，
+记录每轮真正计算的次数（X-Cache: MISS）和这批请求的延迟分位数。
+依次测试 RESPONSE_CACHE_COALESCE=none / process / file。
+
+用法: python -m benchmarks.bench_coalesce [--modes none,process,file] [--workers 4] [--threads 4]
+                                        [--concurrency 32] [--rounds 20] [--path /api/drive/stats]
+                                        [--instance-dir DIR] [--output result.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+
+from benchmarks.bench_api import _free_port
+from benchmarks.bench_asgi import start_server
+from benchmarks.http_load import percentiles
+
+# 统计接口依赖的表：失效其中一个即可
+INVALIDATE_TAGS = {
+    '/api/drive/stats': ['drive_pieces'],
+    '/api/travel/stats': ['travel_photo'],
+}
+
+
+def _burst(url, concurrency):
+    """同时发出 concurrency 个请求，返回 [(耗时毫秒, X-Cache)]"""
+    barrier = threading.Barrier(concurrency)
+    results = []
+
+    def fetch():
+        barrier.wait()
+        start = time.perf_counter()
+        with urllib.request.urlopen(url, timeout=60) as response:
+            response.read()
+            state = response.headers.get('X-Cache')
+        results.append(((time.perf_counter() - start) * 1000, state))
+
+    threads = [threading.Thread(target=fetch) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def bench(mode, instance_dir, args):
+    from response_cache import DiskBackend
+
+    port = _free_port()
+    env = dict(os.environ, INSTANCE_DIR=instance_dir, RESPONSE_CACHE_BACKEND='disk', RESPONSE_CACHE_COALESCE=mode)
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    command = [shutil.which('gunicorn'), '-k', 'gthread', '-w', str(args.workers), '--threads', str(args.threads),
+               '--preload', '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'run:app']
+    server = start_server(command, port, env)
+    backend = DiskBackend(os.path.join(instance_dir, 'response_cache.db'))
+    url = f'http://127.0.0.1:{port}{args.path}'
+    latencies, misses, states = [], [], Counter()
+    try:
+        _burst(url, args.workers * args.threads)
+        for _ in range(args.rounds):
+            backend.invalidate(INVALIDATE_TAGS[args.path])
+            results = _burst(url, args.concurrency)
+            latencies += [elapsed for elapsed, _ in results]
+            states.update(state for _, state in results)
+            misses.append(sum(1 for _, state in results if state == 'MISS'))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    summary = percentiles(latencies)
+    summary['misses_per_round'] = sum(misses) / len(misses)
+    summary['states'] = dict(states)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='统计接口的请求合并对比')
+    parser.add_argument('--modes', default='none,process,file')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--path', default='/api/drive/stats', choices=sorted(INVALIDATE_TAGS))
+    parser.add_argument('--drives', type=int, default=20000)
+    parser.add_argument('--instance-dir', help='数据目录，默认使用临时目录并生成合成数据')
+    parser.add_argument('--output', help='结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    instance_dir = args.instance_dir or tempfile.mkdtemp(prefix='bench_coalesce_')
+    if not os.path.exists(os.path.join(instance_dir, 'drive_stats.db')):
+        os.makedirs(instance_dir, exist_ok=True)
+        os.environ['INSTANCE_DIR'] = instance_dir
+        from run import create_app
+        from benchmarks import synthetic
+        with create_app(boot_mode='upgrade').app_context():
+            synthetic.generate(args.drives, posts=100, photos=2000, log=print)
+
+    results = {}
+    try:
+        print(f"{args.path}，{args.workers} 个 worker x {args.threads} 线程，每轮 {args.concurrency} 个并发请求，"
+              f"{args.rounds} 轮")
+        print(f"{'合并方式':<10}{'每轮计算次数':>12}{'p50':>10}{'p95':>10}{'p99':>10}{'平均':>10}")
+        for mode in args.modes.split(','):
+            result = results[mode] = bench(mode, instance_dir, args)
+            print(f"{mode:<10}{result['misses_per_round']:>12.1f}{result['p50']:>10.1f}{result['p95']:>10.1f}"
+                  f"{result['p99']:>10.1f}{result['mean']:>10.1f}")
+    finally:
+        if not args.instance_dir:
+            shutil.rmtree(instance_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
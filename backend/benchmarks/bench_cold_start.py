@@ -0,0 +1,61 @@
+# backend/benchmarks/bench_cold_start.py
+"""
+测量不同 DB_BOOT_MODE 下的应用冷启动时间（新进程 import run 并创建应用）
+使用临时数据目录，先执行一次结构升级，不会改动 instance/ 下的数据库。
+
+用法: python -m benchmarks.bench_cold_start [--runs 5] [--modes create,check,skip]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程中执行：分别计时 import run 和访问 run.app（与 gunicorn 加载 run:app 的过程一致）
+_PROBE = (
+    "import time; started = time.perf_counter(); "
+    "import run; imported = time.perf_counter(); "
+    "run.app; "
+    "print(imported - started, time.perf_counter() - imported)"
+)
+
+
+def measure(mode, instance_dir, runs):
+    env = dict(os.environ, DB_BOOT_MODE=mode, INSTANCE_DIR=instance_dir)
+    import_timings, create_timings = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', _PROBE], cwd=BACKEND_DIR, env=env,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        import_seconds, create_seconds = output.strip().splitlines()[-1].split()
+        import_timings.append(float(import_seconds) * 1000)
+        create_timings.append(float(create_seconds) * 1000)
+    return import_timings, create_timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description='应用冷启动时间基准')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--modes', default='create,check,skip')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as instance_dir:
+        # 准备一份已升级的空数据库
+        env = dict(os.environ, INSTANCE_DIR=instance_dir)
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'run', 'upgrade-db'],
+                       cwd=BACKEND_DIR, env=env, capture_output=True, check=True)
+
+        print(f"冷启动时间（{args.runs} 次中位数，毫秒）")
+        print(f"{'模式':<10}{'import':>10}{'create_app':>12}{'create_app 最大':>16}")
+        for mode in args.modes.split(','):
+            import_timings, create_timings = measure(mode, instance_dir, args.runs)
+            print(f"{mode:<10}{statistics.median(import_timings):>10.1f}"
+                  f"{statistics.median(create_timings):>12.1f}{max(create_timings):>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
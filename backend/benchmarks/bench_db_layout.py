@@ -0,0 +1,72 @@
+# backend/benchmarks/bench_db_layout.py
+"""
+对比 DB_LAYOUT=split 与 DB_LAYOUT=attached：
+引擎数、建立的数据库连接数、进程打开的 .db 文件句柄数，以及一组跨库请求的平均耗时。
+使用临时数据目录，不会改动 instance/ 下的数据库。
+
+用法: python -m benchmarks.bench_db_layout [--requests 500]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 子进程中执行，每种布局一个全新进程
+_PROBE = '''
+import os, sys, time
+from sqlalchemy import event
+import run
+from database import db
+
+app = run.create_app()
+connects = []
+with app.app_context():
+    engines = set(db.engines.values())
+    for engine in engines:
+        event.listen(engine, 'connect', lambda *args: connects.append(1))
+
+client = app.test_client()
+paths = ['/api/profile/stats', '/api/posts', '/api/drive/stat-types', '/api/travel/stats']
+requests = int(sys.argv[1])
+started = time.perf_counter()
+for i in range(requests):
+    client.get(paths[i % len(paths)])
+elapsed = time.perf_counter() - started
+
+db_handles = 0
+for fd in os.listdir('/proc/self/fd'):
+    try:
+        if os.readlink(f'/proc/self/fd/{fd}').endswith('.db'):
+            db_handles += 1
+    except OSError:
+        pass
+print(len(engines), len(connects), db_handles, elapsed / requests * 1000)
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库布局对比')
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as instance_dir:
+        env = dict(os.environ, INSTANCE_DIR=instance_dir)
+        subprocess.run([sys.executable, '-m', 'flask', '--app', 'run', 'upgrade-db'],
+                       cwd=BACKEND_DIR, env=env, capture_output=True, check=True)
+
+        print(f"{'布局':<10}{'引擎数':>8}{'连接数':>8}{'.db句柄':>10}{'平均耗时(ms)':>14}")
+        for layout in ('split', 'attached'):
+            output = subprocess.run(
+                [sys.executable, '-c', _PROBE, str(args.requests)], cwd=BACKEND_DIR,
+                env=dict(env, DB_LAYOUT=layout, DB_BOOT_MODE='skip'),
+                capture_output=True, text=True, check=True,
+            ).stdout
+            engines, connects, handles, per_request = output.strip().splitlines()[-1].split()
+            print(f"{layout:<10}{engines:>8}{connects:>8}{handles:>10}{float(per_request):>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# backend/benchmarks/bench_gunicorn.py
+"""
+gunicorn 配置方案对比
+依次用旧的启动参数（gunicorn -w 4 --preload）和 gunicorn.conf.py 的各个方案（GUNICORN_PROFILE）启动服务，
+在慢速下载 / 上传进行的同时压测读接口（见 bench_asgi），输出读接口的延迟分位数和吞吐量。
+--slow-downloads 0 --slow-uploads 0 只测读接口本身。
+
+用法: python -m benchmarks.bench_gunicorn [--profiles legacy,sync,gthread] [--slow-downloads 4] [--slow-uploads 4]
+                                        [--duration 10] [--instance-dir DIR] [--output result.json]
+"""
+import argparse
+import json
+import os
+import shutil
+
+from benchmarks.bench_asgi import add_arguments, bench, prepare
+from benchmarks.http_load import print_summary
+
+LEGACY_WORKERS = 4
+
+
+def profile_command(profile):
+    gunicorn = shutil.which('gunicorn')
+    if profile == 'legacy':
+        return lambda port: [gunicorn, '-w', str(LEGACY_WORKERS), '--preload', '-b', f'127.0.0.1:{port}',
+                             '--log-level', 'warning', 'run:app']
+    return lambda port: [gunicorn, '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{port}',
+                         '--log-level', 'warning', 'run:app']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='gunicorn 配置方案对比')
+    parser.add_argument('--profiles', default='legacy,sync,gthread', help='legacy 为旧的 gunicorn -w 4 启动参数')
+    add_arguments(parser, slow=4)
+    args = parser.parse_args()
+
+    instance_dir, large_file = prepare(args)
+    results = {}
+    try:
+        for profile in args.profiles.split(','):
+            print(f"\n=== {profile}（{args.slow_downloads} 个慢速下载，{args.slow_uploads} 个慢速上传）===")
+            env = {} if profile == 'legacy' else {'GUNICORN_PROFILE': profile}
+            results[profile] = bench(profile_command(profile), instance_dir, args, env=env)
+            slow = results[profile].pop('_slow')
+            print_summary(results[profile])
+            print(f"慢速请求完成: 下载 {slow['downloads']} 次，上传 {slow['uploads']} 次")
+            results[profile]['_slow'] = slow
+    finally:
+        os.remove(large_file)
+        if not args.instance_dir:
+            shutil.rmtree(instance_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
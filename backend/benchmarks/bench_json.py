@@ -0,0 +1,76 @@
+# backend/benchmarks/bench_json.py
+"""
+对比列表接口的两条序列化路径：
+- ORM: 查询模型对象，逐行 to_dict()（isoformat），再 jsonify
+- 按列: 只查询 json_columns()，rows_to_dicts() 后交给序列化器处理 datetime
+每条路径分别用标准库 json 和 orjson 输出，统计查询 + 序列化的平均耗时。
+使用临时数据目录，不会改动 instance/ 下的数据库。
+
+用法: python -m benchmarks.bench_json [--rows 5000] [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def _time(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON 序列化路径对比')
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as instance_dir:
+        os.environ.update(INSTANCE_DIR=instance_dir, RESPONSE_CACHE_BACKEND='none')
+        import run
+        import json_provider
+        from database import db
+        from models.travel_photo import TravelPhoto
+
+        app = run.create_app(boot_mode='upgrade')
+        providers = {name: json_provider.get_provider_class(name)[1](app)
+                     for name in json_provider.PROVIDERS if name != 'orjson' or json_provider.orjson}
+
+        with app.app_context():
+            now = datetime.utcnow()
+            db.session.execute(TravelPhoto.__table__.insert(), [{
+                'title': f'照片 {i}', 'description': '基准测试数据 ' * 8, 'category': 'landscape',
+                'file_name': f'{i}.jpg', 'file_path': f'/uploads/travel/{i}.jpg', 'file_size': 123456,
+                'file_type': 'image/jpeg', 'url': f'/api/travel/photos/file/{i}.jpg',
+                'thumbnail_url': f'/api/travel/photos/thumbnail/thumb_{i}.jpg',
+                'created_at': now - timedelta(minutes=i), 'updated_at': now,
+            } for i in range(args.rows)])
+            db.session.commit()
+
+            paths = {
+                'ORM': lambda: [photo.to_dict() for photo in TravelPhoto.query.all()],
+                '按列': lambda: json_provider.rows_to_dicts(
+                    db.session.execute(db.select(*TravelPhoto.json_columns()))),
+            }
+
+            print(f"{args.rows} 行，每项取 {args.repeat} 次的中位数")
+            print(f"{'路径':<8}{'序列化':<10}{'耗时(ms)':>10}{'响应大小(KB)':>14}")
+            with app.test_request_context():
+                for path_name, load in paths.items():
+                    for provider_name, provider in providers.items():
+                        def request():
+                            db.session.expunge_all()
+                            return provider.response(load())
+                        size = len(request().get_data()) / 1024
+                        elapsed = _time(request, args.repeat)
+                        print(f"{path_name:<8}{provider_name:<10}{elapsed:>10.2f}{size:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
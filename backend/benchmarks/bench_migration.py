@@ -0,0 +1,57 @@
+# backend/benchmarks/bench_migration.py
+"""
+迁移引擎吞吐量
+用 synthetic 生成一个驱动盘库作为源库（表结构与 MySQL 一致），再用 migration_engine 按不同块大小
+整库复制到空的目标库，输出每张表的行数和每秒行数，并核对行数。
+--source 可以改为指向 MySQL（例如容器中的测试库）: mysql://root:密码@127.0.0.1:3307/zzz_drive_stats
+
+用法: python -m benchmarks.bench_migration [--drives 100000] [--chunk-sizes 1000,5000,20000] [--source URL]
+"""
+import argparse
+import os
+import tempfile
+
+
+def main():
+    parser = argparse.ArgumentParser(description='迁移引擎吞吐量')
+    parser.add_argument('--drives', type=int, default=100000)
+    parser.add_argument('--chunk-sizes', default='1000,5000,20000')
+    parser.add_argument('--source', help='源库地址，默认生成临时 SQLite 源库')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as source_dir, tempfile.TemporaryDirectory() as target_dir:
+        os.environ.update(INSTANCE_DIR=target_dir, RESPONSE_CACHE_BACKEND='none', SLOW_QUERY_MS='0')
+        import run
+        import migration_engine
+        from benchmarks import synthetic
+        from migrate_data import TABLES
+        from sqlalchemy import func, select
+
+        source_url = args.source
+        if not source_url:
+            # 源库放在另一个数据目录，只用其中的 drive_stats.db
+            os.environ['INSTANCE_DIR'] = source_dir
+            with run.create_app(boot_mode='upgrade').app_context():
+                synthetic.generate(args.drives, posts=0, photos=0, log=lambda message: None)
+            source_url = 'sqlite:///' + os.path.join(source_dir, 'drive_stats.db')
+            os.environ['INSTANCE_DIR'] = target_dir
+
+        app = run.create_app(boot_mode='upgrade')
+        for chunk_size in (int(size) for size in args.chunk_sizes.split(',')):
+            print(f"\n=== 块大小 {chunk_size} ===")
+            source = migration_engine.open_source(source_url)
+            try:
+                with app.app_context():
+                    migration_engine.migrate(source, TABLES, chunk_size=chunk_size)
+                    for spec in TABLES:
+                        with spec.engine.connect() as conn:
+                            count = conn.execute(select(func.count()).select_from(spec.table)).scalar()
+                        expected = next(source.stream(f'SELECT COUNT(*) AS n FROM {spec.source_table}', 1))[0]['n']
+                        if count != expected:
+                            print(f"❌ {spec.table.name}: 目标 {count} 行，源库 {expected} 行")
+            finally:
+                source.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# backend/benchmarks/bench_sqlite_profile.py
+"""
+对比不同数据库配置方案下的并发写入吞吐量
+模拟多个 gunicorn worker 同时写同一个 SQLite 文件，统计每秒提交数和 "database is locked" 错误数。
+
+用法: python -m benchmarks.bench_sqlite_profile [--workers 4] [--writes 300] [--profiles legacy,wal]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import db_config
+
+
+def _make_engine(db_path, profile_name):
+    _, profile = db_config.get_profile(profile_name)
+    engine = create_engine(db_config.sqlite_url(os.path.dirname(db_path), os.path.basename(db_path)),
+                           **db_config.engine_options(profile, 'drive_stats'))
+    db_config.apply_sqlite_pragmas(engine, profile['pragmas'])
+    return engine
+
+
+def _writer(db_path, profile_name, writes, start_event, result_queue):
+    """单个写进程：每次写入一行并立即提交，并穿插一次读取"""
+    engine = _make_engine(db_path, profile_name)
+    committed = locked = 0
+    start_event.wait()
+    for i in range(writes):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("INSERT INTO bench (worker, payload) VALUES (:w, :p)"),
+                             {'w': os.getpid(), 'p': 'x' * 200})
+            with engine.connect() as conn:
+                conn.execute(text("SELECT COUNT(*) FROM bench WHERE worker = :w"), {'w': os.getpid()}).scalar()
+            committed += 1
+        except OperationalError as e:
+            if 'locked' in str(e):
+                locked += 1
+            else:
+                raise
+    engine.dispose()
+    result_queue.put((committed, locked))
+
+
+def run_profile(profile_name, workers, writes):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        engine = _make_engine(db_path, profile_name)
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE bench (id INTEGER PRIMARY KEY, worker INTEGER, payload TEXT)"))
+        engine.dispose()
+
+        start_event = multiprocessing.Event()
+        result_queue = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=_writer, args=(db_path, profile_name, writes, start_event, result_queue))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        started = time.perf_counter()
+        start_event.set()
+        results = [result_queue.get() for _ in processes]
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+
+    committed = sum(r[0] for r in results)
+    locked = sum(r[1] for r in results)
+    return {
+        'profile': profile_name,
+        'commits': committed,
+        'locked_errors': locked,
+        'seconds': round(elapsed, 3),
+        'commits_per_sec': round(committed / elapsed, 1) if elapsed > 0 else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite 配置方案并发写入基准')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--writes', type=int, default=300, help='每个进程的写入次数')
+    parser.add_argument('--profiles', default=','.join(db_config.ENGINE_PROFILES))
+    args = parser.parse_args()
+
+    print(f"并发写入基准: {args.workers} 个进程 x {args.writes} 次写入")
+    print(f"{'方案':<10}{'提交数':>8}{'锁冲突':>8}{'耗时(s)':>10}{'提交/秒':>10}")
+    for profile_name in args.profiles.split(','):
+        result = run_profile(profile_name, args.workers, args.writes)
+        print(f"{result['profile']:<10}{result['commits']:>8}{result['locked_errors']:>8}"
+              f"{result['seconds']:>10}{result['commits_per_sec']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# backend/benchmarks/http_load.py
+"""
+HTTP 压测
+在独立的进程中对运行中的服务发请求（每个进程若干线程，各自保持长连接），
+按请求统计延迟分位数和吞吐量。可单独使用，也被 bench_api 调用。
+
+用法: python -m benchmarks.http_load --url http://127.0.0.1:5000 [--paths /api/posts,/api/drive/stats]
+                                   [--processes 2] [--threads 8] [--duration 10]
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import threading
+import time
+from urllib.parse import quote, urlsplit
+
+DEFAULT_PATHS = ['/api/posts', '/api/drive/pieces', '/api/drive/stats', '/api/drive/set-types',
+                 '/api/travel/photos', '/api/travel/stats', '/api/profile/stats']
+
+
+def percentiles(samples):
+    """返回 p50/p95/p99/平均值（毫秒）"""
+    if not samples:
+        return {'p50': None, 'p95': None, 'p99': None, 'mean': None}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+    return {'p50': pick(0.50), 'p95': pick(0.95), 'p99': pick(0.99),
+            'mean': round(sum(ordered) / len(ordered), 3)}
+
+
+def _thread_loop(base_url, requests, deadline, offset, results):
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    index = offset
+    while time.perf_counter() < deadline:
+        method, path, body = requests[index % len(requests)]
+        index += 1
+        headers = {'Accept-Encoding': 'gzip'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        started = time.perf_counter()
+        try:
+            conn.request(method, quote(path, safe='/?=&%'), body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            status = 0
+        results.append((f'{method} {path}', status, (time.perf_counter() - started) * 1000))
+    conn.close()
+
+
+def _process_main(base_url, requests, duration, threads, process_index, queue):
+    results = []
+    deadline = time.perf_counter() + duration
+    workers = [
+        threading.Thread(target=_thread_loop, args=(base_url, requests, deadline, process_index * threads + i, results))
+        for i in range(threads)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    queue.put(results)
+
+
+def run_load(base_url, requests, duration=10, processes=2, threads=8):
+    """
+    requests: [(方法, 地址, JSON 请求体或 None)]，各线程轮流发送
+    返回 {请求: {p50, p95, p99, mean, count, errors, rps}}，以及 '_total' 汇总
+    """
+    queue = multiprocessing.Queue()
+    workers = [
+        multiprocessing.Process(target=_process_main, args=(base_url, requests, duration, threads, i, queue))
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    results = [item for _ in workers for item in queue.get()]
+    for worker in workers:
+        worker.join()
+
+    by_request = {}
+    for name, status, elapsed in results:
+        by_request.setdefault(name, []).append((status, elapsed))
+
+    summary = {}
+    for name, items in sorted(by_request.items()):
+        summary[name] = dict(
+            percentiles([elapsed for status, elapsed in items if 0 < status < 500]),
+            count=len(items),
+            errors=sum(1 for status, _ in items if status == 0 or status >= 500),
+            rps=round(len(items) / duration, 1),
+        )
+    summary['_total'] = dict(
+        percentiles([elapsed for _, status, elapsed in results if 0 < status < 500]),
+        count=len(results),
+        errors=sum(1 for _, status, _ in results if status == 0 or status >= 500),
+        rps=round(len(results) / duration, 1),
+    )
+    return summary
+
+
+def print_summary(summary):
+    print(f"{'请求':<40}{'p50':>9}{'p95':>9}{'p99':>9}{'请求/s':>10}{'错误':>7}")
+    for name, row in summary.items():
+        p50, p95, p99 = (f"{row[key]:.1f}" if row[key] is not None else '-' for key in ('p50', 'p95', 'p99'))
+        print(f"{name:<40}{p50:>9}{p95:>9}{p99:>9}{row['rps']:>10.1f}{row['errors']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP 压测')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--paths', default=','.join(DEFAULT_PATHS), help='逗号分隔的 GET 地址')
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--output', help='结果写入 JSON 文件')
+    args = parser.parse_args()
+
+    requests = [('GET', path, None) for path in args.paths.split(',') if path]
+    summary = run_load(args.url, requests, args.duration, args.processes, args.threads)
+    print_summary(summary)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+# backend/benchmarks/synthetic.py
+"""
+合成数据生成
+按指定规模生成驱动盘（含副词条和强化记录）、博客文章和旅行照片，分批批量写入，
+百万级驱动盘也不会一次占用大量内存。主词条按位置取值（与前端 useDriveForm.ts 一致），
+副词条 3~4 条、强化次数 0~5 次随机分配，分布接近实际游戏数据。相同的 --seed 生成相同的数据。
+
+只能写入空库；为避免覆盖正式数据，命令行必须显式指定数据目录。
+
+用法: python -m benchmarks.synthetic --instance-dir /tmp/bench --drives 100000 [--posts 2000] [--photos 2000]
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+SET_NAMES = [
+    '啄木鸟电音', '激素朋克', '极地重金属', '河豚电音', '混沌爵士', '自由蓝调', '震星迪斯科',
+    '原始朋克', '摇摆爵士', '灵魂摇滚', '雷暴重金属', '獠牙重金属', '混沌重金属', '炎狱重金属',
+]
+
+POSITION_MAIN_STATS = {
+    1: ['生命值'],
+    2: ['攻击力'],
+    3: ['防御力'],
+    4: ['异常精通', '生命值百分比', '攻击力百分比', '防御力百分比', '暴击伤害', '暴击'],
+    5: ['以太伤害加成', '冰属性伤害加成', '火属性伤害加成', '物理伤害加成', '电属性伤害加成',
+        '攻击力百分比', '生命值百分比', '防御力百分比', '穿透率'],
+    6: ['冲击力', '异常掌控', '能量回复', '攻击力百分比', '生命值百分比', '防御力百分比'],
+}
+
+SUBSTATS = ['生命值', '生命值百分比', '攻击力', '攻击力百分比', '防御力', '防御力百分比',
+            '暴击率', '暴击伤害', '穿透率', '异常精通']
+
+PHOTO_CATEGORIES = ['风景', '人物', '美食', '建筑', '游戏截图', '生活记录', '其他']
+
+BATCH_SIZE = 10000
+
+
+def _seed_types():
+    """写入套装和词条类型，返回 (套装 id 列表, {词条名: id})"""
+    from database import db
+    from models.set_type import SetType
+    from models.stat_type import StatType
+
+    main_stats = {name for names in POSITION_MAIN_STATS.values() for name in names}
+    for name in SET_NAMES:
+        db.session.add(SetType(set_name=name))
+    for name in sorted(main_stats | set(SUBSTATS)):
+        kind = 'both' if name in main_stats and name in SUBSTATS else ('main' if name in main_stats else 'sub')
+        db.session.add(StatType(stat_name=name, stat_type=kind))
+    db.session.commit()
+    set_ids = [set_type.set_id for set_type in SetType.query.order_by(SetType.set_id)]
+    stat_ids = {stat.stat_name: stat.stat_type_id for stat in StatType.query}
+    return set_ids, stat_ids
+
+
+def _drive_rows(rng, first_id, count, set_ids, stat_ids, now):
+    """生成一批驱动盘，返回 (驱动盘行, 副词条行, 强化记录行)"""
+    pieces, substats, upgrades = [], [], []
+    substat_id = first_id * 4
+    for drive_id in range(first_id, first_id + count):
+        position = rng.randint(1, 6)
+        main_stat = rng.choice(POSITION_MAIN_STATS[position])
+        # 初始 3 条副词条的占多数；3 条时第一次强化补出第 4 条
+        initial = 4 if rng.random() < 0.3 else 3
+        total_upgrades = rng.choices(range(6), weights=[20, 10, 10, 10, 10, 40])[0]
+        names = rng.sample([name for name in SUBSTATS if name != main_stat], 4 if total_upgrades or initial == 4 else 3)
+        counts = [0] * len(names)
+        for _ in range(total_upgrades - (4 - initial if total_upgrades else 0)):
+            counts[rng.randrange(len(names))] += 1
+
+        created_at = now - timedelta(minutes=drive_id)
+        levels = []
+        pieces.append({
+            'drive_id': drive_id, 'set_id': rng.choice(set_ids), 'position': position,
+            'main_stat_id': stat_ids[main_stat], 'main_stat_level': 15, 'total_upgrades': total_upgrades,
+            'substats': names, 'substat_levels': levels, 'created_at': created_at, 'updated_at': created_at,
+        })
+        for index, (name, upgrade_count) in enumerate(zip(names, counts)):
+            substats.append({'id': substat_id, 'drive_id': drive_id, 'stat_id': stat_ids[name],
+                             'created_at': created_at})
+            upgrades.append({'drive_id': drive_id, 'substat_id': substat_id, 'is_original': index < initial,
+                             'upgrade_count': upgrade_count, 'created_at': created_at, 'updated_at': created_at})
+            levels.append([substat_id, stat_ids[name], upgrade_count, index < initial])
+            substat_id += 1
+    return pieces, substats, upgrades
+
+
+def generate(drives=10000, posts=2000, photos=2000, seed=42, log=print):
+    """在当前应用上下文的数据库中生成数据（库中不能已有驱动盘、文章或照片）"""
+    from database import db
+    from db_bulk import bulk_insert, reset_sequence
+    from models.blog import Post
+    from models.drive_piece import DrivePiece, DrivePieceSubstat
+    from models.set_type import SetType
+    from models.travel_photo import TravelPhoto
+    from models.upgrade_record import UpgradeRecord
+
+    if SetType.query.first() or Post.query.first() or TravelPhoto.query.first():
+        raise RuntimeError("数据库中已有数据，合成数据只能写入空库")
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    set_ids, stat_ids = _seed_types()
+
+    started = time.perf_counter()
+    conn = db.session.connection(bind_arguments={'mapper': DrivePiece})
+    for first_id in range(1, drives + 1, BATCH_SIZE):
+        pieces, substats, upgrades = _drive_rows(
+            rng, first_id, min(BATCH_SIZE, drives + 1 - first_id), set_ids, stat_ids, now
+        )
+        bulk_insert(conn, DrivePiece.__table__, pieces)
+        bulk_insert(conn, DrivePieceSubstat.__table__, substats)
+        bulk_insert(conn, UpgradeRecord.__table__, upgrades)
+        log(f"驱动盘 {first_id + len(pieces) - 1}/{drives}")
+    for table in (DrivePiece.__table__, DrivePieceSubstat.__table__):
+        reset_sequence(conn, table)
+
+    bulk_insert(db.session.connection(bind_arguments={'mapper': Post}), Post.__table__, [{
+        'title': f'合成文章 {i}', 'excerpt': '摘要 ' * 20, 'content': '正文内容。' * rng.randint(200, 2000),
+        'image_url': f'/images/cover_{i % 50}.jpg', 'views': rng.randint(0, 5000),
+        'created_at': now - timedelta(hours=i), 'updated_at': now - timedelta(hours=i),
+    } for i in range(posts)])
+
+    bulk_insert(db.session.connection(bind_arguments={'mapper': TravelPhoto}), TravelPhoto.__table__, [{
+        'title': f'合成照片 {i}', 'description': '旅行记录 ' * rng.randint(0, 30),
+        'category': rng.choice(PHOTO_CATEGORIES), 'file_name': f'synthetic_{i}.jpg',
+        'file_path': f'/app/uploads/travel/synthetic_{i}.jpg', 'file_size': rng.randint(200_000, 8_000_000),
+        'file_type': 'image/jpeg', 'url': f'/api/travel/photos/file/synthetic_{i}.jpg',
+        'thumbnail_url': f'/api/travel/photos/thumbnail/thumb_synthetic_{i}.jpg',
+        'created_at': now - timedelta(hours=i * 3), 'updated_at': now - timedelta(hours=i * 3),
+    } for i in range(photos)])
+
+    db.session.commit()
+    log(f"生成完成: 驱动盘 {drives}，文章 {posts}，照片 {photos}，用时 {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成合成数据')
+    parser.add_argument('--instance-dir', required=True, help='数据目录（不要指向正式的 instance 目录）')
+    parser.add_argument('--drives', type=int, default=10000)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--photos', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    os.makedirs(args.instance_dir, exist_ok=True)
+    os.environ['INSTANCE_DIR'] = args.instance_dir
+    import run
+
+    app = run.create_app(boot_mode='upgrade')
+    with app.app_context():
+        generate(args.drives, args.posts, args.photos, args.seed)
+
+
+if __name__ == '__main__':
+    main()
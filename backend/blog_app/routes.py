@@ -2,23 +2,31 @@ from flask import request, jsonify, Blueprint, current_app
 # **关键修改：从通用 models 包导入 Post 模型**
 from models.blog import Post
 from database import db 
+from response_cache import cached
+from rate_limit import rate_limit
+from conditional import conditional, not_modified, add_validators, row_validators
+from json_provider import rows_to_dicts
+from image_placeholder import url_placeholder
 
 blog_bp = Blueprint('blog_bp', __name__, url_prefix='/api')
 
 # --- API Endpoints ---
 
 @blog_bp.route('/posts', methods=['GET'])
+@conditional('post')
+@cached('post')
 def get_posts():
     """
     Retrieves a list of all blog posts.
     """
     current_app.logger.info("Received GET request for all posts.")
-    posts = Post.query.all()
-    posts_data = [post.to_dict() for post in posts]
+    # Select only the serialized columns; rows go straight to the JSON provider
+    posts_data = rows_to_dicts(db.session.execute(db.select(*Post.json_columns())))
     current_app.logger.info(f"Returning {len(posts_data)} posts.")
     return jsonify(posts_data)
 
 @blog_bp.route('/posts', methods=['POST'])
+@rate_limit('post_write', rate=0.5, burst=10)
 def create_post():
     """
     Creates a new blog post.
@@ -44,6 +52,7 @@ def create_post():
         excerpt=excerpt,
         content=content,
         image_url=image_url, 
+        placeholder=url_placeholder(image_url),
         views=0 
     )
     db.session.add(new_post)
@@ -56,26 +65,36 @@ def create_post():
 def get_post(post_id):
     """
     Retrieves a single blog post by its ID and increments its view count.
+    The view is counted even when the client's cached copy is still valid (304).
     """
     current_app.logger.info(f"Received GET request for post ID: {post_id}")
-    post = db.session.get(Post, post_id) 
-    
-    if post is None:
+
+    # Single UPDATE instead of read-modify-write; keeping updated_at means a view
+    # does not count as an edit, so the post's ETag only changes when its content does.
+    # It runs on the session's connection rather than session.execute so the response
+    # cache does not see a write to `post`: otherwise every view would drop the cached
+    # /api/posts list and its ETag. The view counts in the list therefore lag until
+    # the next real edit of any post.
+    result = db.session.connection(bind_arguments={'mapper': Post}).execute(
+        db.update(Post)
+        .where(Post.id == post_id)
+        .values(views=db.func.coalesce(Post.views, 0) + 1, updated_at=Post.updated_at)
+    )
+    if result.rowcount == 0:
+        db.session.rollback()
         current_app.logger.warning(f"Post with ID {post_id} not found.")
         return jsonify({"error": "Post not found"}), 404
-    
-    current_app.logger.info(f"Post '{post.title}' (ID: {post_id}) current views: {post.views}")
+    db.session.commit()
+    current_app.logger.info(f"Views for post ID {post_id} committed to DB.")
 
-    if post.views is None:
-        current_app.logger.info(f"Initializing views for post ID {post_id} from None to 0.")
-        post.views = 0
-        
-    post.views += 1
-    current_app.logger.info(f"Post '{post.title}' (ID: {post_id}) new views (before commit): {post.views}")
-    db.session.commit() 
-    current_app.logger.info(f"Views for post ID {post_id} committed to DB. Final views: {post.views}")
+    # The view counter is not part of the validator, so a weak ETag is used
+    etag, last_modified = row_validators(Post, post_id)
+    response = not_modified(etag, last_modified)
+    if response is not None:
+        return response
 
-    return jsonify(post.to_dict())
+    post = db.session.get(Post, post_id)
+    return add_validators(jsonify(post.to_dict()), etag, last_modified)
 
 @blog_bp.route('/posts/<int:post_id>', methods=['PUT'])
 def update_post(post_id):
@@ -104,6 +123,7 @@ def update_post(post_id):
         post.content = data['content']
     if 'imageUrl' in data:
         post.image_url = data['imageUrl']
+        post.placeholder = url_placeholder(post.image_url)
     
     db.session.commit()
     current_app.logger.info(f"Post '{post.title}' (ID: {post_id}) updated successfully")
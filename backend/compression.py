@@ -0,0 +1,202 @@
+# backend/compression.py
+"""
+响应压缩
+根据请求的 Accept-Encoding 选择 zstd / br / gzip 压缩 JSON 和文本响应。
+brotli 和 zstandard 为可选依赖，未安装时只协商已安装的算法（gzip 始终可用）。
+
+- COMPRESS_ALGORITHMS: 服务端优先顺序，默认 zstd,br,gzip；设为空字符串关闭压缩
+- COMPRESS_MIN_SIZE: 小于该字节数的响应不压缩，默认 1024
+- COMPRESS_GZIP_LEVEL / COMPRESS_BR_LEVEL / COMPRESS_ZSTD_LEVEL: 压缩级别
+- COMPRESS_CACHE_SIZE: 压缩结果缓存的字节上限，默认 32MB，0 表示不缓存
+
+带 ETag 的响应（见 conditional.py）是会被反复请求的内容，压缩结果按 (内容摘要, 算法) 缓存在进程内，
+缓存命中时不再重复压缩。ETag 不一定覆盖响应的全部内容（如文章详情的 views 不计入 ETag），所以缓存键用响应体的摘要。流式响应（如 /api/travel/manifest）边生成边压缩，每块数据都刷新输出，不做缓存。
+"""
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - 可选依赖
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - 可选依赖
+    zstandard = None
+
+DEFAULT_LEVELS = {'gzip': 6, 'br': 5, 'zstd': 3}
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'application/javascript', 'image/svg+xml')
+
+
+def _gzip(data, level):
+    # mtime=0 使相同内容的压缩结果逐字节一致
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _brotli(data, level):
+    return brotli.compress(data, quality=level)
+
+
+def _zstd(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _compress_stream(name, level, chunks):
+    """逐块压缩，每块之后刷新，客户端可以边收边解析"""
+    if name == 'gzip':
+        encoder = zlib.compressobj(level, zlib.DEFLATED, 31)
+        process, flush, finish = encoder.compress, lambda: encoder.flush(zlib.Z_SYNC_FLUSH), encoder.flush
+    elif name == 'br':
+        encoder = brotli.Compressor(quality=level)
+        process, flush, finish = encoder.process, encoder.flush, encoder.finish
+    else:
+        encoder = zstandard.ZstdCompressor(level=level).compressobj()
+        process, finish = encoder.compress, encoder.flush
+        flush = lambda: encoder.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+    for chunk in chunks:
+        if chunk:
+            yield process(chunk) + flush()
+    yield finish()
+
+
+def available_encoders():
+    encoders = {'gzip': _gzip}
+    if brotli is not None:
+        encoders['br'] = _brotli
+    if zstandard is not None:
+        encoders['zstd'] = _zstd
+    return encoders
+
+
+class CompressedCache:
+    """进程内 LRU，按总字节数限制大小"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def set(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class Compressor:
+    """单个应用的压缩设置，保存在 app.extensions['compression']"""
+
+    def __init__(self, algorithms, levels, min_size, cache_size):
+        encoders = available_encoders()
+        self.algorithms = [name for name in algorithms if name in encoders]
+        self.encoders = encoders
+        self.levels = levels
+        self.min_size = min_size
+        self.cache = CompressedCache(cache_size) if cache_size > 0 else None
+
+    def negotiate(self, accept_encodings):
+        """按客户端 q 值选择算法，q 值相同时按服务端顺序"""
+        best, best_quality = None, 0
+        for name in self.algorithms:
+            quality = accept_encodings[name]
+            if quality > best_quality:
+                best, best_quality = name, quality
+        return best
+
+    def compress(self, name, data):
+        return self.encoders[name](data, self.levels[name])
+
+
+def _compressible(response):
+    if response.status_code != 200 or response.direct_passthrough:
+        return False
+    if 'Content-Encoding' in response.headers:
+        return False
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def init_app(app):
+    algorithms = [name.strip() for name in app.config.get('COMPRESS_ALGORITHMS', 'zstd,br,gzip').split(',')
+                  if name.strip()]
+    unknown = set(algorithms) - set(DEFAULT_LEVELS)
+    if unknown:
+        raise ValueError(f"未知的压缩算法: {', '.join(sorted(unknown))}，可选: {', '.join(DEFAULT_LEVELS)}")
+
+    levels = {name: int(app.config.get(f'COMPRESS_{name.upper()}_LEVEL') or level)
+              for name, level in DEFAULT_LEVELS.items()}
+    compressor = Compressor(algorithms, levels, int(app.config.get('COMPRESS_MIN_SIZE', 1024)),
+                            int(app.config.get('COMPRESS_CACHE_SIZE', 32 * 1024 * 1024)))
+    app.extensions['compression'] = compressor
+    app.after_request(compress_response)
+    app.logger.info(f"响应压缩: {', '.join(compressor.algorithms) or '关闭'}")
+
+
+def compress_response(response):
+    compressor = current_app.extensions.get('compression')
+    if compressor is None or not compressor.algorithms or not _compressible(response):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if response.is_streamed:
+        return _compress_streamed(compressor, response)
+
+    data = response.get_data()
+    if len(data) < compressor.min_size:
+        return response
+
+    encoding = compressor.negotiate(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    etag, weak = response.get_etag()
+    key = None
+    if etag and compressor.cache is not None:
+        key = (hashlib.blake2b(data, digest_size=16).digest(), encoding)
+    compressed = compressor.cache.get(key) if key else None
+    if compressed is None:
+        compressed = compressor.compress(encoding, data)
+        if key:
+            compressor.cache.set(key, compressed)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if etag and not weak:
+        # 强 ETag 要求字节一致，压缩后改为弱 ETag
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def _compress_streamed(compressor, response):
+    encoding = compressor.negotiate(request.accept_encodings)
+    if encoding is None:
+        return response
+    response.response = _compress_stream(encoding, compressor.levels[encoding], response.response)
+    response.headers['Content-Encoding'] = encoding
+    response.headers.pop('Content-Length', None)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
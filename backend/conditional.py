@@ -0,0 +1,113 @@
+# backend/conditional.py
+"""
+HTTP 条件请求（ETag / Last-Modified）
+客户端带上次响应的 ETag 发起 If-None-Match 请求时，验证器一致就直接返回 304，不再查询和序列化数据。
+
+- 列表和统计接口用 @conditional('表名', ...)：ETag 由接口依赖的表的版本号生成，
+  版本号就是接口响应缓存的标签版本（写入提交后递增），RESPONSE_CACHE_BACKEND=none 时不生成 ETag
+- 单条记录接口用 @conditional_row(模型, '参数名', '表名', ...)：先只查询该行的 updated_at，
+  ETag 由 updated_at 和依赖表的版本号生成，Last-Modified 为 updated_at
+
+ETag 都是弱验证器（W/），响应压缩等字节层面的差异不影响比较。
+响应带 Cache-Control: no-cache，浏览器每次使用缓存前都会重新验证。
+"""
+import hashlib
+from functools import wraps
+
+import sqlalchemy as sa
+from flask import current_app, request
+from database import db
+from response_cache import cache_key
+
+
+def _versions(tables):
+    """返回 (缓存标识, 表版本号)，没有可用的版本计数时返回 None"""
+    cache = current_app.extensions.get('response_cache')
+    if cache is None or cache.backend is None:
+        return None
+    return cache.backend.epoch, cache.backend.versions(tables)
+
+
+def make_etag(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode()).hexdigest()[:24]
+
+
+def table_etag(tables):
+    """由请求地址和依赖表的版本号生成 ETag，没有版本计数时返回 None"""
+    versions = _versions(tables)
+    if versions is None:
+        return None
+    return make_etag(cache_key(request), *versions)
+
+
+def row_validators(model, ident, tables=()):
+    """
+    只查询一行的 updated_at，返回 (ETag, Last-Modified)；记录不存在时返回 None
+    秒级精度的 updated_at 可能区分不了同一秒内的两次修改，有版本计数时一并计入 ETag
+    """
+    pk = model.__mapper__.primary_key[0]
+    row = db.session.execute(sa.select(model.updated_at).where(pk == ident)).first()
+    if row is None:
+        return None
+    updated_at = row[0]
+    versions = _versions(tables) if tables else None
+    return make_etag(model.__tablename__, ident, updated_at, versions), updated_at
+
+
+def not_modified(etag, last_modified=None):
+    """客户端缓存仍然有效时返回 304 响应，否则返回 None"""
+    if etag is None:
+        return None
+    if request.if_none_match:
+        # If-None-Match 优先，按弱比较判断
+        if not request.if_none_match.contains_weak(etag):
+            return None
+    elif not (last_modified and request.if_modified_since
+              and last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)):
+        return None
+    return add_validators(current_app.response_class(status=304), etag, last_modified)
+
+
+def add_validators(response, etag, last_modified=None):
+    if etag is not None and response.status_code in (200, 304):
+        response.set_etag(etag, weak=True)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def conditional(*tables):
+    """列表和统计接口：按依赖表的版本号响应条件请求，放在 @cached 之前（外层）"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            # 先读版本号再生成响应：期间有写入时 ETag 偏旧，下次请求只会多返回一次完整数据
+            etag = table_etag(tables)
+            response = not_modified(etag)
+            if response is not None:
+                return response
+            return add_validators(current_app.make_response(view(*args, **kwargs)), etag)
+        return wrapper
+    return decorator
+
+
+def conditional_row(model, arg, *tables):
+    """单条记录接口：arg 为路由中主键参数名，tables 为记录内容还依赖的其他表"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            validators = row_validators(model, kwargs[arg], tables)
+            if validators is None:
+                # 记录不存在，由接口自己返回 404
+                return view(*args, **kwargs)
+            response = not_modified(*validators)
+            if response is not None:
+                return response
+            return add_validators(current_app.make_response(view(*args, **kwargs)), *validators)
+        return wrapper
+    return decorator
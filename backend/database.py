@@ -1,3 +1,19 @@
+import sqlalchemy as sa
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
\ No newline at end of file
+
+class SharedEngineSQLAlchemy(SQLAlchemy):
+    """
+    地址相同的绑定共用一个引擎和连接池
+    例如默认库和 blog_db 都指向 blog.db；合并连接模式下所有绑定都指向主库。
+    """
+
+    def _make_engine(self, bind_key, options, app):
+        shared = app.extensions.setdefault('shared_engines', {})
+        url = sa.engine.make_url(options['url']).render_as_string(hide_password=False)
+        if url not in shared:
+            shared[url] = super()._make_engine(bind_key, options, app)
+        return shared[url]
+
+
+db = SharedEngineSQLAlchemy()
@@ -0,0 +1,84 @@
+# backend/db_bulk.py
+"""
+批量写入工具
+PostgreSQL（psycopg 驱动）使用 COPY FROM STDIN，其他数据库使用 executemany。
+bulk_upsert 按主键插入或更新（SQLite / PostgreSQL 使用 INSERT ... ON CONFLICT DO UPDATE）。
+"""
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def _table_rows(table, rows):
+    """只保留表中存在的列，所有行使用相同的列顺序"""
+    columns = [column.name for column in table.columns if column.name in rows[0]]
+    return columns, [{name: row.get(name) for name in columns} for row in rows]
+
+
+def _copy_rows(conn, table, columns, rows):
+    from psycopg.types.json import Jsonb
+
+    json_columns = {column.name for column in table.columns if isinstance(column.type, sa.JSON)}
+    cursor = conn.connection.driver_connection.cursor()
+    try:
+        with cursor.copy(f'COPY {table.name} ({", ".join(columns)}) FROM STDIN') as copy:
+            for row in rows:
+                copy.write_row([
+                    Jsonb(row[name]) if name in json_columns and row[name] is not None else row[name]
+                    for name in columns
+                ])
+    finally:
+        cursor.close()
+
+
+def bulk_insert(conn, table, rows):
+    """
+    在 conn 所在的事务中批量写入 rows（字典列表），返回写入行数
+    conn 为 SQLAlchemy Connection，例如 db.session.connection(bind_arguments={'mapper': Model})
+    """
+    if not rows:
+        return 0
+
+    columns, rows = _table_rows(table, rows)
+    if conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg':
+        _copy_rows(conn, table, columns, rows)
+    else:
+        conn.execute(table.insert(), rows)
+    return len(rows)
+
+
+def bulk_upsert(conn, table, rows):
+    """
+    按主键批量插入或更新 rows，只覆盖 rows 中出现的列，返回写入行数
+    不会触发列上的 onupdate（例如 updated_at 保持源数据的值）
+    """
+    if not rows:
+        return 0
+
+    columns, rows = _table_rows(table, rows)
+    keys = [column.name for column in table.primary_key.columns]
+    dialect = {'sqlite': sqlite, 'postgresql': postgresql}.get(conn.dialect.name)
+    if dialect is not None:
+        statement = dialect.insert(table)
+        updates = {name: statement.excluded[name] for name in columns if name not in keys}
+        if updates:
+            statement = statement.on_conflict_do_update(index_elements=keys, set_=updates)
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=keys)
+        conn.execute(statement, rows)
+    else:
+        # 其他数据库: 先删除已存在的行再插入
+        key = table.primary_key.columns[keys[0]]
+        conn.execute(table.delete().where(key.in_([row[keys[0]] for row in rows])))
+        conn.execute(table.insert(), rows)
+    return len(rows)
+
+
+def reset_sequence(conn, table):
+    """显式写入主键后，把 PostgreSQL 的自增序列推进到当前最大值"""
+    if conn.dialect.name != 'postgresql':
+        return
+    pk = list(table.primary_key.columns)[0].name
+    conn.execute(sa.text(
+        f"SELECT setval(pg_get_serial_sequence('{table.name}', '{pk}'), "
+        f"COALESCE((SELECT MAX({pk}) FROM {table.name}), 0) + 1, false)"
+    ))
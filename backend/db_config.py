@@ -0,0 +1,224 @@
+# backend/db_config.py
+"""
+数据库引擎配置
+根据 DB_PROFILE 环境变量为每个 SQLite 绑定生成连接池参数，并在建立连接时应用 PRAGMA。
+DB_LAYOUT 选择数据库布局：
+- split: 每个绑定连接自己的文件（默认）
+- attached: 所有绑定共用一个连接主库 blog.db 的引擎，其余文件通过 ATTACH 附加到同一连接，可以跨库 JOIN
+
+每个绑定也可以通过环境变量指向 PostgreSQL（见 BIND_URL_ENV），此时使用 SERVER_POOL 连接池参数。
+"""
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# 每个绑定对应的 SQLite 文件
+BIND_FILES = {
+    'blog_db': 'blog.db',
+    'drive_stats': 'drive_stats.db',
+    'travel_db': 'travel.db',
+}
+
+# 指定绑定数据库地址的环境变量，未设置时使用 instance 目录下的 SQLite 文件
+# 例如 DRIVE_DATABASE_URL=postgresql://user:pass@db:5432/personweb
+BIND_URL_ENV = {
+    'blog_db': 'BLOG_DATABASE_URL',
+    'drive_stats': 'DRIVE_DATABASE_URL',
+    'travel_db': 'TRAVEL_DATABASE_URL',
+}
+
+# 数据库服务器（PostgreSQL 等）的连接池参数
+SERVER_POOL = {
+    'pool_size': 10,
+    'max_overflow': 10,
+    'pool_timeout': 10,
+    'pool_recycle': 1800,
+    'pool_pre_ping': True,
+}
+SERVER_BIND_POOL = {
+    'drive_stats': {'pool_size': 15, 'max_overflow': 15},
+    'travel_db': {'pool_size': 5, 'max_overflow': 5},
+}
+
+# 合并连接模式下作为主库的绑定
+MAIN_BIND = 'blog_db'
+
+DEFAULT_PROFILE = 'wal'
+
+LAYOUTS = ('split', 'attached')
+
+# 按库生效的 PRAGMA，附加库需要单独设置
+SCHEMA_PRAGMAS = ('journal_mode', 'synchronous', 'mmap_size', 'cache_size')
+
+# 引擎配置方案
+# pragmas: 每个新连接建立时执行的 PRAGMA
+# pool: 所有绑定通用的连接池参数
+# bind_pool: 针对单个绑定覆盖的连接池参数
+ENGINE_PROFILES = {
+    # 保持 SQLite 默认设置（回滚日志、每次提交完整 fsync）
+    'legacy': {
+        'pragmas': {},
+        'pool': {},
+        'bind_pool': {},
+    },
+    # WAL 模式：读写互不阻塞，提交时只写 WAL 文件
+    'wal': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'mmap_size': 256 * 1024 * 1024,
+            'cache_size': -16000,  # 负数表示 KiB，约 16MB
+            'temp_store': 'MEMORY',
+        },
+        'pool': {
+            'pool_size': 5,
+            'max_overflow': 5,
+            'pool_timeout': 10,
+            'pool_recycle': 3600,
+        },
+        'bind_pool': {
+            # 驱动盘统计的读写最频繁
+            'drive_stats': {'pool_size': 8, 'max_overflow': 8},
+            'travel_db': {'pool_size': 3, 'max_overflow': 2},
+        },
+    },
+    # WAL 模式但每次提交都 fsync，断电也不会丢失已提交事务
+    'durable': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'FULL',
+            'busy_timeout': 10000,
+            'cache_size': -8000,
+        },
+        'pool': {
+            'pool_size': 5,
+            'max_overflow': 5,
+            'pool_timeout': 15,
+            'pool_recycle': 3600,
+        },
+        'bind_pool': {},
+    },
+}
+
+
+def get_profile(name=None):
+    """返回指定名称的配置方案，未指定时读取 DB_PROFILE 环境变量"""
+    name = name or os.environ.get('DB_PROFILE') or DEFAULT_PROFILE
+    if name not in ENGINE_PROFILES:
+        raise ValueError(f"未知的数据库配置方案: {name}，可选: {', '.join(ENGINE_PROFILES)}")
+    return name, ENGINE_PROFILES[name]
+
+
+def is_sqlite(url):
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def normalize_url(url):
+    """postgresql:// 默认使用 psycopg（3）驱动"""
+    for prefix in ('postgres://', 'postgresql://'):
+        if url.startswith(prefix):
+            return 'postgresql+psycopg://' + url[len(prefix):]
+    return url
+
+
+def engine_options(profile, bind_key=None, url=None):
+    """生成单个绑定的引擎参数（连接池设置），环境变量优先"""
+    if url and not is_sqlite(url):
+        options = dict(SERVER_POOL)
+        options.update(SERVER_BIND_POOL.get(bind_key, {}))
+    else:
+        options = dict(profile['pool'])
+        options.update(profile['bind_pool'].get(bind_key, {}))
+
+    for option, env_name in (('pool_size', 'DB_POOL_SIZE'),
+                             ('max_overflow', 'DB_MAX_OVERFLOW'),
+                             ('pool_timeout', 'DB_POOL_TIMEOUT')):
+        if os.environ.get(env_name):
+            options[option] = int(os.environ[env_name])
+
+    return options
+
+
+def get_layout(name=None):
+    layout = name or os.environ.get('DB_LAYOUT') or 'split'
+    if layout not in LAYOUTS:
+        raise ValueError(f"未知的数据库布局: {layout}，可选: {', '.join(LAYOUTS)}")
+    return layout
+
+
+def sqlite_url(instance_dir, filename):
+    return 'sqlite:///' + os.path.join(instance_dir, filename)
+
+
+def bind_url(instance_dir, bind_key):
+    url = os.environ.get(BIND_URL_ENV[bind_key])
+    return normalize_url(url) if url else sqlite_url(instance_dir, BIND_FILES[bind_key])
+
+
+def default_url(instance_dir):
+    """默认绑定（Post、WebsiteMetrics）的地址，未设置 DATABASE_URL 时与 blog_db 相同"""
+    url = os.environ.get('DATABASE_URL')
+    return normalize_url(url) if url else bind_url(instance_dir, MAIN_BIND)
+
+
+def build_binds(instance_dir, profile, layout='split'):
+    """生成 SQLALCHEMY_BINDS 配置，每个绑定带上各自的连接池参数"""
+    binds = {}
+    for bind_key, filename in BIND_FILES.items():
+        if layout == 'attached':
+            if os.environ.get(BIND_URL_ENV[bind_key]):
+                raise ValueError(f"DB_LAYOUT=attached 只支持 SQLite 文件，请取消 {BIND_URL_ENV[bind_key]}")
+            # 所有绑定共用一个连接池，按最繁忙的驱动盘绑定配置
+            binds[bind_key] = {'url': sqlite_url(instance_dir, BIND_FILES[MAIN_BIND])}
+            binds[bind_key].update(engine_options(profile, 'drive_stats'))
+        else:
+            url = bind_url(instance_dir, bind_key)
+            binds[bind_key] = {'url': url}
+            binds[bind_key].update(engine_options(profile, bind_key, url))
+    return binds
+
+
+def attached_files(instance_dir, layout):
+    """合并连接模式下需要 ATTACH 的文件: {库名: 路径}，库名与绑定名相同"""
+    if layout != 'attached':
+        return {}
+    return {
+        bind_key: os.path.join(instance_dir, filename)
+        for bind_key, filename in BIND_FILES.items() if bind_key != MAIN_BIND
+    }
+
+
+def file_urls(instance_dir):
+    """每个绑定各自文件的地址，结构管理在合并连接模式下按文件单独连接"""
+    urls = {bind_key: sqlite_url(instance_dir, filename) for bind_key, filename in BIND_FILES.items()}
+    urls[None] = urls[MAIN_BIND]
+    return urls
+
+
+def apply_sqlite_pragmas(engine, pragmas, attach=None):
+    """在引擎的每个新连接上执行 PRAGMA，并附加 attach 中的数据库文件"""
+    if engine.dialect.name != 'sqlite' or not (pragmas or attach):
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        # 附加库中的表可以不带库名直接访问（表名在各文件间不重复）
+        # 注意：WAL 模式下跨库事务在每个文件内原子，但不保证跨文件原子
+        for schema_name, path in (attach or {}).items():
+            cursor.execute(f'ATTACH DATABASE ? AS {schema_name}', (path,))
+            for name, value in pragmas.items():
+                if name in SCHEMA_PRAGMAS:
+                    cursor.execute(f'PRAGMA {schema_name}.{name}={value}')
+        cursor.close()
+
+
+def init_engines(app, db):
+    """为当前应用的所有引擎挂上配置方案中的 PRAGMA（需在应用上下文中调用）"""
+    profile_name, profile = get_profile(app.config.get('DB_PROFILE'))
+    for engine in set(db.engines.values()):
+        apply_sqlite_pragmas(engine, profile['pragmas'], app.config.get('DB_ATTACH'))
+    app.logger.info(f"数据库配置方案: {profile_name}，布局: {app.config.get('DB_LAYOUT', 'split')}")
@@ -0,0 +1,131 @@
+# backend/drive_app/read_model.py
+"""
+驱动盘读模型
+drive_pieces.substat_levels 打包保存每条副词条的 [副词条 id, 词条 id, 强化次数, 是否原始词条]，
+按副词条 id 排序。列表和详情接口只读这一列（词条名称取自 stat_types），
+不再为每个驱动盘关联 drive_piece_substats 和 upgrade_records。
+
+规范数据仍然是这两张表：写接口修改后、提交前调用 sync() 重新生成对应驱动盘的打包列。
+`flask verify-drive-model` 检查打包列与两张表是否一致，--fix 重新生成不一致的行。
+"""
+import click
+import sqlalchemy as sa
+
+from database import db
+from models.drive_piece import DrivePiece, DrivePieceSubstat
+from models.stat_type import StatType
+from models.upgrade_record import UpgradeRecord
+
+# 检查和重建时每批处理的驱动盘数
+BATCH_SIZE = 5000
+
+pieces = DrivePiece.__table__
+substats = DrivePieceSubstat.__table__
+upgrades = UpgradeRecord.__table__
+
+
+def expected_levels(conn, drive_ids):
+    """从规范表计算驱动盘的打包列: {drive_id: [[副词条 id, 词条 id, 强化次数, 是否原始词条], ...]}"""
+    result = {drive_id: [] for drive_id in drive_ids}
+    rows = conn.execute(
+        sa.select(
+            substats.c.drive_id, substats.c.id, substats.c.stat_id,
+            sa.func.coalesce(upgrades.c.upgrade_count, 0),
+            sa.func.coalesce(upgrades.c.is_original, sa.true()),
+        ).outerjoin(upgrades, upgrades.c.substat_id == substats.c.id)
+        .where(substats.c.drive_id.in_(list(result)))
+        .order_by(substats.c.drive_id, substats.c.id)
+    )
+    for drive_id, substat_id, stat_id, upgrade_count, is_original in rows:
+        result[drive_id].append([substat_id, stat_id, upgrade_count, bool(is_original)])
+    return result
+
+
+def write_levels(conn, levels):
+    """levels: {drive_id: 打包列}，不改动 updated_at（写接口修改驱动盘时已经更新）"""
+    if levels:
+        conn.execute(
+            pieces.update().where(pieces.c.drive_id == sa.bindparam('b_drive_id'))
+            .values(substat_levels=sa.bindparam('b_levels'), updated_at=pieces.c.updated_at),
+            [{'b_drive_id': drive_id, 'b_levels': value} for drive_id, value in levels.items()],
+        )
+
+
+def sync(*drive_ids):
+    """在当前会话的事务中重新生成驱动盘的打包列（先 flush，未提交的修改也计算在内）"""
+    db.session.flush()
+    conn = db.session.connection(bind_arguments={'mapper': DrivePiece})
+    write_levels(conn, expected_levels(conn, drive_ids))
+
+
+def stat_names():
+    """{词条 id: 名称}"""
+    return dict(db.session.execute(sa.select(StatType.stat_type_id, StatType.stat_name)).all())
+
+
+def unpack(levels, names):
+    """打包列转换为接口返回的 substats_with_levels"""
+    return [
+        {
+            'name': names.get(stat_id, '未知词条'),
+            'upgrade_count': upgrade_count,
+            'is_original': is_original,
+            'substat_id': substat_id,
+        }
+        for substat_id, stat_id, upgrade_count, is_original in levels or []
+    ]
+
+
+def iter_drift(conn, only_missing=False):
+    """逐批比较打包列与规范表，返回不一致的 (drive_id, 现有值, 期望值)"""
+    last_id = 0
+    while True:
+        query = sa.select(pieces.c.drive_id, pieces.c.substat_levels).where(pieces.c.drive_id > last_id)
+        if only_missing:
+            query = query.where(pieces.c.substat_levels.is_(None))
+        batch = conn.execute(query.order_by(pieces.c.drive_id).limit(BATCH_SIZE)).all()
+        if not batch:
+            return
+        last_id = batch[-1][0]
+        expected = expected_levels(conn, [drive_id for drive_id, _ in batch])
+        for drive_id, stored in batch:
+            if stored != expected[drive_id]:
+                yield drive_id, stored, expected[drive_id]
+
+
+def rebuild(conn, only_missing=False):
+    """重新生成不一致（only_missing 时只处理为空）的打包列，返回修复的行数"""
+    fixed = 0
+    pending = {}
+    for drive_id, _, expected in iter_drift(conn, only_missing):
+        pending[drive_id] = expected
+        if len(pending) >= BATCH_SIZE:
+            write_levels(conn, pending)
+            fixed += len(pending)
+            pending = {}
+    write_levels(conn, pending)
+    return fixed + len(pending)
+
+
+@click.command('verify-drive-model')
+@click.option('--fix', is_flag=True, help='重新生成不一致的行')
+@click.option('--limit', default=20, help='最多列出的不一致驱动盘数')
+def verify_drive_model_command(fix, limit):
+    """检查驱动盘打包列（substat_levels）与副词条、强化记录表是否一致。"""
+    engine = db.engines['drive_stats']
+    if fix:
+        with engine.begin() as conn:
+            fixed = rebuild(conn)
+        print(f"已重新生成 {fixed} 个驱动盘的打包列。")
+        return
+
+    drift = 0
+    with engine.connect() as conn:
+        for drive_id, stored, expected in iter_drift(conn):
+            drift += 1
+            if drift <= limit:
+                print(f"  ❌ 驱动盘 {drive_id}: 现有 {stored}，期望 {expected}")
+    if drift:
+        print(f"共 {drift} 个驱动盘不一致，执行 `flask verify-drive-model --fix` 修复。")
+    else:
+        print("✅ 打包列与规范表一致。")
@@ -1,20 +1,94 @@
 from flask import Blueprint, request, jsonify
 from database import db  # 改为从 database.py 导入
+from response_cache import cached
+from rate_limit import rate_limit
+from conditional import conditional, conditional_row
+from json_provider import rows_to_dicts
 from models.set_type import SetType
 from models.stat_type import StatType
 from models.drive_piece import DrivePiece, DrivePieceSubstat
 from models.upgrade_record import UpgradeRecord
+from drive_app import read_model
 from sqlalchemy.orm import joinedload
 from sqlalchemy import func, case, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 from datetime import datetime
 import random
 
+# 驱动盘详情和列表的内容依赖的表
+DRIVE_TABLES = ('drive_pieces', 'drive_piece_substats', 'upgrade_records', 'set_types', 'stat_types')
+
+
+def _drive_query():
+    """按列查询驱动盘及套装、主词条名称和打包的副词条，不构造 ORM 对象"""
+    return db.session.query(*DrivePiece.json_columns(), DrivePiece.substat_levels).outerjoin(
+        SetType, SetType.set_id == DrivePiece.set_id
+    ).outerjoin(
+        StatType, StatType.stat_type_id == DrivePiece.main_stat_id
+    )
+
+
+def _with_levels(drive_dict, names):
+    """补上 substats_with_levels（从打包列展开），去掉打包列本身"""
+    drive_dict['substats'] = drive_dict['substats'] or []
+    drive_dict['substats_with_levels'] = read_model.unpack(drive_dict.pop('substat_levels'), names)
+    return drive_dict
+
+
+def _drive_state(conn, drive_id):
+    """强化/降级需要的驱动盘当前状态和打包的副词条（打包列为空时从规范表计算）"""
+    drive = conn.execute(
+        db.select(DrivePiece.drive_id, DrivePiece.main_stat_id, DrivePiece.total_upgrades,
+                  DrivePiece.version, DrivePiece.substat_levels)
+        .where(DrivePiece.drive_id == drive_id)
+    ).first()
+    if drive is None:
+        return None, None
+    levels = drive.substat_levels
+    if levels is None:
+        levels = read_model.expected_levels(conn, [drive_id])[drive_id]
+    return drive, levels
+
+
+def _stale(drive, data):
+    """请求中带了 version（客户端看到的版本号）且与当前版本不一致"""
+    return data.get('version') is not None and data['version'] != drive.version
+
+
+def _write_drive(drive, levels, *conditions, **values):
+    """版本号未变（且满足 conditions）时写入驱动盘并把版本号加一，返回是否写入"""
+    # 写入语句都经过 db.session.execute，响应缓存才能记下修改的表并在提交后失效（直接用连接执行不会触发会话事件）
+    result = db.session.execute(
+        DrivePiece.__table__.update()
+        .where(DrivePiece.drive_id == drive.drive_id, DrivePiece.version == drive.version, *conditions)
+        .values(version=DrivePiece.version + 1, substat_levels=levels, **values)
+    )
+    return result.rowcount == 1
+
+
+def _int_or_none(value):
+    """请求中的整数 id，不是整数时返回 None"""
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def _conflict():
+    db.session.rollback()
+    return jsonify({'error': '驱动盘已被其他操作修改，请刷新后重试'}), 409
+
+
 # 创建一个蓝图实例，所有与驱动盘相关的路由都将注册到这个蓝图上
 # url_prefix='/api/drive' 意味着所有路由都将以 /api/drive 开头
 drive_bp = Blueprint('drive', __name__, url_prefix='/api/drive')
 
 
 @drive_bp.route('/add', methods=['POST'])
+@rate_limit('drive_write', rate=2, burst=20)
 def add_drive_piece():
     """
     添加新的驱动盘
@@ -87,6 +161,7 @@ def add_drive_piece():
             )
             db.session.add(upgrade_record)
 
+        read_model.sync(drive_piece.drive_id)
         db.session.commit()
 
         return jsonify({
@@ -99,6 +174,7 @@ def add_drive_piece():
         return jsonify({'error': '添加驱动盘失败', 'details': str(e)}), 500
 
 @drive_bp.route('/pieces', methods=['GET'])
+@conditional(*DRIVE_TABLES)
 def get_drive_pieces():
     """
     获取驱动盘列表，支持分页
@@ -111,47 +187,15 @@ def get_drive_pieces():
         if per_page > 100:
             per_page = 100
 
-        # 查询驱动盘，预加载相关数据
-        query = DrivePiece.query.options(
-            joinedload(DrivePiece.set_type),
-            joinedload(DrivePiece.main_stat_type)
-        ).order_by(DrivePiece.created_at.desc())
-
-        paginated_result = query.paginate(
+        paginated_result = _drive_query().order_by(DrivePiece.created_at.desc()).paginate(
             page=page,
             per_page=per_page,
             error_out=False
         )
 
-        drives = []
-        for drive in paginated_result.items:
-            # 分别查询副词条和强化记录，避免复杂JOIN导致的问题
-            # 1. 先获取副词条信息
-            substats_entries = db.session.query(
-                DrivePieceSubstat, StatType.stat_name
-            ).join(
-                StatType, DrivePieceSubstat.stat_id == StatType.stat_type_id
-            ).filter(
-                DrivePieceSubstat.drive_id == drive.drive_id
-            ).all()
-
-            substats_with_levels = []
-            for substat_entry, stat_name in substats_entries:
-                # 2. 为每个副词条查询强化记录
-                upgrade_record = UpgradeRecord.query.filter_by(
-                    substat_id=substat_entry.id
-                ).first()
-                
-                substats_with_levels.append({
-                    'name': stat_name or '未知词条',
-                    'upgrade_count': upgrade_record.upgrade_count if upgrade_record else 0,
-                    'is_original': upgrade_record.is_original if upgrade_record else True,
-                    'substat_id': substat_entry.id
-                })
-
-            drive_dict = drive.to_dict()
-            drive_dict['substats_with_levels'] = substats_with_levels
-            drives.append(drive_dict)
+        # 副词条和强化次数直接从打包列展开，不再逐个驱动盘查询
+        names = read_model.stat_names()
+        drives = [_with_levels(drive_dict, names) for drive_dict in rows_to_dicts(paginated_result.items)]
 
         return jsonify({
             'drives': drives,
@@ -169,44 +213,17 @@ def get_drive_pieces():
         return jsonify({'error': '获取驱动盘列表失败', 'details': str(e)}), 500
 
 @drive_bp.route('/pieces/<int:drive_id>', methods=['GET'])
+@conditional_row(DrivePiece, 'drive_id', *DRIVE_TABLES)
 def get_drive_piece(drive_id):
     """
     获取单个驱动盘的详细信息
     """
     try:
-        drive = DrivePiece.query.options(
-            joinedload(DrivePiece.set_type),
-            joinedload(DrivePiece.main_stat_type)
-        ).get(drive_id)
-
-        if not drive:
+        row = _drive_query().filter(DrivePiece.drive_id == drive_id).first()
+        if not row:
             return jsonify({'error': '驱动盘不存在'}), 404
 
-        # 获取副词条及其强化信息（使用LEFT JOIN处理没有强化记录的情况）
-        substats_query = db.session.query(
-            DrivePieceSubstat,
-            StatType.stat_name,
-            UpgradeRecord.upgrade_count,
-            UpgradeRecord.is_original
-        ).join(
-            StatType, DrivePieceSubstat.stat_id == StatType.stat_type_id
-        ).outerjoin(
-            UpgradeRecord, DrivePieceSubstat.id == UpgradeRecord.substat_id
-        ).filter(
-            DrivePieceSubstat.drive_id == drive_id
-        ).all()
-
-        substats_with_levels = []
-        for substat_entry, stat_name, upgrade_count, is_original in substats_query:
-            substats_with_levels.append({
-                'name': stat_name,
-                'upgrade_count': upgrade_count if upgrade_count is not None else 0,
-                'is_original': is_original if is_original is not None else True,
-                'substat_id': substat_entry.id
-            })
-
-        drive_dict = drive.to_dict()
-        drive_dict['substats_with_levels'] = substats_with_levels
+        drive_dict = _with_levels(rows_to_dicts([row])[0], read_model.stat_names())
 
         return jsonify(drive_dict), 200
 
@@ -226,6 +243,8 @@ def update_drive_piece(drive_id):
         drive = DrivePiece.query.get(drive_id)
         if not drive:
             return jsonify({'error': '驱动盘不存在'}), 404
+        if _stale(drive, data):
+            return _conflict()
 
         # 更新主词条
         if 'main_stat_name' in data:
@@ -279,9 +298,13 @@ def update_drive_piece(drive_id):
             # 更新JSON字段
             drive.substats = new_substats
 
+        read_model.sync(drive_id)
         db.session.commit()
-        return jsonify({'message': '驱动盘更新成功'}), 200
+        return jsonify({'message': '驱动盘更新成功', 'version': drive.version}), 200
 
+    except StaleDataError:
+        # 驱动盘在读取之后被其他请求修改（版本号由 ORM 检查）
+        return _conflict()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': '更新驱动盘失败', 'details': str(e)}), 500
@@ -290,15 +313,19 @@ def update_drive_piece(drive_id):
 def upgrade_drive_piece(drive_id):
     """
     强化驱动盘词条
+    读取驱动盘的当前状态后，用带版本号条件的 UPDATE 写入；期间驱动盘被其他请求修改时返回 409
     """
     try:
         data = request.get_json()
         if not data:
             return jsonify({'error': '请求数据不能为空'}), 400
 
-        drive = DrivePiece.query.get(drive_id)
+        conn = db.session.connection(bind_arguments={'mapper': DrivePiece})
+        drive, levels = _drive_state(conn, drive_id)
         if not drive:
             return jsonify({'error': '驱动盘不存在'}), 404
+        if _stale(drive, data):
+            return _conflict()
 
         # 检查是否还能强化
         if drive.total_upgrades >= 5:
@@ -306,75 +333,48 @@ def upgrade_drive_piece(drive_id):
 
         upgrade_type = data.get('upgrade_type')  # 'existing' 或 'new'
         new_substat_name = data.get('new_substat_name')  # 指定的新副词条名称
-        
-        current_substats = DrivePieceSubstat.query.filter_by(drive_id=drive_id).all()
-        current_upgrades = drive.total_upgrades
+
+        names = read_model.stat_names()
+        existing_stat_ids = {drive.main_stat_id} | {stat_id for _, stat_id, _, _ in levels}
 
         if upgrade_type == 'new':
             # 生成新副词条
-            if len(current_substats) >= 4:
+            if len(levels) >= 4:
                 return jsonify({'error': '副词条已满，无法生成新词条'}), 400
 
             # 如果指定了新副词条名称，使用指定的；否则随机选择
             if new_substat_name:
                 # 验证指定的副词条是否有效
-                new_stat = StatType.query.filter_by(stat_name=new_substat_name).first()
-                if not new_stat:
+                new_stat_id = next((stat_id for stat_id, name in names.items() if name == new_substat_name), None)
+                if new_stat_id is None:
                     return jsonify({'error': f'无效的副词条: {new_substat_name}'}), 400
-                
+
                 # 检查是否与主词条或现有副词条冲突
-                existing_stat_ids = set([drive.main_stat_id] + [s.stat_id for s in current_substats])
-                if new_stat.stat_type_id in existing_stat_ids:
+                if new_stat_id in existing_stat_ids:
                     return jsonify({'error': f'副词条 {new_substat_name} 已存在'}), 400
             else:
-                # 获取所有可用的副词条类型（排除主词条和现有副词条）
-                existing_stat_ids = set([drive.main_stat_id] + [s.stat_id for s in current_substats])
-                available_stats = StatType.query.filter(
-                    ~StatType.stat_type_id.in_(existing_stat_ids)
-                ).all()
-
+                # 从所有可用的副词条类型中随机选择（排除主词条和现有副词条）
+                available_stats = [stat_id for stat_id in names if stat_id not in existing_stat_ids]
                 if not available_stats:
                     return jsonify({'error': '没有可用的新副词条'}), 400
-
-                # 随机选择一个新副词条
-                new_stat = random.choice(available_stats)
-
-            # 创建新的副词条记录
-            new_substat_entry = DrivePieceSubstat(
-                drive_id=drive_id,
-                stat_id=new_stat.stat_type_id
-            )
-            db.session.add(new_substat_entry)
-            db.session.flush()
-
-            # 创建强化记录
-            upgrade_record = UpgradeRecord(
-                drive_id=drive_id,
-                substat_id=new_substat_entry.id,
-                is_original=False,  # 新生成的词条不是原始词条
-                upgrade_count=0 if current_upgrades == 0 and len(current_substats) == 3 else 1
-            )
-            db.session.add(upgrade_record)
-
-            # 更新驱动盘JSON数据（如果存在的话）
-            try:
-                current_substats_names = []
-                for substat in current_substats:
-                    stat = StatType.query.get(substat.stat_id)
-                    if stat:
-                        current_substats_names.append(stat.stat_name)
-                
-                updated_substats = current_substats_names + [new_stat.stat_name]
-                drive.substats = updated_substats
-            except Exception as e:
-                # 如果JSON字段更新失败，不影响主要功能
-                print(f"更新JSON字段失败: {e}")
-                pass
+                new_stat_id = random.choice(available_stats)
+
+            # 创建新的副词条和强化记录（新生成的词条不是原始词条，补满第 4 条时不计强化次数）
+            upgrade_count = 0 if drive.total_upgrades == 0 and len(levels) == 3 else 1
+            new_substat_id = db.session.execute(DrivePieceSubstat.__table__.insert().values(
+                drive_id=drive_id, stat_id=new_stat_id, created_at=datetime.utcnow()
+            )).inserted_primary_key[0]
+            db.session.execute(UpgradeRecord.__table__.insert().values(
+                drive_id=drive_id, substat_id=new_substat_id, is_original=False, upgrade_count=upgrade_count,
+                created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+            ))
+            levels = levels + [[new_substat_id, new_stat_id, upgrade_count, False]]
+            extra = {'substats': [names[stat_id] for _, stat_id, _, _ in levels if stat_id in names]}
 
             upgrade_result = {
                 'type': 'new_substat',
-                'new_substat': new_stat.stat_name,
-                'upgrade_count': upgrade_record.upgrade_count
+                'new_substat': names[new_stat_id],
+                'upgrade_count': upgrade_count
             }
 
         elif upgrade_type == 'existing':
@@ -382,55 +382,54 @@ def upgrade_drive_piece(drive_id):
             substat_id = data.get('substat_id')
             if not substat_id:
                 return jsonify({'error': '请选择要强化的副词条'}), 400
+            substat_id = _int_or_none(substat_id)
+            if substat_id is None:
+                return jsonify({'error': '无效的副词条 id'}), 400
 
-            # 验证副词条是否存在
-            substat_entry = DrivePieceSubstat.query.get(substat_id)
-            if not substat_entry or substat_entry.drive_id != drive_id:
+            # 验证副词条是否属于该驱动盘
+            level = next((level for level in levels if level[0] == substat_id), None)
+            if level is None:
                 return jsonify({'error': '副词条不存在'}), 400
 
-            # 查找或创建强化记录
-            upgrade_record = UpgradeRecord.query.filter_by(
-                drive_id=drive_id,
-                substat_id=substat_id
-            ).first()
-
-            if not upgrade_record:
-                # 如果没有强化记录，创建一个新的
-                upgrade_record = UpgradeRecord(
-                    drive_id=drive_id,
-                    substat_id=substat_id,
-                    is_original=True,  # 假设是原始词条
-                    upgrade_count=0
-                )
-                db.session.add(upgrade_record)
-                db.session.flush()  # 确保记录被保存
-
-            # 增加强化次数
-            upgrade_record.upgrade_count += 1
-
-            # 获取副词条名称用于返回
-            stat_type = StatType.query.get(substat_entry.stat_id)
+            # 增加强化次数，没有强化记录时补建一条
+            updated = db.session.execute(
+                UpgradeRecord.__table__.update()
+                .where(UpgradeRecord.drive_id == drive_id, UpgradeRecord.substat_id == substat_id)
+                .values(upgrade_count=UpgradeRecord.upgrade_count + 1)
+            )
+            if updated.rowcount == 0:
+                db.session.execute(UpgradeRecord.__table__.insert().values(
+                    drive_id=drive_id, substat_id=substat_id, is_original=True, upgrade_count=1,
+                    created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+                ))
+            levels = [[*item[:2], item[2] + 1, item[3]] if item is level else item for item in levels]
+            extra = {}
 
             upgrade_result = {
                 'type': 'upgrade_existing',
-                'substat_name': stat_type.stat_name,
-                'new_upgrade_count': upgrade_record.upgrade_count
+                'substat_name': names.get(level[1], '未知词条'),
+                'new_upgrade_count': level[2] + 1
             }
 
         else:
             return jsonify({'error': '无效的强化类型'}), 400
 
-        # 更新总强化次数
-        drive.total_upgrades += 1
-
+        # 更新总强化次数，版本号或强化上限条件不满足时放弃本次修改
+        if not _write_drive(drive, levels, DrivePiece.total_upgrades < 5,
+                            total_upgrades=DrivePiece.total_upgrades + 1, **extra):
+            return _conflict()
         db.session.commit()
 
         return jsonify({
             'message': '强化成功',
             'result': upgrade_result,
-            'new_total_upgrades': drive.total_upgrades
+            'new_total_upgrades': drive.total_upgrades + 1,
+            'version': drive.version + 1
         }), 200
 
+    except IntegrityError:
+        # 并发请求同时为该驱动盘生成了同一个副词条
+        return _conflict()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': '强化失败', 'details': str(e)}), 500
@@ -439,58 +438,63 @@ def upgrade_drive_piece(drive_id):
 def downgrade_drive_piece(drive_id):
     """
     降低驱动盘副词条等级
+    与强化相同，按版本号条件写入，冲突时返回 409
     """
     try:
         data = request.get_json()
         if not data:
             return jsonify({'error': '请求数据不能为空'}), 400
 
-        drive = DrivePiece.query.get(drive_id)
+        conn = db.session.connection(bind_arguments={'mapper': DrivePiece})
+        drive, levels = _drive_state(conn, drive_id)
         if not drive:
             return jsonify({'error': '驱动盘不存在'}), 404
+        if _stale(drive, data):
+            return _conflict()
 
         substat_id = data.get('substat_id')
         if not substat_id:
             return jsonify({'error': '请指定要降级的副词条'}), 400
+        substat_id = _int_or_none(substat_id)
+        if substat_id is None:
+            return jsonify({'error': '无效的副词条 id'}), 400
 
-        # 验证副词条是否存在
-        substat_entry = DrivePieceSubstat.query.get(substat_id)
-        if not substat_entry or substat_entry.drive_id != drive_id:
+        # 验证副词条是否属于该驱动盘
+        level = next((level for level in levels if level[0] == substat_id), None)
+        if level is None:
             return jsonify({'error': '副词条不存在'}), 400
 
-        # 查找强化记录
-        upgrade_record = UpgradeRecord.query.filter_by(
-            drive_id=drive_id,
-            substat_id=substat_id
-        ).first()
-
-        if not upgrade_record:
-            return jsonify({'error': '该副词条还没有进行过强化'}), 400
-
-        # 检查是否可以降级
-        if upgrade_record.upgrade_count <= 0:
+        # 检查是否可以降级（打包列中没有强化记录和强化次数为 0 都是 0，出错时再查一次区分两种情况）
+        if level[2] <= 0:
+            record = db.session.query(UpgradeRecord.upgrade_id).filter_by(
+                drive_id=drive_id, substat_id=substat_id
+            ).first()
+            if record is None:
+                return jsonify({'error': '该副词条还没有进行过强化'}), 400
             return jsonify({'error': '该副词条已经是最低等级'}), 400
 
-        # 减少强化次数
-        upgrade_record.upgrade_count -= 1
-        
-        # 减少总强化次数
-        drive.total_upgrades -= 1
-
-        # 获取副词条名称用于返回
-        substat_entry = DrivePieceSubstat.query.get(substat_id)
-        stat_type = StatType.query.get(substat_entry.stat_id)
-
+        # 减少强化次数和总强化次数
+        updated = db.session.execute(
+            UpgradeRecord.__table__.update()
+            .where(UpgradeRecord.drive_id == drive_id, UpgradeRecord.substat_id == substat_id,
+                   UpgradeRecord.upgrade_count > 0)
+            .values(upgrade_count=UpgradeRecord.upgrade_count - 1)
+        )
+        levels = [[*item[:2], item[2] - 1, item[3]] if item is level else item for item in levels]
+        if updated.rowcount == 0 or not _write_drive(drive, levels, DrivePiece.total_upgrades > 0,
+                                                     total_upgrades=DrivePiece.total_upgrades - 1):
+            return _conflict()
         db.session.commit()
 
         return jsonify({
             'message': '降级成功',
             'result': {
                 'type': 'downgrade',
-                'substat_name': stat_type.stat_name,
-                'new_upgrade_count': upgrade_record.upgrade_count
+                'substat_name': read_model.stat_names().get(level[1], '未知词条'),
+                'new_upgrade_count': level[2] - 1
             },
-            'new_total_upgrades': drive.total_upgrades
+            'new_total_upgrades': drive.total_upgrades - 1,
+            'version': drive.version + 1
         }), 200
 
     except Exception as e:
@@ -519,11 +523,15 @@ def delete_drive_piece(drive_id):
         db.session.commit()
         return jsonify({'message': '驱动盘删除成功'}), 200
 
+    except StaleDataError:
+        return _conflict()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': '删除驱动盘失败', 'details': str(e)}), 500
 
 @drive_bp.route('/set-types', methods=['GET'])
+@conditional('set_types')
+@cached('set_types')
 def get_set_types():
     """
     获取所有套装类型
@@ -535,6 +543,8 @@ def get_set_types():
         return jsonify({'error': '获取套装类型失败', 'details': str(e)}), 500
 
 @drive_bp.route('/stat-types', methods=['GET'])
+@conditional('stat_types')
+@cached('stat_types')
 def get_stat_types():
     """
     获取所有词条类型
@@ -546,6 +556,8 @@ def get_stat_types():
         return jsonify({'error': '获取词条类型失败', 'details': str(e)}), 500
 
 @drive_bp.route('/stats', methods=['GET'])
+@conditional('drive_pieces', 'drive_piece_substats', 'set_types', 'stat_types')
+@cached('drive_pieces', 'drive_piece_substats', 'set_types', 'stat_types', coalesce=True)
 def get_drive_stats():
     """
     获取驱动盘统计信息
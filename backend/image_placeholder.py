@@ -0,0 +1,111 @@
+# backend/image_placeholder.py
+"""
+图片占位图
+placeholder 是约 20px 的 WebP data URI（几百字节），照片和博客封面随列表接口一起返回，
+客户端在缩略图加载完成前直接显示模糊占位，不需要额外请求。照片由缩略图生成；博客封面只处理
+本站上传的图片（/api/travel/photos/file|thumbnail/...），外部地址不抓取，占位为空。
+旅行照片和博客两个蓝图共用这里的函数，互不依赖。
+
+`flask backfill-placeholders` 为已有照片和文章补齐占位图（--all 重新生成全部）。
+"""
+import base64
+import io
+import os
+from urllib.parse import unquote, urlsplit
+
+import click
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import select, update
+from werkzeug.security import safe_join
+
+from database import db
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 本站图片地址前缀和对应的文件目录（与 travel_app 的上传、缩略图目录一致）
+LOCAL_IMAGE_DIRS = (
+    ('/api/travel/photos/file/', os.path.join(BACKEND_DIR, 'uploads', 'travel')),
+    ('/api/travel/photos/thumbnail/', os.path.join(BACKEND_DIR, 'uploads', 'travel', 'thumbnails')),
+)
+
+# 占位图最长边像素和 WebP 质量
+PLACEHOLDER_SIZE = 20
+PLACEHOLDER_QUALITY = 40
+
+BATCH_SIZE = 200
+
+
+def make_placeholder(path, size=PLACEHOLDER_SIZE):
+    """生成占位图 data URI，不是图片或文件损坏时返回 None"""
+    try:
+        with Image.open(path) as img:
+            # JPEG 解码时直接按 1/2 到 1/8 缩小，不解码完整尺寸
+            img.draft('RGB', (size * 4, size * 4))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((size, size), Image.Resampling.LANCZOS)
+            img = img.convert('RGBA' if 'A' in img.getbands() or 'transparency' in img.info else 'RGB')
+            buffer = io.BytesIO()
+            img.save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY)
+    except (OSError, UnidentifiedImageError, SyntaxError, ValueError):
+        return None
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def local_image_path(url):
+    """本站上传图片的地址对应的文件路径，其他地址返回 None"""
+    if not url:
+        return None
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc:
+        return None
+    for prefix, directory in LOCAL_IMAGE_DIRS:
+        if parts.path.startswith(prefix):
+            return safe_join(directory, unquote(parts.path[len(prefix):]))
+    return None
+
+
+def url_placeholder(url):
+    """按图片地址生成占位图，不是本站上传的图片时返回 None"""
+    path = local_image_path(url)
+    return make_placeholder(path) if path else None
+
+
+def _backfill_placeholders(model, url_columns, everything, log):
+    """按 url_columns 中第一个非空的地址补齐占位图，返回 (生成数, 无法生成数)"""
+    query = select(model.id, *url_columns).order_by(model.id).limit(BATCH_SIZE)
+    if not everything:
+        query = query.where(model.placeholder.is_(None))
+
+    done = skipped = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(query.where(model.id > last_id)).all()
+        if not rows:
+            break
+        values = []
+        for row_id, *urls in rows:
+            placeholder = url_placeholder(next((url for url in urls if url), None))
+            if placeholder is None:
+                skipped += 1
+                continue
+            values.append({'id': row_id, 'placeholder': placeholder})
+        if values:
+            db.session.execute(update(model), values)
+            db.session.commit()
+            done += len(values)
+            log(f"[{model.__tablename__}] 已生成 {done} 个占位图")
+        last_id = rows[-1].id
+    return done, skipped
+
+
+@click.command('backfill-placeholders')
+@click.option('--all', 'everything', is_flag=True, help='重新生成全部占位图（默认只处理为空的行）')
+def backfill_placeholders_command(everything):
+    """为已有照片（由缩略图）和文章封面生成占位图。"""
+    from models.blog import Post
+    from models.travel_photo import TravelPhoto
+
+    for model, url_columns in ((TravelPhoto, (TravelPhoto.thumbnail_url, TravelPhoto.url)),
+                               (Post, (Post.image_url,))):
+        done, skipped = _backfill_placeholders(model, url_columns, everything, print)
+        print(f"✅ {model.__tablename__}: 已生成 {done} 个占位图，{skipped} 行没有可用的本站图片。")
@@ -0,0 +1,105 @@
+# backend/index_report.py
+"""
+索引使用报告
+`flask index-report` 用测试客户端依次请求各个只读接口（跳过响应缓存），记录每个接口执行的查询，
+对每条查询取执行计划，报告是否用到索引、哪些表是全表扫描。
+"""
+import click
+from flask import current_app, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from database import db
+from slow_queries import explain
+
+
+def report_requests():
+    """需要检查的请求: (方法, 地址, JSON 请求体)，详情和配对接口使用库中已有的数据"""
+    from models.drive_piece import DrivePiece
+    from models.stat_type import StatType
+    from models.travel_photo import TravelPhoto
+
+    requests = [
+        ('GET', '/api/posts', None),
+        ('GET', '/api/profile/stats', None),
+        ('GET', '/api/drive/pieces', None),
+        ('GET', '/api/drive/stats', None),
+        ('GET', '/api/drive/set-types', None),
+        ('GET', '/api/drive/stat-types', None),
+        ('GET', '/api/travel/photos', None),
+        ('GET', '/api/travel/photos?category=landscape', None),
+        ('GET', '/api/travel/stats', None),
+    ]
+    drive_id = db.session.execute(db.select(DrivePiece.drive_id).limit(1)).scalar()
+    if drive_id is not None:
+        requests.append(('GET', f'/api/drive/pieces/{drive_id}', None))
+    photo_id = db.session.execute(db.select(TravelPhoto.id).limit(1)).scalar()
+    if photo_id is not None:
+        requests.append(('GET', f'/api/travel/photos/{photo_id}', None))
+    stat_names = db.session.execute(db.select(StatType.stat_name).limit(2)).scalars().all()
+    if len(stat_names) == 2:
+        requests.append(('POST', '/api/drive/stats/pairing', {'selected_stats': stat_names}))
+    return requests
+
+
+def full_scans(plan):
+    """执行计划中没有使用索引的表扫描"""
+    return [line for line in plan.splitlines()
+            if line.startswith('SCAN ') and ' USING ' not in line]
+
+
+@click.command('index-report')
+@click.option('--all', 'show_all', is_flag=True, help='同时列出使用索引的查询')
+def index_report_command(show_all):
+    """报告各接口的查询是使用索引还是全表扫描。"""
+    if db.engine.dialect.name != 'sqlite':
+        print("index-report 只支持 SQLite（EXPLAIN QUERY PLAN）。")
+        return
+
+    captured = {}
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if executemany or not has_request_context() or not statement.lstrip().upper().startswith('SELECT'):
+            return
+        key = (request.endpoint, ' '.join(statement.split()))
+        if key not in captured:
+            captured[key] = explain(conn, cursor, statement, parameters) or ''
+
+    cache = current_app.extensions.get('response_cache')
+    backend = cache.backend if cache else None
+    if cache:
+        cache.backend = None
+    event.listen(Engine, 'after_cursor_execute', capture)
+    try:
+        client = current_app.test_client()
+        for method, path, body in report_requests():
+            response = client.open(path, method=method, json=body)
+            if response.status_code >= 400:
+                print(f"⚠️  {method} {path} 返回 {response.status_code}")
+    finally:
+        event.remove(Engine, 'after_cursor_execute', capture)
+        if cache:
+            cache.backend = backend
+
+    endpoints = {}
+    for (endpoint, statement), plan in captured.items():
+        endpoints.setdefault(endpoint, []).append((statement, plan))
+
+    total_scans = 0
+    for endpoint, queries in endpoints.items():
+        print(f"\n--- {endpoint} ({len(queries)} 条查询) ---")
+        if not show_all and not any(full_scans(plan) for _, plan in queries):
+            print("  ✅ 全部使用索引")
+        for statement, plan in queries:
+            scans = full_scans(plan)
+            total_scans += bool(scans)
+            if scans:
+                print(f"  ❌ 全表扫描: {statement[:160]}")
+            elif show_all:
+                print(f"  ✅ 使用索引: {statement[:160]}")
+            else:
+                continue
+            for line in plan.splitlines():
+                print(f"       {line}")
+
+    print(f"\n共 {len(captured)} 条查询，其中 {total_scans} 条包含全表扫描。")
@@ -3,6 +3,7 @@ from datetime import datetime
 
 # 导入应用工厂和数据库实例
 from run import create_app, db
+import schema
 
 # 导入所有需要创建的数据库模型
 from models.set_type import SetType
@@ -29,8 +30,8 @@ def initialize_database():
             db.drop_all(bind_key='drive_stats')
             
             print("正在创建新的数据库表...")
-            # 创建所有数据库表
-            db.create_all(bind_key='drive_stats')
+            # 创建所有数据库表并写入结构版本号
+            schema.upgrade(app.logger, bind_keys=['drive_stats'])
             print("所有数据库表已创建。")
             
             # 检查表创建情况
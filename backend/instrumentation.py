@@ -0,0 +1,120 @@
+# backend/instrumentation.py
+"""
+请求与 SQL 指标
+每个请求按接口（路由的 endpoint 名）记录耗时、响应大小、执行的 SQL 语句数和 SQL 总耗时，
+以 Prometheus 文本格式从 /api/metrics/prometheus 输出。
+
+gunicorn 多 worker 时设置 PROMETHEUS_MULTIPROC_DIR 指向一个共享的空目录（每次启动前清空），
+各 worker 把指标写入该目录，输出时汇总所有 worker；未设置时只输出当前进程的指标。
+prometheus_client 为可选依赖，未安装时不记录指标。
+"""
+import os
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Histogram, multiprocess
+except ImportError:  # pragma: no cover - 可选依赖
+    prometheus_client = None
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        'http_request_duration_seconds', '请求处理耗时', ['method', 'endpoint', 'status'],
+    )
+    RESPONSE_SIZE = Histogram(
+        'http_response_size_bytes', '响应体大小（压缩后）', ['endpoint'],
+        buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+    )
+    REQUEST_SQL_STATEMENTS = Histogram(
+        'http_request_sql_statements', '单个请求执行的 SQL 语句数', ['endpoint'],
+        buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+    )
+    REQUEST_SQL_SECONDS = Histogram(
+        'http_request_sql_seconds', '单个请求的 SQL 总耗时', ['endpoint'],
+    )
+    SQL_STATEMENTS = Counter(
+        'sql_statements_total', '执行的 SQL 语句总数（包括请求之外的）', ['bind'],
+    )
+
+_listening = False
+
+
+def _endpoint():
+    # 使用路由名而不是实际路径，避免 /pieces/<id> 之类的地址产生大量标签
+    return request.endpoint or 'unmatched'
+
+
+def _bind_label(conn):
+    """SQLite 为文件名，数据库服务器为库名"""
+    return os.path.basename(conn.engine.url.database or '')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # 开始时间记在本次执行的上下文上，语句出错时不会残留
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    SQL_STATEMENTS.labels(_bind_label(conn)).inc()
+    if has_request_context() and 'sql_statements' in g:
+        g.sql_statements += 1
+        g.sql_seconds += time.perf_counter() - context._query_started
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+
+
+def _after_request(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+
+    endpoint = _endpoint()
+    REQUEST_LATENCY.labels(request.method, endpoint, str(response.status_code)).observe(
+        time.perf_counter() - started
+    )
+    if not response.is_streamed:
+        RESPONSE_SIZE.labels(endpoint).observe(response.calculate_content_length() or 0)
+    REQUEST_SQL_STATEMENTS.labels(endpoint).observe(g.pop('sql_statements', 0))
+    REQUEST_SQL_SECONDS.labels(endpoint).observe(g.pop('sql_seconds', 0.0))
+    return response
+
+
+def init_app(app):
+    """注册请求钩子；需在 compression.init_app 之前调用，这样记录的是压缩后的响应大小"""
+    global _listening
+    if prometheus_client is None:
+        app.logger.info("未安装 prometheus_client，不记录请求指标")
+        return
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    if not _listening:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listening = True
+
+
+def render_latest():
+    """返回 (Prometheus 文本, Content-Type)；多 worker 时汇总共享目录中的所有指标，未安装 prometheus_client 时返回 None"""
+    if prometheus_client is None:
+        return None
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """gunicorn worker 退出后（child_exit）清理它在共享目录中的实时指标文件"""
+    if prometheus_client is not None and os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
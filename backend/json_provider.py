@@ -0,0 +1,81 @@
+# backend/json_provider.py
+"""
+JSON 序列化
+安装了 orjson 时 jsonify 使用 orjson，否则使用标准库 json。JSON_PROVIDER 环境变量可以强制指定（orjson / stdlib）。
+两种实现输出一致：键排序，datetime/date 输出 ISO 8601（与模型 to_dict() 中的 isoformat() 相同）。
+
+列表接口可以只查询需要的列（模型的 json_columns()），用 rows_to_dicts() 把结果行直接转成字典，
+不构造 ORM 对象，datetime 也留给序列化器处理。
+"""
+import os
+from datetime import date, datetime
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+PROVIDERS = ('orjson', 'stdlib')
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """标准库 json，datetime 输出 ISO 8601 而不是 Flask 默认的 HTTP 日期格式"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+
+class OrjsonProvider(StdlibJSONProvider):
+    """orjson：直接输出 UTF-8 字节，datetime、UUID、dataclass 原生处理"""
+
+    # 与 DefaultJSONProvider 的 sort_keys 保持一致；统计接口有整数键
+    option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        # 带额外参数（indent、cls 等）的调用交给标准库
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        option = self.option
+        if self.compact is None and self._app.debug or self.compact is False:
+            option |= orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option), mimetype=self.mimetype
+        )
+
+
+def get_provider_class(name=None):
+    name = name or os.environ.get('JSON_PROVIDER') or ('orjson' if orjson else 'stdlib')
+    if name not in PROVIDERS:
+        raise ValueError(f"未知的 JSON 序列化实现: {name}，可选: {', '.join(PROVIDERS)}")
+    if name == 'orjson' and orjson is None:
+        raise ValueError("JSON_PROVIDER=orjson 需要安装 orjson")
+    return name, OrjsonProvider if name == 'orjson' else StdlibJSONProvider
+
+
+def init_app(app, name=None):
+    name, provider_class = get_provider_class(name)
+    app.json = provider_class(app)
+    app.logger.info(f"JSON 序列化: {name}")
+
+
+def rows_to_dicts(rows):
+    """把按列查询的结果行（带列名）转换为字典列表"""
+    rows = list(rows)
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    return [dict(zip(keys, row)) for row in rows]
@@ -5,6 +5,8 @@ import time
 # 修改：从独立的 database 文件导入 db
 from database import db  # 改为从 database.py 导入
 from models.metrics import WebsiteMetrics
+import instrumentation
+from rate_limit import rate_limit
 
 metrics_bp = Blueprint('metrics', __name__, url_prefix='/api/metrics')
 
@@ -32,6 +34,7 @@ def get_visitor_count():
         return jsonify({"error": "Failed to retrieve visitor count", "details": str(e)}), 500
 
 @metrics_bp.route('/increment_visitor_count', methods=['POST'])
+@rate_limit('visitor', rate=0.1, burst=3)
 def increment_visitor_count():
     """
     增加网站访问人数。
@@ -80,4 +83,54 @@ def get_website_uptime():
     except Exception as e:
         db.session.rollback() # 确保在异常发生时回滚会话
         current_app.logger.error(f"Error getting website uptime from SQLite: {e}")
-        return jsonify({"error": "Failed to retrieve website uptime", "details": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": "Failed to retrieve website uptime", "details": str(e)}), 500
+
+@metrics_bp.route('/prometheus', methods=['GET'])
+def get_prometheus_metrics():
+    """
+    Prometheus 格式的请求耗时、SQL 和响应大小指标（多 worker 汇总）。
+    """
+    result = instrumentation.render_latest()
+    if result is None:
+        return jsonify({"error": "prometheus_client is not installed"}), 503
+    body, content_type = result
+    return current_app.response_class(body, content_type=content_type)
+
+@metrics_bp.route('/health', methods=['GET'])
+def health():
+    """
+    存活检查：进程能处理请求即返回 200，不访问数据库。
+    """
+    return jsonify({"status": "ok"}), 200
+
+@metrics_bp.route('/ready', methods=['GET'])
+def ready():
+    """
+    就绪检查：每个数据库可以连接且结构版本与代码一致时返回 200，否则返回 503。
+    接口不需要认证，失败时只返回固定的标签，异常详情（可能包含数据库地址）写入日志。
+    """
+    import schema
+    from sqlalchemy import text
+
+    databases = {}
+    for bind_key, engine in db.engines.items():
+        try:
+            with engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+            databases[bind_key or 'default'] = 'ok'
+        except Exception as e:
+            current_app.logger.error(f"就绪检查: 数据库 {bind_key or 'default'} 连接失败: {e}")
+            databases[bind_key or 'default'] = 'unavailable'
+
+    try:
+        versions = {bind_key or 'default': {'current': current, 'expected': expected}
+                    for bind_key, (current, expected) in schema.status().items()}
+    except Exception as e:
+        current_app.logger.error(f"就绪检查: 读取结构版本失败: {e}")
+        versions = {'error': 'unavailable'}
+
+    is_ready = all(state == 'ok' for state in databases.values()) and all(
+        isinstance(state, dict) and state['current'] == state['expected'] for state in versions.values()
+    )
+    return jsonify({"status": "ready" if is_ready else "not_ready", "databases": databases, "schema": versions}), \
+        200 if is_ready else 503
@@ -1,7 +1,10 @@
 import os
-import mysql.connector
-from datetime import datetime
+import argparse
 from run import create_app, db
+import migration_engine
+from migration_engine import TableCopy
+from drive_app import read_model
+from response_cache import invalidate_tables
 
 # 导入所有需要迁移的数据库模型
 from models.set_type import SetType
@@ -17,157 +20,131 @@ MYSQL_CONFIG = {
     'database': 'zzz_drive_stats'
 }
 
-def migrate_complete_data():
+# === MySQL -> SQLite 字段映射（逐行，接收源行字典，返回目标行字典）===
+
+def map_set_type(row):
+    return {
+        'set_id': row['set_id'],
+        'set_name': row['set_name'],
+        'two_piece_effect': row.get('two_piece_effect'),
+        'four_piece_effect': row.get('four_piece_effect')
+    }
+
+def map_stat_type(row):
+    return {
+        'stat_type_id': row['stat_type_id'],
+        'stat_name': row['stat_name'],
+        'stat_type': 'both'  # MySQL中没有这个字段，使用默认值
+    }
+
+def map_drive_piece(row):
+    return {
+        'drive_id': row['drive_id'],
+        'set_id': row['set_id'],
+        'position': row['position'],
+        'main_stat_id': row['main_stat_id'],
+        'main_stat_level': 15,  # 默认值，MySQL中可能没有这个字段
+        'total_upgrades': 0,    # 默认值，MySQL中可能没有这个字段
+        'substats': None,       # JSON字段，稍后通过关联表填充
+        'created_at': row.get('created_at'),
+        'updated_at': row.get('created_at')  # 使用created_at作为updated_at
+    }
+
+def map_substat(row):
+    return {
+        'id': row['id'],
+        'drive_id': row['drive_id'],
+        'stat_id': row['stat_id'],
+        'created_at': row.get('created_at')
+    }
+
+def map_upgrade_record(row):
+    return {
+        'upgrade_id': row['upgrade_id'],
+        'drive_id': row['drive_id'],
+        'substat_id': row['substat_id'],
+        'is_original': bool(row['is_original']),  # tinyint -> boolean
+        'upgrade_count': row['upgrade_count'],
+        'created_at': row.get('created_at'),
+        'updated_at': row.get('created_at')  # 使用created_at作为updated_at
+    }
+
+# 本次增量同步写入过的驱动盘，同步结束后据此清理源库中已删除的副词条和强化记录
+synced_drives = set()
+
+def refresh_drive_levels(conn, rows):
+    """增量同步写入副词条或强化记录后，重新生成这些驱动盘的打包副词条列"""
+    drive_ids = {row['drive_id'] for row in rows}
+    synced_drives.update(drive_ids)
+    read_model.write_levels(conn, read_model.expected_levels(conn, drive_ids))
+
+def prune_drive_children(source, chunk_size):
+    """删除同步过的驱动盘在源库中已删除的副词条和强化记录，并重新生成这些驱动盘的打包副词条列"""
+    pruned = migration_engine.prune_children(
+        source, [spec for spec in TABLES if spec.model in (DrivePieceSubstat, UpgradeRecord)],
+        'drive_id', synced_drives, chunk_size)
+    if pruned:
+        with db.engines['drive_stats'].begin() as conn:
+            refresh_drive_levels(conn, [{'drive_id': drive_id} for drive_id in pruned])
+    print(f"已清理 {len(pruned)} 个驱动盘中源库已删除的副词条和强化记录。")
+
+# MySQL 中没有 updated_at，增量同步只同步新增的行
+TABLES = [
+    TableCopy(SetType, transform=map_set_type),
+    TableCopy(StatType, transform=map_stat_type),
+    TableCopy(DrivePiece, transform=map_drive_piece, on_sync=refresh_drive_levels),
+    TableCopy(DrivePieceSubstat, transform=map_substat, on_sync=refresh_drive_levels),
+    TableCopy(UpgradeRecord, transform=map_upgrade_record, on_sync=refresh_drive_levels),
+]
+
+def migrate_complete_data(source_url=None, chunk_size=migration_engine.DEFAULT_CHUNK_SIZE, incremental=False):
     """
     完整迁移 MySQL 数据到 SQLite，正确映射字段。
+    按块流式读取、批量写入；source_url 可以指定 sqlite:///路径 用本地文件代替 MySQL。
+    incremental 为真时不清空目标表，从上次同步的位置继续写入新增的行。
     """
     app = create_app()
 
     with app.app_context():
+        source = None
         try:
             print("🚀 开始完整数据迁移...")
-            print("正在连接到远程 MySQL 数据库...")
-            mysql_conn = mysql.connector.connect(**MYSQL_CONFIG)
-            mysql_cursor = mysql_conn.cursor(dictionary=True)
-            print("✅ 成功连接到远程 MySQL。")
-            
-            # 首先清空现有数据（完全重建）
-            print("\n🗑️  清空现有数据...")
-            db.session.query(UpgradeRecord).delete()
-            db.session.query(DrivePieceSubstat).delete()
-            db.session.query(DrivePiece).delete()
-            db.session.query(StatType).delete()
-            db.session.query(SetType).delete()
-            db.session.commit()
-            print("✅ 现有数据已清空。")
-
-            # === 1. 迁移 set_types 表 ===
-            print("\n📦 迁移套装类型数据...")
-            mysql_cursor.execute("SELECT * FROM set_types ORDER BY set_id")
-            mysql_set_types = mysql_cursor.fetchall()
-            
-            for mysql_record in mysql_set_types:
-                # MySQL -> SQLite 字段映射（字段名一致）
-                sqlite_record = SetType(
-                    set_id=mysql_record['set_id'],  
-                    set_name=mysql_record['set_name'],  
-                    two_piece_effect=mysql_record.get('two_piece_effect'),
-                    four_piece_effect=mysql_record.get('four_piece_effect')
-                )
-                db.session.add(sqlite_record)
-                print(f"  ✓ 套装: {mysql_record['set_name']}")
-            
-            db.session.commit()
-            print(f"✅ 完成套装类型迁移，共 {len(mysql_set_types)} 条记录。")
-
-            # === 2. 迁移 stat_types 表 ===
-            print("\n📊 迁移词条类型数据...")
-            mysql_cursor.execute("SELECT * FROM stat_types ORDER BY stat_type_id")
-            mysql_stat_types = mysql_cursor.fetchall()
-            
-            for mysql_record in mysql_stat_types:
-                # MySQL -> SQLite 字段映射（字段名一致）
-                sqlite_record = StatType(
-                    stat_type_id=mysql_record['stat_type_id'],  
-                    stat_name=mysql_record['stat_name'],  
-                    stat_type='both'  # MySQL中没有这个字段，使用默认值
-                )
-                db.session.add(sqlite_record)
-                print(f"  ✓ 词条: {mysql_record['stat_name']}")
-            
-            db.session.commit()
-            print(f"✅ 完成词条类型迁移，共 {len(mysql_stat_types)} 条记录。")
-
-            # === 3. 迁移 drive_pieces 表 ===
-            print("\n🛡️  迁移驱动盘数据...")
-            mysql_cursor.execute("SELECT * FROM drive_pieces ORDER BY drive_id")
-            mysql_drive_pieces = mysql_cursor.fetchall()
-            
-            for mysql_record in mysql_drive_pieces:
-                # MySQL -> SQLite 字段映射
-                sqlite_record = DrivePiece(
-                    drive_id=mysql_record['drive_id'],  # 字段名相同
-                    set_id=mysql_record['set_id'],      # 字段名相同
-                    position=mysql_record['position'],  # 字段名相同
-                    main_stat_id=mysql_record['main_stat_id'],  # 字段名相同
-                    main_stat_level=15,  # 默认值，MySQL中可能没有这个字段
-                    total_upgrades=0,    # 默认值，MySQL中可能没有这个字段
-                    substats=None,       # JSON字段，稍后通过关联表填充
-                    created_at=mysql_record.get('created_at'),
-                    updated_at=mysql_record.get('created_at')  # 使用created_at作为updated_at
-                )
-                db.session.add(sqlite_record)
-                if mysql_record['drive_id'] % 100 == 0:  # 每100条显示一次进度
-                    print(f"  ✓ 已处理 {mysql_record['drive_id']} 个驱动盘...")
-            
-            db.session.commit()
-            print(f"✅ 完成驱动盘迁移，共 {len(mysql_drive_pieces)} 条记录。")
-            
-            # === 4. 迁移 drive_piece_substats 表 ===
-            print("\n🔗 迁移副词条关联数据...")
-            mysql_cursor.execute("SELECT * FROM drive_piece_substats ORDER BY id")
-            mysql_substats = mysql_cursor.fetchall()
-            
-            for mysql_record in mysql_substats:
-                # MySQL -> SQLite 字段映射（字段名一致）
-                sqlite_record = DrivePieceSubstat(
-                    drive_id=mysql_record['drive_id'],  # 字段名一致
-                    stat_id=mysql_record['stat_id'],    # 字段名一致
-                    created_at=mysql_record.get('created_at')
-                )
-                db.session.add(sqlite_record)
-                if mysql_record['id'] % 500 == 0:  # 每500条显示一次进度
-                    print(f"  ✓ 已处理 {mysql_record['id']} 个副词条关联...")
-            
-            db.session.commit()
-            print(f"✅ 完成副词条关联迁移，共 {len(mysql_substats)} 条记录。")
-
-            # === 5. 迁移 upgrade_records 表 ===
-            print("\n⚡ 迁移强化记录数据...")
-            mysql_cursor.execute("SELECT * FROM upgrade_records ORDER BY upgrade_id")
-            mysql_upgrades = mysql_cursor.fetchall()
-            
-            for mysql_record in mysql_upgrades:
-                # MySQL -> SQLite 字段映射（字段名一致）
-                sqlite_record = UpgradeRecord(
-                    upgrade_id=mysql_record['upgrade_id'],
-                    drive_id=mysql_record['drive_id'],
-                    substat_id=mysql_record['substat_id'],
-                    is_original=bool(mysql_record['is_original']),  # tinyint -> boolean
-                    upgrade_count=mysql_record['upgrade_count'],
-                    created_at=mysql_record.get('created_at'),
-                    updated_at=mysql_record.get('created_at')  # 使用created_at作为updated_at
-                )
-                db.session.add(sqlite_record)
-                print(f"  ✓ 强化记录 ID: {mysql_record['upgrade_id']}")
-            
-            db.session.commit()
-            print(f"✅ 完成强化记录迁移，共 {len(mysql_upgrades)} 条记录。")
+            print("正在连接到源数据库...")
+            source = migration_engine.open_source(source_url) if source_url else migration_engine.mysql_source(**MYSQL_CONFIG)
+            print(f"✅ 成功连接到 {source.name}。")
+
+            if incremental:
+                # 打包副词条列在同步每块时已经更新；源库中删除的子表行在同步结束后清理
+                results = migration_engine.sync(source, TABLES, chunk_size=chunk_size)
+                prune_drive_children(source, chunk_size)
+            else:
+                # 清空现有数据（完全重建）后逐表复制
+                results = migration_engine.migrate(source, TABLES, chunk_size=chunk_size)
+
+                # === 生成驱动盘读模型（打包的副词条列）===
+                print("\n📦 生成驱动盘打包副词条列...")
+                with db.engines['drive_stats'].begin() as conn:
+                    rebuilt = read_model.rebuild(conn)
+                print(f"✅ 完成 {rebuilt} 个驱动盘的打包副词条列。")
 
             # === 数据迁移统计 ===
             print("\n📈 迁移完成统计:")
-            print(f"  📦 套装类型: {len(mysql_set_types)} 条")
-            print(f"  📊 词条类型: {len(mysql_stat_types)} 条")
-            print(f"  🛡️  驱动盘: {len(mysql_drive_pieces)} 条")
-            print(f"  🔗 副词条关联: {len(mysql_substats)} 条")
-            print(f"  ⚡ 强化记录: {len(mysql_upgrades)} 条")
-            print(f"  📊 总计: {len(mysql_set_types) + len(mysql_stat_types) + len(mysql_drive_pieces) + len(mysql_substats) + len(mysql_upgrades)} 条记录")
+            for result in results:
+                print(f"  {result['table']}: {result['rows']} 条，{result['rows_per_second']:,.0f} 行/秒")
+            print(f"  📊 总计: {sum(result['rows'] for result in results)} 条记录")
 
             print("\n🎉 数据迁移完成！")
 
-        except mysql.connector.Error as e:
-            print(f"❌ MySQL 连接或查询错误: {e}")
-            db.session.rollback()
         except Exception as e:
             print(f"❌ 迁移过程中发生错误: {e}")
             import traceback
             traceback.print_exc()
-            db.session.rollback()
         finally:
-            if 'mysql_conn' in locals() and mysql_conn.is_connected():
-                mysql_cursor.close()
-                mysql_conn.close()
-                print("🔌 MySQL 连接已关闭。")
+            # 写入没有经过应用的会话，运行中的服务需要在这里让这些表的缓存和 ETag 失效（中途失败时也已写入部分数据）
+            invalidate_tables(spec.table.name for spec in TABLES)
+            if source is not None:
+                source.close()
+                print("🔌 源数据库连接已关闭。")
 
 def backup_sqlite_before_migration():
     """
@@ -192,17 +169,28 @@ def backup_sqlite_before_migration():
         return None
 
 if __name__ == '__main__':
-    print("🌟 开始完整数据迁移流程...")
-    
-    # 备份现有数据
-    backup_file = backup_sqlite_before_migration()
-    if backup_file:
-        print(f"📁 数据已备份，如需恢复可使用: {backup_file}")
-    
-    # 询问确认
-    print("\n⚠️  警告: 此操作将完全替换现有的SQLite数据库内容！")
-    print("请确保已经备份了重要数据。")
-    
-    # 在脚本中直接执行，不需要用户确认
-    print("🚀 开始迁移...")
-    migrate_complete_data()
+    parser = argparse.ArgumentParser(description='从 MySQL 完整迁移驱动盘数据')
+    parser.add_argument('--source', help='源库地址，默认使用 MYSQL_CONFIG，例如 sqlite:////tmp/drive_stats.db')
+    parser.add_argument('--chunk-size', type=int, default=migration_engine.DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--incremental', action='store_true', help='增量同步：不清空目标表，从上次同步（或中断）的位置继续')
+    args = parser.parse_args()
+
+    if args.incremental:
+        # 增量同步不清空现有数据，不需要备份
+        print("🔄 开始增量同步...")
+        migrate_complete_data(args.source, args.chunk_size, incremental=True)
+    else:
+        print("🌟 开始完整数据迁移流程...")
+
+        # 备份现有数据
+        backup_file = backup_sqlite_before_migration()
+        if backup_file:
+            print(f"📁 数据已备份，如需恢复可使用: {backup_file}")
+
+        # 询问确认
+        print("\n⚠️  警告: 此操作将完全替换现有的SQLite数据库内容！")
+        print("请确保已经备份了重要数据。")
+
+        # 在脚本中直接执行，不需要用户确认
+        print("🚀 开始迁移...")
+        migrate_complete_data(args.source, args.chunk_size)
\ No newline at end of file
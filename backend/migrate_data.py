@@ -1,7 +1,9 @@
-import os
-import mysql.connector
-from datetime import datetime
+import argparse
 from run import create_app, db
+import migration_engine
+from migration_engine import TableCopy
+from drive_app import read_model
+from response_cache import invalidate_tables
 
 # 导入所有需要迁移的数据库模型
 from models.set_type import SetType
@@ -19,82 +21,81 @@ MYSQL_CONFIG = {
 }
 # ====================================================================
 
-def migrate_data():
+# 本次增量同步写入过的驱动盘，同步结束后据此清理源库中已删除的副词条和强化记录
+synced_drives = set()
+
+def refresh_drive_levels(conn, rows):
+    """增量同步写入驱动盘、副词条或强化记录后，重新生成这些驱动盘的打包副词条列"""
+    drive_ids = {row['drive_id'] for row in rows}
+    synced_drives.update(drive_ids)
+    read_model.write_levels(conn, read_model.expected_levels(conn, drive_ids))
+
+def prune_drive_children(source, chunk_size):
+    """删除同步过的驱动盘在源库中已删除的副词条和强化记录，并重新生成这些驱动盘的打包副词条列"""
+    pruned = migration_engine.prune_children(
+        source, [spec for spec in TABLES if spec.model in (DrivePieceSubstat, UpgradeRecord)],
+        'drive_id', synced_drives, chunk_size)
+    if pruned:
+        with db.engines['drive_stats'].begin() as conn:
+            refresh_drive_levels(conn, [{'drive_id': drive_id} for drive_id in pruned])
+    print(f"已清理 {len(pruned)} 个驱动盘中源库已删除的副词条和强化记录。")
+
+# 按依赖顺序迁移，字段名与 MySQL 一致，直接复制
+# 增量同步时驱动盘和强化记录按 updated_at 同步修改过的行，其他表只同步新增的行
+TABLES = [
+    TableCopy(SetType),
+    TableCopy(StatType),
+    TableCopy(DrivePiece, watermark='updated_at', on_sync=refresh_drive_levels),
+    TableCopy(DrivePieceSubstat, on_sync=refresh_drive_levels),
+    TableCopy(UpgradeRecord, watermark='updated_at', on_sync=refresh_drive_levels),
+]
+
+def migrate_data(source_url=None, chunk_size=migration_engine.DEFAULT_CHUNK_SIZE, incremental=False):
     """
     从 MySQL 数据库迁移数据到 SQLite 数据库。
+    source_url 为空时连接 MYSQL_CONFIG，也可以指定 sqlite:///路径 用本地文件代替 MySQL。
+    incremental 为真时不清空目标表，从上次同步的位置继续，只写入新增和修改的行。
     """
     app = create_app()
 
     with app.app_context():
+        source = None
         try:
-            print("正在连接到远程 MySQL 数据库...")
-            mysql_conn = mysql.connector.connect(**MYSQL_CONFIG)
-            mysql_cursor = mysql_conn.cursor(dictionary=True)
-            print("成功连接到远程 MySQL。")
-            
-            # 清空 SQLite 数据库中的所有相关表，以避免重复数据
-            print("正在清空 SQLite 数据库...")
-            db.session.query(UpgradeRecord).delete()
-            db.session.query(DrivePieceSubstat).delete()
-            db.session.query(DrivePiece).delete()
-            db.session.query(StatType).delete()
-            db.session.query(SetType).delete()
-            db.session.commit()
-            print("SQLite 数据库相关表已清空。")
-
-            # === 1. 迁移 set_types 表 ===
-            print("开始迁移 'set_types' 表...")
-            mysql_cursor.execute("SELECT * FROM set_types")
-            set_types_data = mysql_cursor.fetchall()
-            db.session.bulk_insert_mappings(SetType, set_types_data)
-            db.session.commit()
-            print(f"成功迁移 {len(set_types_data)} 条套装数据。")
+            print("正在连接到源数据库...")
+            source = migration_engine.open_source(source_url) if source_url else migration_engine.mysql_source(**MYSQL_CONFIG)
+            print(f"成功连接到 {source.name}。")
 
-            # === 2. 迁移 stat_types 表 ===
-            print("开始迁移 'stat_types' 表...")
-            mysql_cursor.execute("SELECT * FROM stat_types")
-            stat_types_data = mysql_cursor.fetchall()
-            db.session.bulk_insert_mappings(StatType, stat_types_data)
-            db.session.commit()
-            print(f"成功迁移 {len(stat_types_data)} 条词条数据。")
+            if incremental:
+                # 打包副词条列在同步每块时已经更新；源库中删除的子表行在同步结束后清理
+                migration_engine.sync(source, TABLES, chunk_size=chunk_size)
+                prune_drive_children(source, chunk_size)
+                print("\n增量同步完成！")
+                return
 
-            # === 3. 迁移 drive_pieces 表 ===
-            print("开始迁移 'drive_pieces' 表...")
-            mysql_cursor.execute("SELECT * FROM drive_pieces")
-            drive_pieces_data = mysql_cursor.fetchall()
-            db.session.bulk_insert_mappings(DrivePiece, drive_pieces_data)
-            db.session.commit()
-            print(f"成功迁移 {len(drive_pieces_data)} 条驱动盘数据。")
-            
-            # === 4. 迁移 drive_piece_substats 表 ===
-            print("开始迁移 'drive_piece_substats' 表...")
-            mysql_cursor.execute("SELECT * FROM drive_piece_substats")
-            substats_data = mysql_cursor.fetchall()
-            db.session.bulk_insert_mappings(DrivePieceSubstat, substats_data)
-            db.session.commit()
-            print(f"成功迁移 {len(substats_data)} 条副词条关联数据。")
+            # 清空后按块复制各表
+            migration_engine.migrate(source, TABLES, chunk_size=chunk_size)
 
-            # === 5. 迁移 upgrade_records 表 ===
-            print("开始迁移 'upgrade_records' 表...")
-            mysql_cursor.execute("SELECT * FROM upgrade_records")
-            upgrade_records_data = mysql_cursor.fetchall()
-            db.session.bulk_insert_mappings(UpgradeRecord, upgrade_records_data)
-            db.session.commit()
-            print(f"成功迁移 {len(upgrade_records_data)} 条强化记录数据。")
+            # 生成驱动盘读模型（打包的副词条列）
+            print("开始生成驱动盘打包副词条列...")
+            with db.engines['drive_stats'].begin() as conn:
+                rebuilt = read_model.rebuild(conn)
+            print(f"成功生成 {rebuilt} 个驱动盘的打包副词条列。")
 
             print("\n所有数据已成功迁移！")
 
-        except mysql.connector.Error as e:
-            print(f"MySQL 连接或查询错误: {e}")
-            db.session.rollback()
         except Exception as e:
             print(f"迁移过程中发生错误: {e}")
-            db.session.rollback()
         finally:
-            if 'mysql_conn' in locals() and mysql_conn.is_connected():
-                mysql_cursor.close()
-                mysql_conn.close()
-                print("MySQL 连接已关闭。")
+            # 写入没有经过应用的会话，运行中的服务需要在这里让这些表的缓存和 ETag 失效（中途失败时也已写入部分数据）
+            invalidate_tables(spec.table.name for spec in TABLES)
+            if source is not None:
+                source.close()
+                print("源数据库连接已关闭。")
 
 if __name__ == '__main__':
-    migrate_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='从 MySQL 迁移驱动盘数据')
+    parser.add_argument('--source', help='源库地址，默认使用 MYSQL_CONFIG，例如 sqlite:////tmp/drive_stats.db')
+    parser.add_argument('--chunk-size', type=int, default=migration_engine.DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--incremental', action='store_true', help='增量同步：不清空目标表，从上次同步（或中断）的位置继续')
+    args = parser.parse_args()
+    migrate_data(args.source, args.chunk_size, args.incremental)
@@ -0,0 +1,320 @@
+# backend/migration_engine.py
+"""
+流式数据迁移
+从源库按表流式读取，批量写入当前应用的数据库：
+- 源库为 MySQL 时使用不缓冲的游标（结果集留在服务端），每次 fetchmany(chunk_size) 行，内存占用与表大小无关；
+  也可以用 SQLite 文件作为源库（测试、基准测试用，表结构与 MySQL 一致即可）
+- 每块经过可选的逐行字段映射、按目标列类型转换取值（源库返回字符串形式的 JSON 和时间）后用 db_bulk.bulk_insert 写入（PostgreSQL 走 COPY，SQLite 走 executemany），
+  每 commit_every 块提交一次；目标为 SQLite 时迁移期间临时关闭 synchronous、加大页缓存
+- 定时输出每张表的进度和每秒行数，结束后推进自增序列
+
+两种方式:
+- migrate(): 清空目标表后整表复制
+- sync(): 增量同步。目标库的 sync_checkpoints 表按 (源库, 表) 记录已同步到的位置（高水位）:
+  表设置了 watermark 列（例如 updated_at）时按 (watermark, 主键) 顺序读取新增和修改的行，否则按主键只读取新增的行，
+  用 bulk_upsert 按主键写入。检查点和数据在同一事务中提交，中断后重新执行会从上次提交的位置继续（包括中断的整表复制）。
+  源库中删除的行不会同步，需要时用 migrate() 重新整表复制；子表（如副词条）可以在同步后用 prune_children()
+  按父表主键删除源库中已不存在的行。
+
+用法见 migrate_data.py / migrate_complete.py，源库地址格式:
+    mysql://用户:密码@主机:端口/库名    sqlite:////路径/drive_stats.db
+"""
+import json
+import sqlite3
+import time
+from datetime import datetime
+
+import sqlalchemy as sa
+
+from database import db
+from db_bulk import bulk_insert, bulk_upsert, reset_sequence
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_COMMIT_EVERY = 20
+# 进度输出间隔（秒）
+REPORT_INTERVAL = 2
+
+# 迁移期间目标 SQLite 连接上的 PRAGMA，结束后恢复原值
+BULK_PRAGMAS = {'synchronous': 'OFF', 'cache_size': -65536}
+
+# 同步检查点不属于模型元数据，第一次同步时在目标库中创建
+_checkpoint_metadata = sa.MetaData()
+checkpoint_table = sa.Table(
+    'sync_checkpoints', _checkpoint_metadata,
+    sa.Column('source', sa.String(255), primary_key=True),
+    sa.Column('table_name', sa.String(100), primary_key=True),
+    # 最后一行的 watermark 列取值（按源库返回的原样转为字符串），没有 watermark 列时为空
+    sa.Column('mark', sa.String(64)),
+    sa.Column('last_key', sa.Integer, nullable=False, default=0),
+    sa.Column('rows', sa.Integer, nullable=False, default=0),
+    sa.Column('updated_at', sa.DateTime),
+)
+
+
+class Source:
+    """源库连接，stream() 按块返回字典行；placeholder 为驱动的参数占位符"""
+
+    def __init__(self, connection, name, placeholder='?'):
+        self.connection = connection
+        self.name = name
+        self.placeholder = placeholder
+
+    def stream(self, sql, chunk_size, params=()):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield [dict(zip(columns, row)) for row in rows]
+        finally:
+            cursor.close()
+
+    def close(self):
+        self.connection.close()
+
+
+def mysql_source(**config):
+    """config 为 mysql.connector.connect() 的参数；默认游标不缓冲，逐块从服务端读取"""
+    import mysql.connector
+    return Source(mysql.connector.connect(**config), f"mysql://{config.get('host')}/{config.get('database')}",
+                  placeholder='%s')
+
+
+def open_source(url):
+    url = sa.engine.make_url(url)
+    backend = url.get_backend_name()
+    if backend == 'mysql':
+        return mysql_source(user=url.username, password=url.password, host=url.host,
+                            port=url.port or 3306, database=url.database)
+    if backend == 'sqlite':
+        return Source(sqlite3.connect(url.database), f'sqlite:///{url.database}')
+    raise ValueError(f"不支持的源库: {backend}（可选 mysql / sqlite）")
+
+
+class TableCopy:
+    """
+    一张表的迁移方式: 目标模型、源表名（默认与目标相同）、逐行字段映射（接收并返回字典）
+    watermark: 源表中记录修改时间的列，增量同步时据此读取修改过的行；为空时只同步新增的行
+    on_sync: 增量同步每块写入后调用 on_sync(conn, rows)，与写入在同一事务中（rows 为写入目标库的行）
+    """
+
+    def __init__(self, model, source_table=None, transform=None, watermark=None, on_sync=None):
+        self.model = model
+        self.table = model.__table__
+        self.source_table = source_table or self.table.name
+        self.transform = transform
+        self.watermark = watermark
+        self.on_sync = on_sync
+        self.key = list(self.table.primary_key.columns)[0].name
+
+    @property
+    def engine(self):
+        return db.session.get_bind(mapper=self.model)
+
+    def query(self, placeholder, checkpoint):
+        """返回 (sql, 参数)：从检查点之后按同步顺序读取"""
+        table, key, mark = self.source_table, self.key, self.watermark
+        last_key = checkpoint['last_key'] if checkpoint else 0
+        if not mark:
+            return f'SELECT * FROM {table} WHERE {key} > {placeholder} ORDER BY {key}', (last_key,)
+        if not checkpoint or checkpoint['mark'] is None:
+            # watermark 为 NULL 的行排在最前面
+            sql = (f'SELECT * FROM {table} WHERE ({mark} IS NULL AND {key} > {placeholder}) '
+                   f'OR {mark} IS NOT NULL ORDER BY {mark}, {key}')
+            return sql, (last_key,)
+        sql = (f'SELECT * FROM {table} WHERE {mark} > {placeholder} '
+               f'OR ({mark} = {placeholder} AND {key} > {placeholder}) ORDER BY {mark}, {key}')
+        return sql, (checkpoint['mark'], checkpoint['mark'], last_key)
+
+    def position(self, row):
+        """源库行对应的检查点位置 (mark, last_key)"""
+        mark = row[self.watermark] if self.watermark else None
+        return (None if mark is None else str(mark)), row[self.key]
+
+
+def _column_converters(table):
+    """源库以字符串返回的 JSON / 时间值，按目标列类型转换，其他值原样写入"""
+    converters = {}
+    for column in table.columns:
+        if isinstance(column.type, sa.JSON):
+            converters[column.name] = lambda value: json.loads(value) if isinstance(value, (str, bytes)) else value
+        elif isinstance(column.type, sa.DateTime):
+            converters[column.name] = lambda value: datetime.fromisoformat(value) if isinstance(value, str) else value
+    return converters
+
+
+class Progress:
+    """按时间间隔输出进度，结束时输出汇总"""
+
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+        self.rows = 0
+        self.started = self.reported = time.perf_counter()
+
+    def add(self, count):
+        self.rows += count
+        now = time.perf_counter()
+        if now - self.reported >= REPORT_INTERVAL:
+            self.reported = now
+            self.log(f"  {self.name}: {self.rows:,} 行，{self.rate():,.0f} 行/秒")
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def rate(self):
+        return self.rows / max(self.elapsed(), 1e-9)
+
+    def finish(self):
+        self.log(f"✅ {self.name}: {self.rows:,} 行，用时 {self.elapsed():.1f}s，{self.rate():,.0f} 行/秒")
+        return {'table': self.name, 'rows': self.rows, 'seconds': round(self.elapsed(), 3),
+                'rows_per_second': round(self.rate(), 1)}
+
+
+def _set_pragmas(conn, pragmas):
+    """设置 PRAGMA 并返回原值（只对 SQLite 生效）"""
+    if conn.dialect.name != 'sqlite':
+        return {}
+    previous = {}
+    for name, value in pragmas.items():
+        previous[name] = conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+        conn.exec_driver_sql(f'PRAGMA {name}={value}')
+    return previous
+
+
+def _checkpoint_filter(source, spec):
+    return (checkpoint_table.c.source == source.name) & (checkpoint_table.c.table_name == spec.table.name)
+
+
+def read_checkpoint(conn, source, spec):
+    """返回检查点字典，没有同步过时返回 None"""
+    _checkpoint_metadata.create_all(conn)
+    row = conn.execute(sa.select(checkpoint_table).where(_checkpoint_filter(source, spec))).mappings().first()
+    return dict(row) if row else None
+
+
+def write_checkpoint(conn, source, spec, mark, last_key, rows):
+    values = {'mark': mark, 'last_key': last_key, 'rows': rows, 'updated_at': datetime.utcnow()}
+    updated = conn.execute(checkpoint_table.update().where(_checkpoint_filter(source, spec)).values(**values))
+    if not updated.rowcount:
+        conn.execute(checkpoint_table.insert().values(source=source.name, table_name=spec.table.name, **values))
+
+
+def sync_table(source, spec, conn, chunk_size=DEFAULT_CHUNK_SIZE, commit_every=DEFAULT_COMMIT_EVERY,
+               upsert=True, log=print):
+    """
+    从检查点之后读取源表并写入 conn（目标库连接），每块写入后在同一事务中推进检查点，返回统计信息
+    upsert=False 时直接插入（目标表已清空的整表复制）
+    """
+    progress = Progress(spec.table.name, log)
+    converters = _column_converters(spec.table)
+    checkpoint = read_checkpoint(conn, source, spec)
+    synced = checkpoint['rows'] if checkpoint else 0
+    sql, params = spec.query(source.placeholder, checkpoint)
+
+    for index, rows in enumerate(source.stream(sql, chunk_size, params), 1):
+        mark, last_key = spec.position(rows[-1])
+        if spec.transform:
+            rows = [spec.transform(row) for row in rows]
+        for row in rows:
+            for name, convert in converters.items():
+                if row.get(name) is not None:
+                    row[name] = convert(row[name])
+        if upsert:
+            bulk_upsert(conn, spec.table, rows)
+            if spec.on_sync:
+                spec.on_sync(conn, rows)
+        else:
+            bulk_insert(conn, spec.table, rows)
+        synced += len(rows)
+        write_checkpoint(conn, source, spec, mark, last_key, synced)
+        if index % commit_every == 0:
+            conn.commit()
+        progress.add(len(rows))
+    reset_sequence(conn, spec.table)
+    conn.commit()
+    return progress.finish()
+
+
+def copy_table(source, spec, conn, chunk_size=DEFAULT_CHUNK_SIZE, commit_every=DEFAULT_COMMIT_EVERY, log=print):
+    """把源表整表复制到已清空的目标表，返回统计信息"""
+    return sync_table(source, spec, conn, chunk_size, commit_every, upsert=False, log=log)
+
+
+def clear_tables(source, specs):
+    """按依赖的相反顺序清空目标表，并删除这些表的检查点"""
+    for spec in reversed(specs):
+        with spec.engine.begin() as conn:
+            conn.execute(spec.table.delete())
+            _checkpoint_metadata.create_all(conn)
+            conn.execute(checkpoint_table.delete().where(_checkpoint_filter(source, spec)))
+
+
+def _run(specs, copy, log):
+    """按 specs 的顺序（被引用的表在前）逐表执行 copy(spec, conn)，输出汇总"""
+    results = []
+    for spec in specs:
+        with spec.engine.connect() as conn:
+            previous = _set_pragmas(conn, BULK_PRAGMAS)
+            try:
+                results.append(copy(spec, conn))
+            finally:
+                conn.rollback()
+                _set_pragmas(conn, previous)
+
+    total_rows = sum(result['rows'] for result in results)
+    total_seconds = sum(result['seconds'] for result in results)
+    log(f"共 {total_rows:,} 行，用时 {total_seconds:.1f}s，{total_rows / max(total_seconds, 1e-9):,.0f} 行/秒")
+    return results
+
+
+def migrate(source, specs, chunk_size=DEFAULT_CHUNK_SIZE, commit_every=DEFAULT_COMMIT_EVERY, log=print):
+    """
+    清空目标表后逐表整表复制，返回每张表的统计信息；中断后可以用 sync() 继续
+    需在应用上下文中调用
+    """
+    log(f"源库: {source.name}，每块 {chunk_size} 行，每 {commit_every} 块提交一次")
+    clear_tables(source, specs)
+    return _run(specs, lambda spec, conn: copy_table(source, spec, conn, chunk_size, commit_every, log), log)
+
+
+def sync(source, specs, chunk_size=DEFAULT_CHUNK_SIZE, commit_every=DEFAULT_COMMIT_EVERY, log=print):
+    """
+    从各表的检查点继续增量同步，返回每张表的统计信息（rows 为本次同步的行数）
+    需在应用上下文中调用
+    """
+    log(f"增量同步: {source.name}，每块 {chunk_size} 行，每 {commit_every} 块提交一次")
+    return _run(specs, lambda spec, conn: sync_table(source, spec, conn, chunk_size, commit_every, log=log), log)
+
+
+def prune_children(source, specs, column, values, chunk_size=DEFAULT_CHUNK_SIZE, log=print):
+    """
+    删除子表中源库已删除的行：column（如 drive_id）取值在 values 中的目标行，主键在源库中不存在时删除。
+    源库和目标的主键、column 列名需相同；specs 按依赖顺序（被引用的表在前），删除时逆序。
+    在同步结束后调用（MySQL 不缓冲的游标读完之前不能在同一连接上执行其他查询），返回有行被删除的 column 取值
+    需在应用上下文中调用
+    """
+    values = sorted(values)
+    affected = set()
+    for spec in reversed(specs):
+        key, target_column = spec.table.c[spec.key], spec.table.c[column]
+        deleted = 0
+        for start in range(0, len(values), chunk_size):
+            batch = values[start:start + chunk_size]
+            placeholders = ', '.join([source.placeholder] * len(batch))
+            sql = f'SELECT {spec.key} FROM {spec.source_table} WHERE {column} IN ({placeholders})'
+            alive = {row[spec.key] for rows in source.stream(sql, chunk_size, tuple(batch)) for row in rows}
+            with spec.engine.begin() as conn:
+                stale = [(row_key, parent) for row_key, parent in
+                         conn.execute(sa.select(key, target_column).where(target_column.in_(batch)))
+                         if row_key not in alive]
+                if stale:
+                    conn.execute(spec.table.delete().where(key.in_([row_key for row_key, _ in stale])))
+            deleted += len(stale)
+            affected.update(parent for _, parent in stale)
+        if deleted:
+            log(f"🗑️  {spec.table.name}: 删除源库中已不存在的 {deleted:,} 行")
+    return affected
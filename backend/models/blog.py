@@ -1,5 +1,6 @@
 # models/blog.py
 # **关键修改：从独立文件导入 db 实例**
+from datetime import datetime
 from database import db  
 
 class Post(db.Model):
@@ -11,8 +12,12 @@ class Post(db.Model):
     excerpt = db.Column(db.Text, nullable=True) # Short summary of the post
     content = db.Column(db.Text, nullable=False)
     image_url = db.Column(db.String(255), nullable=True) # URL for the cover image
-    created_at = db.Column(db.DateTime, default=db.func.now())
-    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
+    # Tiny inline WebP data URI of the cover, shown until the cover loads (image_placeholder.py)
+    placeholder = db.Column(db.Text, nullable=True)
+    # UTC timestamps taken in Python, like DrivePiece: microsecond precision (SQLite's
+    # CURRENT_TIMESTAMP only has seconds), so two edits within a second get different ETags
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     views = db.Column(db.Integer, default=0) # 新增：阅读量字段，默认值为 0
 
     def __repr__(self):
@@ -31,7 +36,22 @@ class Post(db.Model):
             'excerpt': self.excerpt,
             'content': self.content,
             'imageUrl': self.image_url, # Use camelCase for frontend consistency
+            'placeholder': self.placeholder,
             'createdAt': self.created_at.isoformat() if self.created_at else None,
             'updatedAt': self.updated_at.isoformat() if self.updated_at else None,
             'views': self.views # 新增：包含 views 字段
         }
+
+    @classmethod
+    def json_columns(cls):
+        """
+        Columns matching to_dict(), for list endpoints that serialize rows without loading ORM objects.
+        """
+        return (
+            cls.id, cls.title, cls.excerpt, cls.content,
+            cls.image_url.label('imageUrl'),
+            cls.placeholder,
+            cls.created_at.label('createdAt'),
+            cls.updated_at.label('updatedAt'),
+            cls.views,
+        )
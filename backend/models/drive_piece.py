@@ -1,7 +1,7 @@
 # backend/models/drive_piece.py
 from database import db
 from datetime import datetime
-from sqlalchemy.dialects.postgresql import JSON  # 如果使用 PostgreSQL，可以直接使用 JSON 类型
+from sqlalchemy.dialects.postgresql import JSONB  # PostgreSQL 上使用原生 JSONB
 
 class DrivePiece(db.Model):
     __bind_key__ = 'drive_stats'
@@ -13,14 +13,30 @@ class DrivePiece(db.Model):
     main_stat_id = db.Column(db.Integer, db.ForeignKey('stat_types.stat_type_id'), nullable=False)
     main_stat_level = db.Column(db.Integer, default=15)  # 主词条等级，默认15
     total_upgrades = db.Column(db.Integer, default=0)  # 强化点数
-    substats = db.Column(db.JSON)  # 以JSON格式存储副词条列表
+    substats = db.Column(db.JSON().with_variant(JSONB(), 'postgresql'))  # 以JSON格式存储副词条列表
+    # 读模型: [[副词条 id, 词条 id, 强化次数, 是否原始词条], ...]，由写接口维护（见 drive_app/read_model.py）
+    substat_levels = db.Column(db.JSON().with_variant(JSONB(), 'postgresql'))
+    # 乐观锁版本号，每次修改加一；强化/降级用条件 UPDATE 维护，ORM 修改由 version_id_col 自动检查
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # 关系定义
     set_type = db.relationship('SetType', backref=db.backref('drive_pieces', lazy=True))
     main_stat_type = db.relationship('StatType', backref=db.backref('main_stat_pieces', lazy=True))
+
+    __table_args__ = (
+        # 列表按创建时间倒序分页
+        db.Index('ix_drive_pieces_created_at', 'created_at'),
+        # 按位置分布、每个位置的主词条分布（覆盖索引，统计时不回表）
+        db.Index('ix_drive_pieces_position_main_stat', 'position', 'main_stat_id'),
+        # 套装分布、主词条分布
+        db.Index('ix_drive_pieces_set_id', 'set_id'),
+        db.Index('ix_drive_pieces_main_stat_id', 'main_stat_id'),
+    )
     
+    __mapper_args__ = {'version_id_col': version}
+
     def __repr__(self):
         return f'<DrivePiece {self.drive_id}: {self.position}号位>'
 
@@ -34,10 +50,25 @@ class DrivePiece(db.Model):
             'main_stat_level': self.main_stat_level,
             'total_upgrades': self.total_upgrades,
             'substats': self.substats or [],
+            'version': self.version,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+    @classmethod
+    def json_columns(cls):
+        """
+        与 to_dict() 字段一致的列，列表接口按列查询、不构造 ORM 对象
+        查询需要 outerjoin SetType 和 StatType（主词条），substats 为空时调用方补成 []
+        """
+        from models.set_type import SetType
+        from models.stat_type import StatType
+        return (
+            cls.drive_id, SetType.set_name, cls.position,
+            StatType.stat_name.label('main_stat_name'),
+            cls.main_stat_level, cls.total_upgrades, cls.substats, cls.version, cls.created_at, cls.updated_at,
+        )
+
 
 class DrivePieceSubstat(db.Model):
     """驱动盘副词条关联表"""
@@ -56,6 +87,8 @@ class DrivePieceSubstat(db.Model):
     # 确保同一个驱动盘不会有重复的副词条
     __table_args__ = (
         db.UniqueConstraint('drive_id', 'stat_id', name='unique_drive_substat'),
+        # 按词条统计出现次数、配对概率的子查询（stat_id IN (...) GROUP BY drive_id），覆盖索引
+        db.Index('ix_drive_piece_substats_stat_drive', 'stat_id', 'drive_id'),
     )
 
     def __repr__(self):
@@ -17,9 +17,28 @@ class TravelPhoto(db.Model):
     file_type = db.Column(db.String(50), nullable=False)
     url = db.Column(db.String(500), nullable=False)
     thumbnail_url = db.Column(db.String(500), nullable=True)
+    # Read from the image header on upload (travel_app/image_meta.py); width and height
+    # are the display size after applying the EXIF orientation
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    orientation = db.Column(db.SmallInteger, nullable=True)
+    taken_at = db.Column(db.DateTime, nullable=True)
+    camera = db.Column(db.String(100), nullable=True)
+    # Tiny inline WebP data URI (~20px), shown blurred until the thumbnail loads (image_placeholder.py)
+    placeholder = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=db.func.now())
     updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
 
+    __table_args__ = (
+        # Category filter + newest first; category counts can scan the index alone
+        db.Index('ix_travel_photo_category_created_at', 'category', 'created_at'),
+        # Newest first without a category filter
+        db.Index('ix_travel_photo_created_at', 'created_at'),
+        # Sort by capture time, optionally within a category
+        db.Index('ix_travel_photo_category_taken_at', 'category', 'taken_at'),
+        db.Index('ix_travel_photo_taken_at', 'taken_at'),
+    )
+
     def __repr__(self):
         """
         String representation of the TravelPhoto object.
@@ -40,7 +59,24 @@ class TravelPhoto(db.Model):
             'file_type': self.file_type,
             'url': self.url,
             'thumbnail_url': self.thumbnail_url,
+            'width': self.width,
+            'height': self.height,
+            'orientation': self.orientation,
+            'taken_at': self.taken_at.isoformat() if self.taken_at else None,
+            'camera': self.camera,
+            'placeholder': self.placeholder,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+    @classmethod
+    def json_columns(cls):
+        """
+        Columns matching to_dict(), for list endpoints that serialize rows without loading ORM objects.
+        """
+        return (
+            cls.id, cls.title, cls.description, cls.category, cls.file_name, cls.file_size,
+            cls.file_type, cls.url, cls.thumbnail_url, cls.width, cls.height, cls.orientation,
+            cls.taken_at, cls.camera, cls.placeholder, cls.created_at, cls.updated_at,
+        )
+
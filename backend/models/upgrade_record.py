@@ -21,6 +21,8 @@ class UpgradeRecord(db.Model):
     # 确保每个副词条只有一个强化记录
     __table_args__ = (
         db.UniqueConstraint('drive_id', 'substat_id', name='unique_drive_substat_upgrade'),
+        # 按副词条查询强化记录（唯一约束以 drive_id 开头，用不上）
+        db.Index('ix_upgrade_records_substat_id', 'substat_id'),
     )
 
     def __repr__(self):
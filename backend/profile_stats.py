@@ -2,7 +2,8 @@
 个人资料统计API
 获取博客文章数量、照片数量和工具数量
 """
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, current_app
+from sqlalchemy import select, func
 from models.blog import Post
 from models.travel_photo import TravelPhoto
 from database import db
@@ -16,11 +17,18 @@ def get_profile_stats():
     包括文章数量、照片数量和工具数量
     """
     try:
-        # 获取博客文章总数
-        posts_count = Post.query.count()
-        
-        # 获取旅行照片总数
-        photos_count = TravelPhoto.query.count()
+        if current_app.config.get('DB_LAYOUT') == 'attached':
+            # 合并连接模式下各库在同一个连接上，一条语句同时统计
+            posts_count, photos_count = db.session.execute(select(
+                select(func.count(Post.id)).scalar_subquery(),
+                select(func.count(TravelPhoto.id)).scalar_subquery()
+            )).one()
+        else:
+            # 获取博客文章总数
+            posts_count = Post.query.count()
+
+            # 获取旅行照片总数
+            photos_count = TravelPhoto.query.count()
         
         # 工具数量（基于ToolboxPage中的静态数据）
         tools_count = 2  # 目前有：绝区零驱动器统计工具、海棠旅记
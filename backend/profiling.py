@@ -0,0 +1,189 @@
+# backend/profiling.py
+"""
+按需性能剖析
+只剖析选中的请求，结果写入 instance/profiles/，其他请求不受影响。
+
+触发方式（满足其一）：
+- 管理员请求（见 admin_auth.py）带请求头 X-Profile: 1
+- PROFILE_SAMPLE_RATE 按比例随机抽样，例如 0.01 表示 1% 的请求
+
+PROFILE_MODE 选择剖析器：
+- sample: 统计采样（默认），后台线程每 PROFILE_INTERVAL 秒记录一次请求线程的调用栈，
+  输出 collapsed stacks（.collapsed，可直接导入 speedscope 或交给 flamegraph.pl）
+- cprofile: 确定性剖析，输出 pstats 文件（.prof），开销较大，适合定位具体函数
+
+目录中最多保留 PROFILE_KEEP 个文件，超出时删除最旧的。
+未设置 ADMIN_TOKEN 且抽样率为 0 时不注册任何钩子。
+"""
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import current_app, g, request
+
+from admin_auth import is_admin_request
+
+MODES = ('sample', 'cprofile')
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _frame_name(code):
+    filename = code.co_filename
+    if filename.startswith(BACKEND_DIR):
+        filename = os.path.relpath(filename, BACKEND_DIR)
+    else:
+        filename = '/'.join(filename.split(os.sep)[-2:])
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """定时采样指定线程的调用栈"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(_frame_name(frame.f_code))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class DeterministicProfiler:
+    """cProfile，只剖析请求所在线程"""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def write(self, path):
+        self.profile.dump_stats(path)
+
+
+class Profiler:
+    """单个应用的剖析设置，保存在 app.extensions['profiling']"""
+
+    def __init__(self, directory, mode, sample_rate, interval, keep):
+        self.directory = directory
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.keep = keep
+
+    def wanted(self):
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        return request.headers.get('X-Profile') == '1' and is_admin_request()
+
+    def create(self):
+        if self.mode == 'cprofile':
+            return DeterministicProfiler()
+        return StackSampler(threading.get_ident(), self.interval)
+
+    def save(self, profiler, elapsed):
+        os.makedirs(self.directory, exist_ok=True)
+        endpoint = re.sub(r'[^\w.-]', '_', request.endpoint or 'unmatched')
+        suffix = '.prof' if self.mode == 'cprofile' else '.collapsed'
+        name = (f'{time.strftime("%Y%m%d-%H%M%S")}_{uuid.uuid4().hex[:6]}_{endpoint}_'
+                f'{elapsed * 1000:.0f}ms{suffix}')
+        profiler.write(os.path.join(self.directory, name))
+        self.prune()
+        return name
+
+    def prune(self):
+        files = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(('.prof', '.collapsed'))),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in files[:max(len(files) - self.keep, 0)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def init_app(app):
+    mode = app.config.get('PROFILE_MODE', 'sample')
+    if mode not in MODES:
+        raise ValueError(f"未知的剖析方式: {mode}，可选: {', '.join(MODES)}")
+
+    sample_rate = float(app.config.get('PROFILE_SAMPLE_RATE') or 0)
+    if not sample_rate and not app.config.get('ADMIN_TOKEN'):
+        return
+
+    app.extensions['profiling'] = Profiler(
+        app.config['PROFILE_DIR'], mode, sample_rate,
+        float(app.config.get('PROFILE_INTERVAL') or 0.005), int(app.config.get('PROFILE_KEEP') or 50),
+    )
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.logger.info(f"请求剖析: {mode}，抽样率 {sample_rate}")
+
+
+def _before_request():
+    profiling = current_app.extensions['profiling']
+    if not profiling.wanted():
+        return
+    profiler = profiling.create()
+    try:
+        profiler.start()
+    except ValueError as e:
+        # 同一进程中已有其他剖析器在运行（cProfile 不能同时启用多个）
+        current_app.logger.warning(f"无法启动请求剖析: {e}")
+        return
+    g.profiler = (profiler, time.perf_counter())
+
+
+def _after_request(response):
+    item = g.pop('profiler', None)
+    if item is None:
+        return response
+    profiler, started = item
+    profiler.stop()
+    try:
+        response.headers['X-Profile-File'] = current_app.extensions['profiling'].save(
+            profiler, time.perf_counter() - started
+        )
+    except OSError as e:
+        current_app.logger.error(f"保存剖析结果失败: {e}")
+    return response
+
+
+def _teardown_request(exc):
+    # after_request 没有执行时（例如响应生成过程中出错）也要停止剖析器
+    item = g.pop('profiler', None)
+    if item is not None:
+        item[0].stop()
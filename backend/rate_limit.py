@@ -0,0 +1,294 @@
+# backend/rate_limit.py
+"""
+写接口限流和上传准入控制
+
+@rate_limit('名称', rate=每秒补充的令牌数, burst=桶容量)：每个客户端地址、每个名称一个令牌桶，
+令牌不足时返回 429 和 Retry-After。RATE_LIMIT_BACKEND 选择桶状态的存储：
+- disk: instance 目录下的 SQLite 文件，所有 gunicorn worker 共享（默认）
+- memory: 进程内计数，多 worker 时每个 worker 各自计数
+- none: 关闭限流
+
+@admission('名称', slots=同时处理数, queue=排队数)：同时处理的请求达到 slots 时新请求排队等待，
+排队也满了或等待超过 ADMISSION_TIMEOUT 秒时直接返回 503 和 Retry-After，保护上传和缩略图生成。
+处理位和排队位都是 instance/locks 下的文件锁，worker 异常退出时由系统释放，不会泄漏。
+ASGI 入口（asgi.py）先读完请求体再交给 Flask，准入检查在请求体接收之后。
+被拒绝的请求超过 DRAIN_LIMIT 字节时不读取请求体，回复后关闭连接，被拒绝的上传不占用 worker 线程。
+
+RATE_LIMITS / ADMISSION_LIMITS 环境变量按名称覆盖默认预算，如 RATE_LIMITS="upload=0.1/5,drive_write=1/10"
+（每秒令牌数/桶容量）、ADMISSION_LIMITS="upload=1/2"（同时处理数/排队数）。
+客户端地址默认取连接地址；前面有反向代理时必须把 RATE_LIMIT_PROXY_HOPS 设为代理层数，取 X-Forwarded-For 中对应的地址，
+否则所有访客共用代理的一个令牌桶。docker-compose 中 /api 经过 Vite 代理（xfwd: true），设为 1。
+只有连接地址（以及逐层往前的代理地址）在 RATE_LIMIT_TRUSTED_PROXIES（逗号分隔的网段，默认本机和内网网段）
+之内时才采用 X-Forwarded-For，直接连到后端的客户端伪造的 X-Forwarded-For 不起作用。
+管理员请求（admin_auth）不受限制。
+"""
+import fcntl
+import ipaddress
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+from admin_auth import is_admin_request
+
+# 拒绝请求时读取并丢弃的请求体上限（字节）
+DRAIN_LIMIT = 64 * 1024
+
+# 默认信任的代理网段：本机和内网（docker 网络、局域网）
+DEFAULT_TRUSTED_PROXIES = '127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,fc00::/7'
+
+
+def _refill(tokens, updated, now, rate, burst):
+    return min(burst, tokens + (now - updated) * rate)
+
+
+class MemoryBuckets:
+    """进程内令牌桶"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """扣除一个令牌，成功返回 0，否则返回需要等待的秒数"""
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = _refill(tokens, updated, now, rate, burst)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1 if wait == 0 else tokens, now)
+            return wait
+
+
+class DiskBuckets:
+    """SQLite 文件中的令牌桶，多个 worker 进程共享"""
+
+    # 每次扣除令牌时以该概率清理已经回满的桶
+    PRUNE_PROBABILITY = 0.01
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        # 每个线程一个连接；fork 之后在子进程里重新连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key, rate, burst):
+        """扣除一个令牌，成功返回 0，否则返回需要等待的秒数"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = burst if row is None else _refill(row[0], row[1], now, rate, burst)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if wait == 0:
+                tokens -= 1
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)",
+                (key, tokens, now, now + (burst - tokens) / rate)
+            )
+            if random.random() < self.PRUNE_PROBABILITY:
+                # 回满的桶与不存在的桶等价
+                conn.execute("DELETE FROM buckets WHERE full_at < ?", (now,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+
+def _parse_limits(value, convert):
+    """解析 "名称=a/b,名称=a/b" 形式的预算"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in (value or '').split(','))):
+        name, _, budget = item.partition('=')
+        first, _, second = budget.partition('/')
+        limits[name.strip()] = (convert(first), convert(second))
+    return limits
+
+
+def _parse_networks(value):
+    """解析逗号分隔的网段，如 127.0.0.0/8,172.16.0.0/12"""
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in value.split(',') if part.strip()]
+
+
+class RateLimiter:
+    """单个应用的限流状态，保存在 app.extensions['rate_limit']"""
+
+    def __init__(self, buckets, limits, proxy_hops, trusted_proxies, lock_dir, admission_limits, admission_timeout):
+        self.buckets = buckets
+        self.limits = limits
+        self.proxy_hops = proxy_hops
+        self.trusted_proxies = trusted_proxies
+        self.lock_dir = lock_dir
+        self.admission_limits = admission_limits
+        self.admission_timeout = admission_timeout
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def _trusted(self, address):
+        try:
+            address = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted_proxies)
+
+    def client(self):
+        address = request.remote_addr or 'unknown'
+        if not (self.proxy_hops and request.headers.get('X-Forwarded-For')):
+            return address
+        # 有 X-Forwarded-For 时 access_route 是其中的地址列表，最后一个由最近的代理追加；
+        # 从连接地址开始逐层往前，只有当前地址是受信任的代理时才采用它追加的上一跳地址
+        route = list(request.access_route)
+        for _ in range(self.proxy_hops):
+            if not route or not self._trusted(address):
+                break
+            address = route.pop()
+        return address
+
+    @contextmanager
+    def admit(self, name, slots, queue):
+        """拿到处理位时返回 True；排队已满或等待超时返回 False"""
+        slots, queue = self.admission_limits.get(name, (slots, queue))
+        with ExitStack() as stack:
+            if self._acquire(stack, name, 'slot', slots):
+                yield True
+                return
+            with ExitStack() as waiting:
+                if not self._acquire(waiting, name, 'queue', queue):
+                    yield False
+                    return
+                deadline = time.monotonic() + self.admission_timeout
+                while not self._acquire(stack, name, 'slot', slots):
+                    if time.monotonic() > deadline:
+                        break
+                    time.sleep(0.05)
+                else:
+                    waiting.close()
+                    yield True
+                    return
+            yield False
+
+    def _acquire(self, stack, name, kind, count):
+        """尝试锁住 count 个锁文件中的任意一个，成功时由 stack 负责释放"""
+        for index in random.sample(range(count), count):
+            lock = open(os.path.join(self.lock_dir, f'{name}-{kind}-{index}.lock'), 'w')
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock.close()
+                continue
+            stack.callback(lock.close)
+            stack.callback(fcntl.flock, lock, fcntl.LOCK_UN)
+            return True
+        return False
+
+
+class CloseConnection:
+    """
+    gunicorn 忽略应用返回的 Connection 头（逐跳头），连接保持时会在 worker 线程里读完剩余的请求体。
+    响应带 Connection: close 时调用 gunicorn 响应对象（start_response 所属对象）的 force_close()，回复后直接关闭连接
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        force_close = getattr(getattr(start_response, '__self__', None), 'force_close', None)
+        if force_close is None:
+            return self.wsgi_app(environ, start_response)
+
+        def start(status, headers, exc_info=None):
+            if any(name.lower() == 'connection' and value.lower() == 'close' for name, value in headers):
+                force_close()
+            return start_response(status, headers, exc_info)
+        return self.wsgi_app(environ, start)
+
+
+def init_app(app):
+    backend_name = app.config.get('RATE_LIMIT_BACKEND', 'disk')
+    if backend_name == 'disk':
+        buckets = DiskBuckets(app.config['RATE_LIMIT_PATH'])
+    elif backend_name == 'memory':
+        buckets = MemoryBuckets()
+    elif backend_name == 'none':
+        buckets = None
+    else:
+        raise ValueError(f"未知的限流存储: {backend_name}，可选: disk, memory, none")
+
+    app.extensions['rate_limit'] = RateLimiter(
+        buckets,
+        _parse_limits(app.config.get('RATE_LIMITS'), float),
+        app.config.get('RATE_LIMIT_PROXY_HOPS', 0),
+        _parse_networks(app.config.get('RATE_LIMIT_TRUSTED_PROXIES') or DEFAULT_TRUSTED_PROXIES),
+        app.config['ADMISSION_LOCK_DIR'],
+        _parse_limits(app.config.get('ADMISSION_LIMITS'), int),
+        app.config.get('ADMISSION_TIMEOUT', 10),
+    )
+    app.wsgi_app = CloseConnection(app.wsgi_app)
+    app.logger.info(f"写接口限流: {backend_name}")
+
+
+def _reject(status, message, seconds):
+    response = jsonify({'error': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(seconds)))
+    # 小请求体读完丢弃，连接可以继续复用；大请求体（上传）不读取，回复后关闭连接，
+    # 被拒绝的上传不会占着 worker 线程接收整个文件
+    length = request.content_length
+    if length is not None and length <= DRAIN_LIMIT:
+        while request.stream.read(DRAIN_LIMIT):
+            pass
+    else:
+        response.headers['Connection'] = 'close'
+    return response
+
+
+def rate_limit(name, rate, burst):
+    """按客户端地址限流，rate 为每秒补充的令牌数，burst 为桶容量"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter = current_app.extensions.get('rate_limit')
+            if limiter is None or limiter.buckets is None or is_admin_request():
+                return view(*args, **kwargs)
+            budget_rate, budget_burst = limiter.limits.get(name, (rate, burst))
+            wait = limiter.buckets.take(f'{name}:{limiter.client()}', budget_rate, budget_burst)
+            if wait:
+                return _reject(429, '请求过于频繁，请稍后再试', wait)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def admission(name, slots, queue):
+    """限制同时处理的请求数，超出的请求排队，排队满时返回 503"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter = current_app.extensions.get('rate_limit')
+            if limiter is None:
+                return view(*args, **kwargs)
+            with limiter.admit(name, slots, queue) as admitted:
+                if admitted:
+                    return view(*args, **kwargs)
+            return _reject(503, '服务器繁忙，请稍后再试', limiter.admission_timeout / 2)
+        return wrapper
+    return decorator
@@ -0,0 +1,426 @@
+# backend/response_cache.py
+"""
+接口响应缓存
+读多写少的 GET 接口用 @cached('表名', ...) 装饰，序列化后的响应按请求路径缓存。
+标签就是接口依赖的表名：会话提交时自动收集本次写入涉及的表，提交成功后清除对应标签的缓存。
+
+RESPONSE_CACHE_BACKEND 选择存储：
+- disk: instance 目录下的 SQLite 文件，所有 gunicorn worker 共享（默认）
+- lru: 进程内 LRU，只适合单进程开发环境（其他 worker 的写入无法让本进程的缓存失效）
+- none: 关闭缓存
+
+@cached(..., coalesce=True) 用于计算代价高的统计接口：缓存未命中时，同一个键同时只有一个请求在计算，
+同一进程内的其他请求等待并共享序列化后的结果（X-Cache: COALESCED）。RESPONSE_CACHE_COALESCE=file（默认）时
+计算前还要拿到按键分片的文件锁，拿到锁后先重新查一次缓存，其他 worker 刚算好的结果直接使用；
+process 只合并进程内的请求，none 关闭。等待超过 RESPONSE_CACHE_COALESCE_TIMEOUT 秒后各自计算。
+"""
+import fcntl
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+
+import click
+from flask import current_app, request, has_app_context
+from sqlalchemy import event
+from database import db
+
+
+class LRUBackend:
+    """进程内 LRU 缓存"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        # 标签版本只在本进程内有效，ETag 中带上进程级标识
+        self.epoch = uuid.uuid4().hex
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            entry, tags, expires = item
+            if expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def versions(self, tags):
+        with self._lock:
+            return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def set(self, key, entry, tags, ttl, versions):
+        with self._lock:
+            # 计算期间标签已失效（有写入提交），结果可能是旧数据，不缓存
+            if tuple(self._versions.get(tag, 0) for tag in tags) != versions:
+                return
+            self._entries[key] = (entry, set(tags), time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+            for key in [key for key, (_, entry_tags, _) in self._entries.items() if entry_tags & set(tags)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions = {tag: version + 1 for tag, version in self._versions.items()}
+
+
+class DiskBackend:
+    """SQLite 文件缓存，多个 worker 进程共享同一份缓存和标签版本"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "key TEXT PRIMARY KEY, tags TEXT NOT NULL, status INTEGER NOT NULL, "
+                "mimetype TEXT, body BLOB NOT NULL, expires REAL NOT NULL)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_tags (tag TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            # 缓存文件被删除重建后标签版本会从 0 开始，ETag 中带上文件级标识避免与旧版本号混淆
+            conn.execute("CREATE TABLE IF NOT EXISTS cache_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO cache_meta (key, value) VALUES ('epoch', ?)", (uuid.uuid4().hex,))
+            self.epoch = conn.execute("SELECT value FROM cache_meta WHERE key = 'epoch'").fetchone()[0]
+
+    def _connect(self):
+        # 每个线程一个连接；fork 之后（gunicorn --preload）在子进程里重新连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT status, mimetype, body FROM cache_entries WHERE key = ? AND expires >= ?",
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return {'status': row[0], 'mimetype': row[1], 'body': row[2]}
+
+    def versions(self, tags):
+        if not tags:
+            return ()
+        rows = dict(self._connect().execute(
+            f"SELECT tag, version FROM cache_tags WHERE tag IN ({','.join('?' * len(tags))})", tags
+        ).fetchall())
+        return tuple(rows.get(tag, 0) for tag in tags)
+
+    def set(self, key, entry, tags, ttl, versions):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if self.versions(tags) == versions:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (key, tags, status, mimetype, body, expires) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, ',' + ','.join(tags) + ',', entry['status'], entry['mimetype'], entry['body'],
+                     time.time() + ttl)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def invalidate(self, tags):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for tag in tags:
+                conn.execute(
+                    "INSERT INTO cache_tags (tag, version) VALUES (?, 1) "
+                    "ON CONFLICT(tag) DO UPDATE SET version = version + 1", (tag,)
+                )
+                conn.execute("DELETE FROM cache_entries WHERE tags LIKE ?", (f'%,{tag},%',))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute("DELETE FROM cache_entries")
+            conn.execute("UPDATE cache_tags SET version = version + 1")
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+
+
+class SingleFlight:
+    """合并同一个键的并发计算；lock_dir 不为空时再用文件锁让各个 worker 依次计算"""
+
+    # 锁文件按键的哈希分片，查询参数再多也只有固定数量的文件
+    LOCK_STRIPES = 64
+
+    def __init__(self, lock_dir=None, timeout=10):
+        self.lock_dir = lock_dir
+        self.timeout = timeout
+        self._flights = {}
+        self._lock = threading.Lock()
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def join(self, key):
+        """返回 (flight, 是否为计算者)"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            return flight, True
+
+    def wait(self, flight):
+        """等待计算者完成，返回可共享的结果；超时或计算者没有可共享的结果时返回 None"""
+        flight.done.wait(self.timeout)
+        return flight.entry
+
+    def finish(self, key, flight, entry):
+        flight.entry = entry
+        with self._lock:
+            self._flights.pop(key, None)
+        flight.done.set()
+
+    @contextmanager
+    def file_lock(self, key):
+        """跨进程互斥；超时后不再等待，返回 False"""
+        if not self.lock_dir:
+            yield False
+            return
+        stripe = int(hashlib.sha1(key.encode()).hexdigest(), 16) % self.LOCK_STRIPES
+        with open(os.path.join(self.lock_dir, f'{stripe}.lock'), 'w') as lock:
+            deadline = time.monotonic() + self.timeout
+            while True:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() > deadline:
+                        yield False
+                        return
+                    time.sleep(0.01)
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class ResponseCache:
+    """单个应用的缓存状态，保存在 app.extensions['response_cache']"""
+
+    def __init__(self, backend, ttl, flights=None):
+        self.backend = backend
+        self.ttl = ttl
+        self.flights = flights
+
+    def invalidate(self, tags):
+        if self.backend is not None and tags:
+            self.backend.invalidate(sorted(tags))
+
+    def clear(self):
+        """
+        清空缓存并让所有 ETag 失效：所有表的标签版本加一（包括还没有记录过版本的表），
+        其他 worker 读取 ETag 时直接看到新版本，不需要重启
+        """
+        if self.backend is not None:
+            self.invalidate({name for metadata in db.metadatas.values() for name in metadata.tables})
+            self.backend.clear()
+
+
+def init_app(app):
+    backend_name = app.config.get('RESPONSE_CACHE_BACKEND', 'disk')
+    if backend_name == 'disk':
+        backend = DiskBackend(app.config['RESPONSE_CACHE_PATH'])
+    elif backend_name == 'lru':
+        backend = LRUBackend(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 512))
+    elif backend_name == 'none':
+        backend = None
+    else:
+        raise ValueError(f"未知的缓存类型: {backend_name}，可选: disk, lru, none")
+
+    coalesce = app.config.get('RESPONSE_CACHE_COALESCE', 'file')
+    timeout = app.config.get('RESPONSE_CACHE_COALESCE_TIMEOUT', 10)
+    if coalesce not in ('file', 'process', 'none'):
+        raise ValueError(f"未知的请求合并方式: {coalesce}，可选: file, process, none")
+    if backend is None or coalesce == 'none':
+        flights = None
+    elif coalesce == 'file' and backend_name == 'disk':
+        flights = SingleFlight(app.config['RESPONSE_CACHE_LOCK_DIR'], timeout)
+    else:
+        # 进程内缓存无法让其他 worker 看到结果，文件锁没有意义
+        flights = SingleFlight(None, timeout)
+
+    app.extensions['response_cache'] = ResponseCache(backend, app.config.get('RESPONSE_CACHE_TTL', 300), flights)
+    app.cli.add_command(clear_cache_command)
+    _listen_session_events()
+    app.logger.info(f"接口响应缓存: {backend_name}")
+
+
+def cache_key(req):
+    """缓存键：路径 + 排序后的查询参数"""
+    query = '&'.join(f'{key}={value}' for key, value in sorted(req.args.items(multi=True)))
+    return f'{req.path}?{query}'
+
+
+def _from_entry(entry, state):
+    response = current_app.response_class(entry['body'], status=entry['status'], mimetype=entry['mimetype'])
+    response.headers['X-Cache'] = state
+    return response
+
+
+def _compute(cache, key, tags, ttl, view, args, kwargs):
+    """执行视图并写入缓存，返回 (响应, 可共享的缓存条目或 None)"""
+    versions = cache.backend.versions(tags)
+    response = current_app.make_response(view(*args, **kwargs))
+    entry = None
+    if response.status_code == 200 and not response.direct_passthrough:
+        entry = {
+            'status': response.status_code,
+            'mimetype': response.mimetype,
+            'body': response.get_data(),
+        }
+        cache.backend.set(key, entry, tags, ttl or cache.ttl, versions)
+    response.headers['X-Cache'] = 'MISS'
+    return response, entry
+
+
+def _coalesced(cache, key, tags, ttl, view, args, kwargs):
+    flights = cache.flights
+    flight, leader = flights.join(key)
+    if not leader:
+        entry = flights.wait(flight)
+        if entry is not None:
+            return _from_entry(entry, 'COALESCED')
+        return _compute(cache, key, tags, ttl, view, args, kwargs)[0]
+
+    entry = None
+    try:
+        with flights.file_lock(key) as locked:
+            # 等锁期间其他 worker 可能已经算好并写入了缓存
+            if locked:
+                entry = cache.backend.get(key)
+                if entry is not None:
+                    return _from_entry(entry, 'HIT')
+            response, entry = _compute(cache, key, tags, ttl, view, args, kwargs)
+            return response
+    finally:
+        flights.finish(key, flight, entry)
+
+
+def cached(*tags, ttl=None, coalesce=False):
+    """
+    缓存 GET 接口的成功响应，tags 为接口依赖的表名
+    coalesce=True 时合并缓存未命中时的并发请求，只计算一次
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get('response_cache')
+            if cache is None or cache.backend is None or request.method != 'GET':
+                return view(*args, **kwargs)
+
+            key = cache_key(request)
+            entry = cache.backend.get(key)
+            if entry is not None:
+                return _from_entry(entry, 'HIT')
+
+            if coalesce and cache.flights is not None:
+                return _coalesced(cache, key, tags, ttl, view, args, kwargs)
+            return _compute(cache, key, tags, ttl, view, args, kwargs)[0]
+        return wrapper
+    return decorator
+
+
+# --- 会话事件：记录写入涉及的表，提交后清除对应缓存 ---
+
+_listening = False
+
+
+def _changed_tables(session):
+    return session.info.setdefault('changed_tables', set())
+
+
+def _before_flush(session, flush_context, instances):
+    tables = _changed_tables(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            tables.add(table.name)
+
+
+def _do_orm_execute(orm_execute_state):
+    # Query.update()/delete() 之类的批量语句不经过 flush
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and getattr(table, 'name', None):
+            _changed_tables(orm_execute_state.session).add(table.name)
+
+
+def _after_commit(session):
+    tables = session.info.pop('changed_tables', None)
+    if tables and has_app_context():
+        cache = current_app.extensions.get('response_cache')
+        if cache is not None:
+            try:
+                cache.invalidate(tables)
+            except Exception as e:
+                current_app.logger.error(f"清除接口缓存失败: {e}")
+
+
+def _after_rollback(session):
+    session.info.pop('changed_tables', None)
+
+
+def _listen_session_events():
+    global _listening
+    if _listening:
+        return
+    event.listen(db.session, 'before_flush', _before_flush)
+    event.listen(db.session, 'do_orm_execute', _do_orm_execute)
+    event.listen(db.session, 'after_commit', _after_commit)
+    event.listen(db.session, 'after_rollback', _after_rollback)
+    _listening = True
+
+
+@click.command('clear-cache')
+def clear_cache_command():
+    """清空接口响应缓存并让所有 ETag 失效（在应用外直接修改数据库后使用）。"""
+    cache = current_app.extensions.get('response_cache')
+    if cache is not None:
+        cache.clear()
+    print("接口响应缓存已清空。")
+
+
+def invalidate_tables(tables):
+    """迁移、同步脚本等在请求之外直接写入数据库后调用，让这些表的缓存和 ETag 失效"""
+    cache = current_app.extensions.get('response_cache')
+    if cache is not None:
+        cache.invalidate(set(tables))
@@ -3,6 +3,21 @@ import os
 import json
 from flask import Flask, current_app
 from database import db  # 从独立文件导入
+import db_config
+import schema
+import response_cache
+import rate_limit
+import json_provider
+import compression
+import instrumentation
+import profiling
+import slow_queries
+from index_report import index_report_command
+from drive_app.read_model import verify_drive_model_command
+from travel_app.image_meta import backfill_photo_metadata_command
+from image_placeholder import backfill_placeholders_command
+from backup import backup_command, restore_command
+from smoke_test import smoke_test_command
 from flask_migrate import Migrate
 from flask_cors import CORS
 from datetime import datetime
@@ -13,29 +28,91 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 migrate = Migrate()
 
-def create_app():
+def create_app(boot_mode=None):
     app = Flask(__name__)
+    # jsonify 使用 orjson（已安装时），JSON_PROVIDER 环境变量可强制指定 stdlib
+    json_provider.init_app(app)
 
-    # 确保使用正确的数据库路径
+    # 确保使用正确的数据库路径（INSTANCE_DIR 可指向其他数据目录，例如基准测试）
     backend_dir = os.path.dirname(os.path.abspath(__file__))
-    instance_dir = os.path.join(backend_dir, 'instance')
+    instance_dir = os.environ.get('INSTANCE_DIR') or os.path.join(backend_dir, 'instance')
+    os.makedirs(instance_dir, exist_ok=True)
+
+    # 数据库配置方案（WAL、PRAGMA、连接池），通过 DB_PROFILE 环境变量选择
+    db_profile, profile = db_config.get_profile()
+    # 数据库布局：split 每个库独立连接；attached 一个连接 ATTACH 全部三个文件
+    db_layout = db_config.get_layout()
     
     app.config.from_mapping(
         SECRET_KEY=os.environ.get('SECRET_KEY') or 'dev_secret_key',
-        SQLALCHEMY_DATABASE_URI=os.environ.get('DATABASE_URL') or \
-            'sqlite:///' + os.path.join(instance_dir, 'blog.db'),
+        SQLALCHEMY_DATABASE_URI=db_config.default_url(instance_dir),
+        SQLALCHEMY_ENGINE_OPTIONS=db_config.engine_options(profile, url=db_config.default_url(instance_dir)),
         SQLALCHEMY_TRACK_MODIFICATIONS=False,
-        SQLALCHEMY_BINDS={
-            'blog_db': 'sqlite:///' + os.path.join(instance_dir, 'blog.db'),
-            'drive_stats': 'sqlite:///' + os.path.join(instance_dir, 'drive_stats.db'),
-            'travel_db': 'sqlite:///' + os.path.join(instance_dir, 'travel.db')
-        }
+        SQLALCHEMY_BINDS=db_config.build_binds(instance_dir, profile, db_layout),
+        DB_PROFILE=db_profile,
+        DB_LAYOUT=db_layout,
+        DB_ATTACH=db_config.attached_files(instance_dir, db_layout),
+        # 合并连接模式下结构管理仍按文件单独连接
+        DB_FILE_URLS=db_config.file_urls(instance_dir) if db_layout == 'attached' else {},
+        # 接口响应缓存：disk（多 worker 共享）/ lru（进程内）/ none
+        RESPONSE_CACHE_BACKEND=os.environ.get('RESPONSE_CACHE_BACKEND', 'disk'),
+        RESPONSE_CACHE_TTL=int(os.environ.get('RESPONSE_CACHE_TTL', 300)),
+        RESPONSE_CACHE_PATH=os.path.join(instance_dir, 'response_cache.db'),
+        # 统计接口缓存未命中时合并并发请求：file（跨 worker 文件锁）/ process（进程内）/ none
+        RESPONSE_CACHE_COALESCE=os.environ.get('RESPONSE_CACHE_COALESCE', 'file'),
+        RESPONSE_CACHE_COALESCE_TIMEOUT=float(os.environ.get('RESPONSE_CACHE_COALESCE_TIMEOUT', 10)),
+        RESPONSE_CACHE_LOCK_DIR=os.path.join(instance_dir, 'locks'),
+        # 写接口限流：disk（多 worker 共享）/ memory（进程内）/ none，预算见 rate_limit.py
+        RATE_LIMIT_BACKEND=os.environ.get('RATE_LIMIT_BACKEND', 'disk'),
+        RATE_LIMIT_PATH=os.path.join(instance_dir, 'rate_limit.db'),
+        RATE_LIMITS=os.environ.get('RATE_LIMITS'),
+        RATE_LIMIT_PROXY_HOPS=int(os.environ.get('RATE_LIMIT_PROXY_HOPS', 0)),
+        RATE_LIMIT_TRUSTED_PROXIES=os.environ.get('RATE_LIMIT_TRUSTED_PROXIES'),
+        # 上传准入：同时处理数/排队数，排队超时秒数
+        ADMISSION_LIMITS=os.environ.get('ADMISSION_LIMITS'),
+        ADMISSION_TIMEOUT=float(os.environ.get('ADMISSION_TIMEOUT', 10)),
+        ADMISSION_LOCK_DIR=os.path.join(instance_dir, 'locks'),
+        # 响应压缩：算法优先顺序、最小压缩字节数、各算法压缩级别
+        COMPRESS_ALGORITHMS=os.environ.get('COMPRESS_ALGORITHMS', 'zstd,br,gzip'),
+        COMPRESS_MIN_SIZE=int(os.environ.get('COMPRESS_MIN_SIZE', 1024)),
+        COMPRESS_GZIP_LEVEL=os.environ.get('COMPRESS_GZIP_LEVEL'),
+        COMPRESS_BR_LEVEL=os.environ.get('COMPRESS_BR_LEVEL'),
+        COMPRESS_ZSTD_LEVEL=os.environ.get('COMPRESS_ZSTD_LEVEL'),
+        COMPRESS_CACHE_SIZE=int(os.environ.get('COMPRESS_CACHE_SIZE', 32 * 1024 * 1024)),
+        # 管理员令牌（请求头 X-Admin-Token），未设置时管理功能关闭
+        ADMIN_TOKEN=os.environ.get('ADMIN_TOKEN'),
+        # 按需剖析：管理员请求带 X-Profile: 1，或按 PROFILE_SAMPLE_RATE 抽样
+        PROFILE_MODE=os.environ.get('PROFILE_MODE', 'sample'),
+        PROFILE_SAMPLE_RATE=os.environ.get('PROFILE_SAMPLE_RATE'),
+        PROFILE_INTERVAL=os.environ.get('PROFILE_INTERVAL'),
+        PROFILE_KEEP=os.environ.get('PROFILE_KEEP'),
+        PROFILE_DIR=os.path.join(instance_dir, 'profiles'),
+        # 慢查询记录：超过阈值（毫秒）的语句连同执行计划写入 instance/slow_queries.db，0 表示关闭
+        SLOW_QUERY_MS=float(os.environ.get('SLOW_QUERY_MS', 200)),
+        SLOW_QUERY_KEEP=int(os.environ.get('SLOW_QUERY_KEEP', 5000)),
+        SLOW_QUERY_PATH=os.path.join(instance_dir, 'slow_queries.db'),
+        # 在线备份：快照目录、保留个数、备份 API 每步复制的页数和遇到锁时的等待秒数
+        BACKUP_DIR=os.environ.get('BACKUP_DIR') or os.path.join(instance_dir, 'backups'),
+        BACKUP_KEEP=int(os.environ.get('BACKUP_KEEP', 7)),
+        BACKUP_STEP_PAGES=int(os.environ.get('BACKUP_STEP_PAGES', 1024)),
+        BACKUP_STEP_SLEEP=float(os.environ.get('BACKUP_STEP_SLEEP', 0.05))
     )
 
     os.makedirs(app.instance_path, exist_ok=True)
 
     db.init_app(app)
     migrate.init_app(app, db)
+    response_cache.init_app(app)
+    rate_limit.init_app(app)
+    # after_request 钩子按注册的相反顺序执行：剖析最先注册，覆盖压缩和指标记录的耗时；
+    # 指标钩子在压缩之前注册，记录的是压缩后的响应大小
+    profiling.init_app(app)
+    instrumentation.init_app(app)
+    compression.init_app(app)
+    slow_queries.init_app(app)
+
+    with app.app_context():
+        db_config.init_engines(app, db)
 
     CORS(app, resources={r"/api/*": {"origins": ["http://localhost", "http://localhost:5173"]}})
 
@@ -47,40 +124,31 @@ def create_app():
     from drive_app.routes import drive_bp
     from travel_app.routes import travel_bp
     from profile_stats import profile_stats_bp
+    from backup import backup_bp
 
     app.register_blueprint(blog_bp)
     app.register_blueprint(metrics_bp)
     app.register_blueprint(drive_bp)
     app.register_blueprint(travel_bp)
     app.register_blueprint(profile_stats_bp)
+    app.register_blueprint(backup_bp)
 
     # 注册CLI命令
     app.cli.add_command(init_metrics_command)
     app.cli.add_command(check_db_tables_command)
+    app.cli.add_command(upgrade_db_command)
+    app.cli.add_command(index_report_command)
+    app.cli.add_command(verify_drive_model_command)
+    app.cli.add_command(backfill_photo_metadata_command)
+    app.cli.add_command(backfill_placeholders_command)
+    app.cli.add_command(backup_command)
+    app.cli.add_command(restore_command)
+    app.cli.add_command(smoke_test_command)
 
-    # 自动初始化数据库表
+    # 启动时的数据库检查，默认只核对结构版本号，建表由 `flask upgrade-db` 完成
+    # DB_BOOT_MODE: check / upgrade / create（旧的自动建表 + 反射）/ skip
     with app.app_context():
-        try:
-            # 创建所有数据库表
-            db.create_all()
-            app.logger.info("数据库表自动初始化完成")
-            
-            # 检查并记录创建的表
-            from sqlalchemy import inspect
-            
-            # 检查主数据库
-            inspector = inspect(db.engine)
-            main_tables = inspector.get_table_names()
-            app.logger.info(f"主数据库表: {main_tables}")
-            
-            # 检查驱动盘数据库
-            if 'drive_stats' in db.engines:
-                drive_inspector = inspect(db.get_engine(bind='drive_stats'))
-                drive_tables = drive_inspector.get_table_names()
-                app.logger.info(f"驱动盘数据库表: {drive_tables}")
-                
-        except Exception as e:
-            app.logger.error(f"数据库初始化失败: {e}")
+        schema.boot(app, boot_mode or os.environ.get('DB_BOOT_MODE', 'check'))
 
     # 注释掉自动创建表的代码，避免冲突
     # def create_tables():
@@ -124,6 +192,13 @@ def init_metrics_command():
         db.session.rollback()
         current_app.logger.error(f"初始化 SQLite 中的网站指标时出错: {e}")
 
+@click.command('upgrade-db')
+def upgrade_db_command():
+    """创建缺失的数据库表并执行未应用的结构变更。"""
+    schema.upgrade(current_app.logger)
+    for bind_key, (current, expected) in schema.status().items():
+        print(f"{bind_key or 'default'}: v{current} (期望 v{expected})")
+
 @click.command('check-db-tables')
 @click.argument('db_name', default='all')
 def check_db_tables_command(db_name):
@@ -169,8 +244,19 @@ def check_db_tables_command(db_name):
         except Exception as e:
             print(f"  ❌ 无法连接或检查 drive_stats.db: {e}")
 
-app = create_app()
+_app = None
+
+def __getattr__(name):
+    # gunicorn "run:app" 和 flask CLI 访问 run.app 时才创建应用，
+    # 其他脚本 import run 只为拿到 create_app，不再顺带创建一次应用
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
-    # 直接运行python run.py时使用
+    # 直接运行python run.py时使用，开发环境启动时自动升级数据库结构
+    app = create_app(boot_mode='upgrade')
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,222 @@
+# backend/schema.py
+"""
+数据库结构版本管理
+每个绑定的数据库中有一张 schema_version 表记录当前结构版本（按绑定分行，多个绑定可以共用一个 PostgreSQL 库）。
+应用启动时只读取版本号，不再反射整个数据库；建表和结构变更由 `flask upgrade-db` 显式执行。
+"""
+from contextlib import contextmanager
+
+import sqlalchemy as sa
+from flask import current_app
+from database import db
+
+# 版本表不属于模型元数据，db.create_all()/drop_all() 不会影响它
+_version_metadata = sa.MetaData()
+schema_version_table = sa.Table(
+    'schema_version', _version_metadata,
+    sa.Column('bind_key', sa.String(50), primary_key=True),
+    sa.Column('version', sa.Integer, nullable=False),
+)
+
+# 版本 1 为 db.create_all() 建立的初始表结构
+BASE_VERSION = 1
+
+# 结构变更列表: (版本号, 绑定, 说明, 执行函数)
+# 新的变更追加在末尾，版本号全局递增；执行函数必须可以重复执行
+MIGRATIONS = []
+
+BOOT_MODES = ('check', 'upgrade', 'create', 'skip')
+
+
+def migration(version, bind_key, description):
+    """注册一个结构变更，函数接收该绑定上的数据库连接"""
+    def decorator(func):
+        MIGRATIONS.append((version, bind_key, description, func))
+        return func
+    return decorator
+
+
+def import_models():
+    """导入所有模型，确保它们注册到各自绑定的元数据中"""
+    from models import blog, metrics, set_type, stat_type, drive_piece, upgrade_record, travel_photo  # noqa: F401
+
+
+def schema_binds():
+    """返回所有包含模型表的绑定"""
+    import_models()
+    return [bind_key for bind_key, metadata in db.metadatas.items() if metadata.tables]
+
+
+@contextmanager
+def bind_engine(bind_key):
+    """
+    结构管理使用的引擎
+    合并连接模式（DB_LAYOUT=attached）下所有绑定共用一个引擎，这里改为按文件单独连接，
+    保证每个文件的表和版本号写在自己的文件里
+    """
+    url = current_app.config.get('DB_FILE_URLS', {}).get(bind_key)
+    if not url:
+        yield db.engines[bind_key]
+        return
+
+    engine = sa.create_engine(url)
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+
+
+def expected_version(bind_key):
+    versions = [version for version, key, _, _ in MIGRATIONS if key == bind_key]
+    return max(versions + [BASE_VERSION])
+
+
+def read_version(conn, bind_key):
+    """读取绑定的结构版本，没有版本表时返回 None"""
+    try:
+        return conn.execute(
+            sa.select(schema_version_table.c.version)
+            .where(schema_version_table.c.bind_key == (bind_key or 'default'))
+        ).scalar()
+    except (sa.exc.OperationalError, sa.exc.ProgrammingError):
+        conn.rollback()
+        return None
+
+
+def write_version(conn, bind_key, version):
+    _version_metadata.create_all(conn)
+    conn.execute(schema_version_table.delete().where(schema_version_table.c.bind_key == (bind_key or 'default')))
+    conn.execute(schema_version_table.insert().values(bind_key=bind_key or 'default', version=version))
+
+
+def column_names(conn, table_name):
+    return {column['name'] for column in sa.inspect(conn).get_columns(table_name)}
+
+
+def add_column(conn, table_name, column_name, ddl):
+    """列不存在时执行 ALTER TABLE ADD COLUMN"""
+    if column_name not in column_names(conn, table_name):
+        conn.execute(sa.text(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {ddl}'))
+
+
+def status():
+    """返回每个绑定的 (当前版本, 期望版本)"""
+    result = {}
+    for bind_key in schema_binds():
+        with bind_engine(bind_key) as engine, engine.connect() as conn:
+            result[bind_key] = (read_version(conn, bind_key), expected_version(bind_key))
+    return result
+
+
+def upgrade(logger, bind_keys=None):
+    """创建缺失的表并执行未应用的结构变更，最后写入版本号"""
+    for bind_key in bind_keys or schema_binds():
+        with bind_engine(bind_key) as engine:
+            with engine.connect() as conn:
+                current = read_version(conn, bind_key) or BASE_VERSION
+
+            with engine.begin() as conn:
+                db.metadatas[bind_key].create_all(conn)
+
+                for version, key, description, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+                    if key != bind_key or version <= current:
+                        continue
+                    logger.info(f"[{bind_key or 'default'}] 应用结构变更 v{version}: {description}")
+                    func(conn)
+
+                write_version(conn, bind_key, expected_version(bind_key))
+        logger.info(f"[{bind_key or 'default'}] 结构版本: v{expected_version(bind_key)}")
+
+
+def boot(app, mode):
+    """
+    应用启动时的数据库检查（需在应用上下文中调用）
+    check: 只读取版本号；upgrade: 启动时执行升级；create: 旧的 create_all + 反射；skip: 不访问数据库
+    """
+    if mode not in BOOT_MODES:
+        raise ValueError(f"未知的启动模式: {mode}，可选: {', '.join(BOOT_MODES)}")
+
+    try:
+        if mode == 'check':
+            for bind_key, (current, expected) in status().items():
+                if current != expected:
+                    app.logger.warning(
+                        f"[{bind_key or 'default'}] 数据库结构版本 {current} 与代码要求的 v{expected} 不一致，"
+                        f"请执行 `flask upgrade-db`"
+                    )
+        elif mode == 'upgrade':
+            upgrade(app.logger)
+        elif mode == 'create':
+            for bind_key in schema_binds():
+                with bind_engine(bind_key) as engine:
+                    db.metadatas[bind_key].create_all(engine)
+                    tables = sa.inspect(engine).get_table_names()
+                app.logger.info(f"[{bind_key or 'default'}] 数据库表: {tables}")
+            app.logger.info("数据库表自动初始化完成")
+    except Exception as e:
+        app.logger.error(f"数据库初始化失败: {e}")
+    finally:
+        # 启动阶段打开的连接不能带进 fork 出来的 worker（gunicorn --preload）
+        for engine in set(db.engines.values()):
+            engine.dispose()
+
+
+# --- 结构变更 ---
+
+def create_indexes(conn, *tables, names=None):
+    """
+    创建模型上声明的索引，已存在的跳过
+    names 限定只创建这些索引：模型上的索引可能依赖后续版本才加入的列，旧版本的变更必须按名称列出自己的索引
+    """
+    for table in tables:
+        for index in table.indexes:
+            if names is None or index.name in names:
+                index.create(conn, checkfirst=True)
+
+
+@migration(2, 'drive_stats', '驱动盘列表、统计和配对查询的索引')
+def add_drive_indexes(conn):
+    from models.drive_piece import DrivePiece, DrivePieceSubstat
+    from models.upgrade_record import UpgradeRecord
+    create_indexes(conn, DrivePiece.__table__, DrivePieceSubstat.__table__, UpgradeRecord.__table__)
+
+
+@migration(3, 'travel_db', '旅行照片分类筛选和时间排序的索引')
+def add_travel_indexes(conn):
+    from models.travel_photo import TravelPhoto
+    create_indexes(conn, TravelPhoto.__table__,
+                   names={'ix_travel_photo_category_created_at', 'ix_travel_photo_created_at'})
+
+
+@migration(4, 'drive_stats', '驱动盘打包副词条列 substat_levels')
+def add_drive_substat_levels(conn):
+    from drive_app import read_model
+    add_column(conn, 'drive_pieces', 'substat_levels', 'JSONB' if conn.dialect.name == 'postgresql' else 'JSON')
+    read_model.rebuild(conn, only_missing=True)
+
+
+@migration(5, 'drive_stats', '驱动盘乐观锁版本号 version')
+def add_drive_version(conn):
+    add_column(conn, 'drive_pieces', 'version', 'INTEGER NOT NULL DEFAULT 0')
+
+
+@migration(6, 'travel_db', '照片尺寸、方向、拍摄时间和相机型号列及拍摄时间索引')
+def add_travel_photo_metadata(conn):
+    from models.travel_photo import TravelPhoto
+    add_column(conn, 'travel_photo', 'width', 'INTEGER')
+    add_column(conn, 'travel_photo', 'height', 'INTEGER')
+    add_column(conn, 'travel_photo', 'orientation', 'SMALLINT')
+    add_column(conn, 'travel_photo', 'taken_at', 'TIMESTAMP' if conn.dialect.name == 'postgresql' else 'DATETIME')
+    add_column(conn, 'travel_photo', 'camera', 'VARCHAR(100)')
+    create_indexes(conn, TravelPhoto.__table__,
+                   names={'ix_travel_photo_category_taken_at', 'ix_travel_photo_taken_at'})
+
+
+@migration(7, 'travel_db', '照片占位图列 placeholder')
+def add_travel_photo_placeholder(conn):
+    add_column(conn, 'travel_photo', 'placeholder', 'TEXT')
+
+
+@migration(8, None, '文章封面占位图列 placeholder')
+def add_post_placeholder(conn):
+    add_column(conn, 'post', 'placeholder', 'TEXT')
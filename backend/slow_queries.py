@@ -0,0 +1,193 @@
+# backend/slow_queries.py
+"""
+慢查询记录
+所有引擎上耗时超过 SLOW_QUERY_MS 毫秒的语句连同参数、执行计划和发起请求的接口一起写入
+instance/slow_queries.db（多个 worker 共用），只保留最近 SLOW_QUERY_KEEP 条。
+SQLite 使用 EXPLAIN QUERY PLAN，PostgreSQL 使用 EXPLAIN（都不会真正执行语句）。
+
+`flask slow-queries` 按语句汇总次数和耗时，列出最慢的语句。SLOW_QUERY_MS=0 关闭记录。
+"""
+import json
+import sqlite3
+import time
+
+import click
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 只对这些语句取执行计划
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+_listening = False
+
+
+class SlowQueryStore:
+    """SQLite 文件存储，超过上限时删除最旧的记录"""
+
+    def __init__(self, path, keep):
+        self.path = path
+        self.keep = keep
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS slow_queries ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, duration_ms REAL NOT NULL, "
+                "bind TEXT, endpoint TEXT, statement TEXT NOT NULL, parameters TEXT, plan TEXT)"
+            )
+
+    def _connect(self):
+        # 慢查询很少，每次写入单独连接，fork 之后也不需要处理
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def add(self, **entry):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO slow_queries (created_at, duration_ms, bind, endpoint, statement, parameters, plan) "
+                "VALUES (:created_at, :duration_ms, :bind, :endpoint, :statement, :parameters, :plan)", entry
+            )
+            conn.execute(
+                "DELETE FROM slow_queries WHERE id <= (SELECT MAX(id) FROM slow_queries) - ?", (self.keep,)
+            )
+
+    def summary(self, limit, since=None):
+        """按语句汇总: (语句, 次数, 总耗时, 平均耗时, 最大耗时, 接口, 最近一次的执行计划)"""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT statement, COUNT(*), SUM(duration_ms), AVG(duration_ms), MAX(duration_ms), "
+                "GROUP_CONCAT(DISTINCT endpoint), "
+                "(SELECT plan FROM slow_queries latest WHERE latest.statement = slow_queries.statement "
+                " ORDER BY id DESC LIMIT 1) "
+                "FROM slow_queries WHERE created_at >= ? "
+                "GROUP BY statement ORDER BY SUM(duration_ms) DESC LIMIT ?",
+                (since or 0, limit)
+            ).fetchall()
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM slow_queries")
+
+
+class SlowQueryRecorder:
+    """单个应用的慢查询设置，保存在 app.extensions['slow_queries']"""
+
+    def __init__(self, store, threshold_ms):
+        self.store = store
+        self.threshold_ms = threshold_ms
+
+    def record(self, conn, cursor, statement, parameters, executemany, duration_ms):
+        plan = None
+        if not executemany and statement.lstrip().upper().startswith(EXPLAINABLE):
+            plan = explain(conn, cursor, statement, parameters)
+        try:
+            self.store.add(
+                created_at=time.time(),
+                duration_ms=round(duration_ms, 3),
+                bind=conn.engine.url.render_as_string(hide_password=True),
+                endpoint=request.endpoint if has_request_context() else None,
+                statement=' '.join(statement.split()),
+                parameters=_format_parameters(parameters),
+                plan=plan,
+            )
+        except sqlite3.Error as e:
+            current_app.logger.error(f"写入慢查询记录失败: {e}")
+
+
+def _format_parameters(parameters, limit=1000):
+    text = json.dumps(parameters, default=repr, ensure_ascii=False)
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+def explain(conn, cursor, statement, parameters):
+    """在同一个数据库连接上取执行计划，失败时返回 None"""
+    dbapi_connection = cursor.connection
+    explain_cursor = dbapi_connection.cursor()
+    try:
+        if conn.dialect.name == 'sqlite':
+            explain_cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)
+            return '\n'.join(row[-1] for row in explain_cursor.fetchall())
+        if conn.dialect.name == 'postgresql':
+            return _explain_postgresql(dbapi_connection, explain_cursor, statement, parameters)
+        return None
+    except Exception as e:
+        current_app.logger.warning(f"获取执行计划失败: {e}")
+        return None
+    finally:
+        explain_cursor.close()
+
+
+def _explain_postgresql(dbapi_connection, explain_cursor, statement, parameters):
+    """PostgreSQL 上语句出错会让整个事务进入失败状态，EXPLAIN 放在保存点里，失败时只回滚保存点"""
+    if getattr(dbapi_connection, 'autocommit', False):
+        explain_cursor.execute(f'EXPLAIN {statement}', parameters)
+        return '\n'.join(row[0] for row in explain_cursor.fetchall())
+    explain_cursor.execute('SAVEPOINT slow_query_explain')
+    try:
+        explain_cursor.execute(f'EXPLAIN {statement}', parameters)
+        plan = '\n'.join(row[0] for row in explain_cursor.fetchall())
+    except Exception:
+        explain_cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+        raise
+    finally:
+        explain_cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+    return plan
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._slow_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_slow_query_started', None)
+    if started is None or not has_app_context():
+        return
+    recorder = current_app.extensions.get('slow_queries')
+    if recorder is None:
+        return
+    duration_ms = (time.perf_counter() - started) * 1000
+    if duration_ms >= recorder.threshold_ms:
+        recorder.record(conn, cursor, statement, parameters, executemany, duration_ms)
+
+
+def init_app(app):
+    global _listening
+    app.cli.add_command(slow_queries_command)
+    threshold_ms = float(app.config.get('SLOW_QUERY_MS', 200))
+    if threshold_ms <= 0:
+        return
+
+    store = SlowQueryStore(app.config['SLOW_QUERY_PATH'], int(app.config.get('SLOW_QUERY_KEEP', 5000)))
+    app.extensions['slow_queries'] = SlowQueryRecorder(store, threshold_ms)
+    if not _listening:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listening = True
+
+
+@click.command('slow-queries')
+@click.option('--limit', default=10, help='列出的语句数')
+@click.option('--hours', default=None, type=float, help='只统计最近若干小时')
+@click.option('--clear', is_flag=True, help='清空慢查询记录')
+def slow_queries_command(limit, hours, clear):
+    """按总耗时列出最慢的 SQL 语句。"""
+    recorder = current_app.extensions.get('slow_queries')
+    if recorder is None:
+        print("慢查询记录未开启（SLOW_QUERY_MS=0）。")
+        return
+    if clear:
+        recorder.store.clear()
+        print("慢查询记录已清空。")
+        return
+
+    rows = recorder.store.summary(limit, time.time() - hours * 3600 if hours else None)
+    if not rows:
+        print(f"没有超过 {recorder.threshold_ms:g}ms 的语句。")
+        return
+    for index, (statement, count, total, avg, maximum, endpoints, plan) in enumerate(rows, 1):
+        print(f"\n#{index} 次数 {count}，总计 {total:.1f}ms，平均 {avg:.1f}ms，最大 {maximum:.1f}ms")
+        print(f"   接口: {endpoints or '（非请求）'}")
+        print(f"   语句: {statement[:300]}")
+        if plan:
+            for line in plan.splitlines():
+                print(f"   计划: {line}")
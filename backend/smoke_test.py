@@ -0,0 +1,182 @@
+# backend/smoke_test.py
+"""
+接口冒烟测试
+`flask smoke-test` 用测试客户端依次请求各个接口，检查状态码和响应内容，任一检查失败时以状态码 1 退出。
+测试矩阵（docker-compose.test.yml）在 SQLite 和 PostgreSQL 上各运行一次。
+
+--write 额外走一遍写入流程：新建文章、添加驱动盘并强化/降级、上传照片，检查统计接口和 ETag 随写入更新，
+结束后删除创建的数据。词条类型为空时会写入测试用的套装和词条，只应在测试用的库上使用。
+"""
+import io
+import json
+import sys
+
+import click
+from flask import current_app
+from PIL import Image
+
+from database import db
+
+
+class SmokeTest:
+    """记录每个检查的结果"""
+
+    def __init__(self, client):
+        self.client = client
+        self.passed = 0
+        self.failures = []
+
+    def check(self, method, path, status, expect=None, **kwargs):
+        """发出请求，状态码不是 status 或 expect(response) 不为真时记为失败，返回响应"""
+        response = self.client.open(path, method=method, **kwargs)
+        problem = None
+        if response.status_code != status:
+            problem = f"状态码 {response.status_code}，期望 {status}: {response.get_data(as_text=True)[:200]}"
+        elif expect is not None:
+            try:
+                if not expect(response):
+                    problem = f"响应内容不符合预期: {response.get_data(as_text=True)[:200]}"
+            except Exception as e:
+                problem = f"检查响应内容出错: {e!r}"
+        label = f"{method} {path}"
+        if problem:
+            self.failures.append(f"{label}: {problem}")
+            print(f"  ❌ {label}: {problem}")
+        else:
+            self.passed += 1
+            print(f"  ✅ {label}")
+        return response
+
+
+def _json(response):
+    return response.get_json()
+
+
+def _ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+
+
+def read_checks(test):
+    """只读接口"""
+    print("\n--- 只读接口 ---")
+    test.check('GET', '/api/metrics/health', 200, lambda r: _json(r)['status'] == 'ok')
+    test.check('GET', '/api/metrics/ready', 200, lambda r: _json(r)['status'] == 'ready')
+    test.check('GET', '/api/metrics/visitor_count', 200, lambda r: isinstance(_json(r)['visitor_count'], int))
+    test.check('GET', '/api/metrics/uptime', 200, lambda r: _json(r)['uptimeSeconds'] >= 0)
+    test.check('GET', '/api/profile/stats', 200, lambda r: {'posts', 'photos', 'tools'} <= set(_json(r)))
+    test.check('GET', '/api/posts', 200, lambda r: isinstance(_json(r), list))
+    test.check('GET', '/api/posts/0', 404)
+    test.check('GET', '/api/drive/pieces', 200,
+               lambda r: isinstance(_json(r)['drives'], list) and _json(r)['pagination']['total_items'] >= 0)
+    test.check('GET', '/api/drive/pieces/0', 404)
+    test.check('GET', '/api/drive/set-types', 200, lambda r: isinstance(_json(r), list))
+    test.check('GET', '/api/drive/stat-types', 200, lambda r: isinstance(_json(r), list))
+    stats = test.check('GET', '/api/drive/stats', 200,
+                       lambda r: isinstance(_json(r)['total_pieces'], int) and 'upgrade_distribution' in _json(r))
+    if stats.headers.get('ETag'):
+        test.check('GET', '/api/drive/stats', 304, headers={'If-None-Match': stats.headers['ETag']})
+    test.check('GET', '/api/travel/photos', 200, lambda r: isinstance(_json(r)['photos'], list))
+    test.check('GET', '/api/travel/stats', 200, lambda r: isinstance(_json(r)['total_photos'], int))
+    test.check('GET', '/api/travel/manifest', 200,
+               lambda r: r.mimetype == 'application/x-ndjson' and all('id' in row for row in _ndjson(r)))
+
+
+def _ensure_drive_types():
+    """驱动盘写入需要至少一个套装和五个词条（一个主词条、四个副词条），不足时补上测试数据"""
+    from models.set_type import SetType
+    from models.stat_type import StatType
+
+    if SetType.query.first() is None:
+        db.session.add(SetType(set_name='冒烟测试套装'))
+    missing = 5 - StatType.query.count()
+    for index in range(max(0, missing)):
+        db.session.add(StatType(stat_name=f'冒烟测试词条{index + 1}'))
+    db.session.commit()
+    set_name = SetType.query.first().set_name
+    stat_names = [stat.stat_name for stat in StatType.query.order_by(StatType.stat_type_id).limit(5)]
+    return set_name, stat_names
+
+
+def post_checks(test):
+    print("\n--- 文章 ---")
+    created = test.check('POST', '/api/posts', 201, lambda r: isinstance(_json(r)['id'], int),
+                         json={'title': '冒烟测试', 'content': '冒烟测试内容'})
+    if created.status_code == 201:
+        post_id = _json(created)['id']
+        test.check('GET', f'/api/posts/{post_id}', 200, lambda r: _json(r)['title'] == '冒烟测试')
+        test.check('GET', '/api/posts', 200, lambda r: post_id in {post['id'] for post in _json(r)})
+        test.check('DELETE', f'/api/posts/{post_id}', 200)
+        test.check('GET', f'/api/posts/{post_id}', 404)
+
+
+def drive_checks(test):
+    print("\n--- 驱动盘 ---")
+    set_name, stat_names = _ensure_drive_types()
+    before = test.check('GET', '/api/drive/stats', 200)
+    if before.status_code != 200:
+        return
+    total = _json(before)['total_pieces']
+    added = test.check('POST', '/api/drive/add', 201, lambda r: isinstance(_json(r)['drive']['drive_id'], int),
+                       json={'set_name': set_name, 'position': 1, 'main_stat_name': stat_names[0],
+                             'substats': stat_names[1:4]})
+    if added.status_code != 201:
+        return
+    drive_id = _json(added)['drive']['drive_id']
+    if before.headers.get('ETag'):
+        test.check('GET', '/api/drive/stats', 200, lambda r: _json(r)['total_pieces'] == total + 1,
+                   headers={'If-None-Match': before.headers['ETag']})
+    detail = test.check('GET', f'/api/drive/pieces/{drive_id}', 200,
+                        lambda r: len(_json(r)['substats_with_levels']) == 3)
+    if detail.status_code == 200:
+        substat_id = _json(detail)['substats_with_levels'][0]['substat_id']
+        test.check('POST', f'/api/drive/pieces/{drive_id}/upgrade', 200,
+                   lambda r: _json(r)['new_total_upgrades'] == 1,
+                   json={'upgrade_type': 'existing', 'substat_id': substat_id})
+        test.check('GET', f'/api/drive/pieces/{drive_id}', 200,
+                   lambda r: _json(r)['substats_with_levels'][0]['upgrade_count'] == 1)
+        test.check('POST', f'/api/drive/pieces/{drive_id}/upgrade', 400,
+                   json={'upgrade_type': 'existing', 'substat_id': 'abc'})
+        test.check('POST', f'/api/drive/pieces/{drive_id}/upgrade', 200,
+                   lambda r: _json(r)['result']['type'] == 'new_substat', json={'upgrade_type': 'new'})
+        test.check('POST', f'/api/drive/pieces/{drive_id}/downgrade', 200,
+                   lambda r: _json(r)['result']['new_upgrade_count'] == 0, json={'substat_id': substat_id})
+    test.check('DELETE', f'/api/drive/pieces/{drive_id}', 200)
+    test.check('GET', f'/api/drive/pieces/{drive_id}', 404)
+    test.check('GET', '/api/drive/stats', 200, lambda r: _json(r)['total_pieces'] == total)
+
+
+def photo_checks(test):
+    print("\n--- 旅行照片 ---")
+    image = io.BytesIO()
+    Image.new('RGB', (64, 48), (40, 120, 200)).save(image, 'JPEG')
+    image.seek(0)
+    uploaded = test.check('POST', '/api/travel/upload', 201,
+                          lambda r: (_json(r)['photo']['width'], _json(r)['photo']['height']) == (64, 48)
+                          and _json(r)['photo']['placeholder'].startswith('data:image/webp;base64,'),
+                          data={'file': (image, 'smoke.jpg'), 'title': '冒烟测试', 'category': '其他'},
+                          content_type='multipart/form-data')
+    if uploaded.status_code == 201:
+        photo = _json(uploaded)['photo']
+        test.check('GET', photo['url'], 200, lambda r: r.mimetype == 'image/jpeg')
+        test.check('GET', '/api/travel/manifest', 200, lambda r: photo['id'] in {row['id'] for row in _ndjson(r)})
+        test.check('DELETE', f"/api/travel/photos/{photo['id']}", 200)
+        test.check('GET', f"/api/travel/photos/{photo['id']}", 404)
+
+
+@click.command('smoke-test')
+@click.option('--write', is_flag=True, help='同时测试写入流程（会写入并删除测试数据，只在测试库上使用）')
+def smoke_test_command(write):
+    """请求各个接口并检查状态码和响应内容，有检查失败时以状态码 1 退出。"""
+    test = SmokeTest(current_app.test_client())
+    read_checks(test)
+    if write:
+        # 写入流程，结束后删除创建的数据
+        post_checks(test)
+        drive_checks(test)
+        photo_checks(test)
+
+    print(f"\n通过 {test.passed} 项，失败 {len(test.failures)} 项")
+    if test.failures:
+        for failure in test.failures:
+            print(f"  ❌ {failure}")
+        sys.exit(1)
@@ -0,0 +1,125 @@
+# backend/travel_app/image_meta.py
+"""
+照片元数据
+上传时从图片头部读取尺寸、EXIF 方向、拍摄时间和相机型号写入 travel_photo 表，前端排版和按拍摄时间排序
+不再需要下载图片。Image.open 只解析文件头，size 和 getexif() 都不解码像素。
+
+width / height 为按 EXIF 方向旋转后的显示尺寸（方向 5-8 时宽高互换），与浏览器显示原图、
+缩略图（生成时已按方向旋转）的宽高比一致；orientation 保留 EXIF 原值（1-8）。
+
+`flask backfill-photo-metadata` 为已有照片补齐这些列（--all 重新读取全部照片）。
+占位图见 image_placeholder.py。
+"""
+import os
+from datetime import datetime
+
+import click
+from PIL import Image, UnidentifiedImageError
+from sqlalchemy import select, update
+
+from database import db
+from models.travel_photo import TravelPhoto
+
+# EXIF 标签
+ORIENTATION = 0x0112
+MAKE = 0x010F
+MODEL = 0x0110
+DATETIME = 0x0132
+EXIF_IFD = 0x8769
+DATETIME_ORIGINAL = 0x9003
+
+# 方向 5-8 的图片显示时旋转 90 度
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+BATCH_SIZE = 200
+
+EMPTY = {'width': None, 'height': None, 'orientation': None, 'taken_at': None, 'camera': None}
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', 'ignore')
+    return value.strip('\x00 ').strip() if isinstance(value, str) else None
+
+
+def _parse_datetime(value):
+    value = _text(value)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value[:19], '%Y:%m:%d %H:%M:%S')
+    except ValueError:
+        return None
+
+
+def _camera(make, model):
+    make, model = _text(make), _text(model)
+    # 很多相机的型号已经带上厂商名，如 Canon / Canon EOS R5
+    if make and model and model.lower().startswith(make.split()[0].lower()):
+        make = None
+    camera = ' '.join(part for part in (make, model) if part)
+    return camera[:100] or None
+
+
+def read_metadata(path):
+    """读取图片头部的尺寸和 EXIF，返回 travel_photo 的列值；不是图片或文件损坏时各列为 None"""
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            exif = img.getexif()
+    except (OSError, UnidentifiedImageError, SyntaxError, ValueError):
+        return dict(EMPTY)
+
+    orientation = exif.get(ORIENTATION)
+    if not isinstance(orientation, int) or not 1 <= orientation <= 8:
+        orientation = None
+    if orientation in TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    details = exif.get_ifd(EXIF_IFD)
+    return {
+        'width': width,
+        'height': height,
+        'orientation': orientation,
+        'taken_at': _parse_datetime(details.get(DATETIME_ORIGINAL)) or _parse_datetime(exif.get(DATETIME)),
+        'camera': _camera(exif.get(MAKE), exif.get(MODEL)),
+    }
+
+
+def backfill(upload_dir, everything=False, log=print):
+    """补齐照片元数据，返回 (读取的照片数, 文件缺失的照片数)"""
+    query = select(TravelPhoto.id, TravelPhoto.file_name).order_by(TravelPhoto.id).limit(BATCH_SIZE)
+    if not everything:
+        query = query.where(TravelPhoto.width.is_(None))
+
+    done = missing = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(query.where(TravelPhoto.id > last_id)).all()
+        if not rows:
+            break
+        values = []
+        for photo_id, file_name in rows:
+            path = os.path.join(upload_dir, file_name)
+            if not os.path.exists(path):
+                missing += 1
+                continue
+            values.append({'id': photo_id, **read_metadata(path)})
+        if values:
+            db.session.execute(update(TravelPhoto), values)
+            db.session.commit()
+            done += len(values)
+            log(f"已处理 {done} 张照片")
+        last_id = rows[-1].id
+    return done, missing
+
+
+@click.command('backfill-photo-metadata')
+@click.option('--all', 'everything', is_flag=True, help='重新读取全部照片（默认只处理尺寸为空的照片）')
+def backfill_photo_metadata_command(everything):
+    """从图片文件头读取尺寸、方向、拍摄时间和相机型号，补齐已有照片的元数据列。"""
+    from travel_app.routes import get_upload_path
+    done, missing = backfill(get_upload_path(), everything)
+    print(f"✅ 已更新 {done} 张照片的元数据。")
+    if missing:
+        print(f"⚠️ {missing} 张照片的原图文件不存在，已跳过。")
+
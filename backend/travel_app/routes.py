@@ -1,11 +1,17 @@
 import os
 import uuid
 from datetime import datetime
-from flask import Blueprint, request, jsonify, current_app, send_from_directory
+from flask import Blueprint, request, jsonify, current_app, send_from_directory, stream_with_context
 from werkzeug.utils import secure_filename
 from database import db
 from models.travel_photo import TravelPhoto
-from PIL import Image
+from response_cache import cached
+from rate_limit import admission, rate_limit
+from conditional import conditional, conditional_row, make_etag
+from json_provider import rows_to_dicts
+from travel_app.image_meta import read_metadata
+from image_placeholder import make_placeholder
+from PIL import Image, ImageOps
 import mimetypes
 
 # 创建一个蓝图实例，所有与旅行相册相关的路由都将注册到这个蓝图上
@@ -40,6 +46,8 @@ def create_thumbnail(image_path, thumbnail_path, size=(300, 300)):
     """创建缩略图"""
     try:
         with Image.open(image_path) as img:
+            # 按 EXIF 方向旋转，与数据库中的显示尺寸一致（缩略图不保留 EXIF）
+            img = ImageOps.exif_transpose(img)
             # 保持宽高比的缩略图
             img.thumbnail(size, Image.Resampling.LANCZOS)
             # 如果是RGBA模式，转换为RGB
@@ -54,6 +62,8 @@ def create_thumbnail(image_path, thumbnail_path, size=(300, 300)):
         return False
 
 @travel_bp.route('/upload', methods=['POST'])
+@rate_limit('upload', rate=0.2, burst=10)
+@admission('upload', slots=2, queue=4)
 def upload_photo():
     """上传照片"""
     try:
@@ -121,7 +131,10 @@ def upload_photo():
             file_size=file_size,
             file_type=mime_type,
             url=file_url,
-            thumbnail_url=thumbnail_url
+            thumbnail_url=thumbnail_url,
+            # 缩略图已按方向旋转且尺寸小，从它生成占位图更快
+            placeholder=make_placeholder(thumbnail_file_path if thumbnail_created else file_path),
+            **read_metadata(file_path)
         )
         
         db.session.add(photo)
@@ -140,6 +153,7 @@ def upload_photo():
         return jsonify({'error': '上传失败，请稍后重试'}), 500
 
 @travel_bp.route('/photos', methods=['GET'])
+@conditional('travel_photo')
 def get_photos():
     """获取照片列表"""
     try:
@@ -152,8 +166,8 @@ def get_photos():
         search = request.args.get('search', '')
         limit = request.args.get('limit', type=int)
         
-        # 构建查询
-        query = TravelPhoto.query
+        # 构建查询（只查询返回的列，不构造 ORM 对象）
+        query = db.session.query(*TravelPhoto.json_columns())
         
         # 分类筛选
         if category and category in VALID_CATEGORIES:
@@ -172,6 +186,8 @@ def get_photos():
         # 排序
         if sort_by == 'title':
             order_by = TravelPhoto.title.asc() if order == 'asc' else TravelPhoto.title.desc()
+        elif sort_by == 'taken_at':
+            order_by = TravelPhoto.taken_at.asc() if order == 'asc' else TravelPhoto.taken_at.desc()
         else:  # 默认按创建时间排序
             order_by = TravelPhoto.created_at.asc() if order == 'asc' else TravelPhoto.created_at.desc()
         
@@ -179,8 +195,7 @@ def get_photos():
         
         # 如果有limit参数，直接返回前N个结果
         if limit:
-            photos = query.limit(limit).all()
-            return jsonify([photo.to_dict() for photo in photos])
+            return jsonify(rows_to_dicts(query.limit(limit).all()))
         
         # 分页
         per_page = min(per_page, 100)  # 限制最大每页数量
@@ -191,7 +206,7 @@ def get_photos():
         )
         
         return jsonify({
-            'photos': [photo.to_dict() for photo in pagination.items],
+            'photos': rows_to_dicts(pagination.items),
             'pagination': {
                 'current_page': pagination.page,
                 'per_page': pagination.per_page,
@@ -206,7 +221,58 @@ def get_photos():
         current_app.logger.error(f"获取照片列表时出错: {e}")
         return jsonify({'error': '获取照片列表失败'}), 500
 
+# 清单每次查询的行数
+MANIFEST_CHUNK = 1000
+
+def manifest_entry(row):
+    """清单中的一行：短键名，hash 随文件和记录内容变化"""
+    return {
+        'id': row.id,
+        'title': row.title,
+        'category': row.category,
+        'url': row.url,
+        'thumb': row.thumbnail_url,
+        'size': row.file_size,
+        'type': row.file_type,
+        'w': row.width,
+        'h': row.height,
+        'taken': row.taken_at,
+        'ph': row.placeholder,
+        'created': row.created_at,
+        'hash': make_etag(row.file_name, row.file_size, row.updated_at)[:16],
+    }
+
+@travel_bp.route('/manifest', methods=['GET'])
+@conditional('travel_photo')
+def get_manifest():
+    """
+    全部照片的精简清单，NDJSON 流式输出（每行一张照片，按 id 升序），不分页也不统计总数。
+    ETag 由 travel_photo 表的版本号生成，相册没有变化时返回 304。
+    """
+    columns = (TravelPhoto.id, TravelPhoto.title, TravelPhoto.category, TravelPhoto.url,
+               TravelPhoto.thumbnail_url, TravelPhoto.file_name, TravelPhoto.file_size,
+               TravelPhoto.file_type, TravelPhoto.width, TravelPhoto.height, TravelPhoto.taken_at,
+               TravelPhoto.placeholder, TravelPhoto.created_at, TravelPhoto.updated_at)
+
+    def generate():
+        dumps = current_app.json.dumps
+        last_id = 0
+        while True:
+            rows = db.session.query(*columns).filter(TravelPhoto.id > last_id) \
+                .order_by(TravelPhoto.id).limit(MANIFEST_CHUNK).all()
+            # 每块查询后结束读事务，慢速客户端不会一直占着连接
+            db.session.rollback()
+            if not rows:
+                return
+            yield ''.join(dumps(manifest_entry(row)) + '\n' for row in rows).encode()
+            if len(rows) < MANIFEST_CHUNK:
+                return
+            last_id = rows[-1].id
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @travel_bp.route('/photos/<int:photo_id>', methods=['GET'])
+@conditional_row(TravelPhoto, 'photo_id', 'travel_photo')
 def get_photo(photo_id):
     """获取单张照片信息"""
     try:
@@ -306,11 +372,21 @@ def get_thumbnail_file(filename):
         return jsonify({'error': '文件不存在'}), 404
 
 @travel_bp.route('/categories', methods=['GET'])
+@conditional()
+@cached()
 def get_categories():
     """获取所有分类"""
     return jsonify(list(VALID_CATEGORIES))
 
+def month_expression(column):
+    """按月分组的表达式，SQLite 使用 strftime，PostgreSQL 使用 to_char"""
+    if db.session.get_bind(mapper=TravelPhoto).dialect.name == 'postgresql':
+        return db.func.to_char(column, 'YYYY-MM')
+    return db.func.strftime('%Y-%m', column)
+
 @travel_bp.route('/stats', methods=['GET'])
+@conditional('travel_photo')
+@cached('travel_photo', coalesce=True)
 def get_stats():
     """获取统计信息"""
     try:
@@ -324,7 +400,7 @@ def get_stats():
         
         # 按月份统计
         monthly_stats = db.session.query(
-            db.func.strftime('%Y-%m', TravelPhoto.created_at).label('month'),
+            month_expression(TravelPhoto.created_at).label('month'),
             db.func.count(TravelPhoto.id).label('count')
         ).group_by('month').order_by('month').all()
         
@@ -84,6 +84,15 @@ backup_config() {
         log_success "已备份 site-config.json"
     fi
     
+    # 服务仍在运行时先生成在线快照（backend/instance/backups，带校验和，可用 flask restore 恢复）
+    if $DOCKER_COMPOSE ps --status running --services 2>/dev/null | grep -q '^backend$'; then
+        if $DOCKER_COMPOSE exec -T backend flask backup; then
+            log_success "已生成数据库快照"
+        else
+            log_warning "数据库快照生成失败，继续复制文件备份"
+        fi
+    fi
+
     # 备份数据库（如果存在）
     if [ -d "backend/instance" ]; then
         cp -r backend/instance backend/instance.backup
@@ -103,6 +103,8 @@ export default defineConfig({
           ? 'https://your-domain.com' // 生产环境API地址 - 请替换为你的域名
           : 'http://localhost:5000', // 本地开发
         changeOrigin: true,
+        // 追加 X-Forwarded-For，后端按访客地址限流（RATE_LIMIT_PROXY_HOPS=1）
+        xfwd: true,
         secure: process.env.NODE_ENV === 'production', // 生产环境启用HTTPS
       }
     }
@@ -115,6 +117,7 @@ export default defineConfig({
       '/api': {
         target: process.env.API_BASE_URL || 'https://your-domain.com', // 生产API地址
         changeOrigin: true,
+        xfwd: true,
         secure: true,
       }
     }